@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApplicationConfig(AppConfig):
     name = 'app'
+
+    def ready(self):
+        from app.service import rule_version_document, user, workspace  # noqa: F401
+        from app.utils import etag, invalidation  # noqa: F401
+
+        invalidation.connect()
@@ -1,14 +1,25 @@
+import json
+from typing import Iterator
+
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
 from app.controllers.base import BaseAPI
 from app.exceptions.http import HttpException
+from app.models import AsyncTask
 from app.serializers.async_task import AsyncTaskSerializer
+from app.serializers.query import QuerySerializer
 from app.serializers.status import StatusSerializer
-from app.service.async_task import AsyncTaskService
+from app.service.async_task import AsyncTaskService, TaskNotifier
 from app.utils import helper
 
+# longest long-poll wait, and interval of keep-alive comments on event streams, in seconds
+MAX_WAIT = 60
+KEEP_ALIVE = 15
+
 
 class AsyncTaskListAPI(BaseAPI):
     def get(self, request: Request) -> Response:
@@ -42,15 +53,31 @@ class AsyncTaskDetailAPI(BaseAPI):
         """
         Gets async task details list
 
+        With `If-None-Match` set to the ETag of the last response, answers 304 while the
+        task is unchanged. `wait` (seconds, at most MAX_WAIT) long-polls: the response is
+        held until the task changes, then sent as 200, or sent as 304 on timeout.
+
         :param request: request
         :return: response
         """
 
         try:
             helper.check_int('id parameter', id)
+            wait = QuerySerializer(request.query_params).get('wait', 0, 'int')
             self.check_user_token(request)
 
             task = AsyncTaskService().get_async_task(id)
+            etag = AsyncTaskService.get_etag(task)
+
+            if request.headers.get('If-None-Match') == etag:
+                timeout = min(max(wait, 0), MAX_WAIT)
+                if not task.is_running or not TaskNotifier.wait(
+                    task, TaskNotifier.state(task), timeout
+                ):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+                task = AsyncTaskService().get_async_task(id)
+                etag = AsyncTaskService.get_etag(task)
         except HttpException as e:
             return Response(
                 StatusSerializer(e.code, e.message).to_dict(),
@@ -60,9 +87,62 @@ class AsyncTaskDetailAPI(BaseAPI):
         return Response(
             AsyncTaskSerializer(task).to_dict(),
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
 
+class AsyncTaskEventsAPI(BaseAPI):
+    def get(self, request: Request, id: str) -> Response:
+        """
+        Stream async task changes as server-sent events
+
+        Sends a `progress` event with the task now and on every change, until the task
+        is no longer running. A comment line keeps idle connections open.
+
+        :param request: request
+        :param id: async task id
+        :return: response
+        """
+        try:
+            helper.check_int('id parameter', id)
+            self.check_user_token(request)
+
+            task = AsyncTaskService().get_async_task(id)
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        response = StreamingHttpResponse(self.stream(task), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+    def stream(self, task: AsyncTask) -> Iterator[str]:
+        """
+        Encode task changes as server-sent events
+        :param task: async task
+        :return: events
+        """
+        while True:
+            data = json.dumps(AsyncTaskSerializer(task).to_dict(), cls=JSONEncoder)
+            yield 'id: %s\nevent: progress\ndata: %s\n\n' % (
+                AsyncTaskService.get_etag(task),
+                data,
+            )
+
+            if not task.is_running:
+                return
+
+            known = TaskNotifier.state(task)
+            while not TaskNotifier.wait(task, known, KEEP_ALIVE):
+                yield ': keep-alive\n\n'
+
+            task = AsyncTaskService().get_async_task(task.pk)
+
+
 class AsyncTaskCancelAPI(BaseAPI):
     def put(self, request: Request, id: str) -> Response:
         """
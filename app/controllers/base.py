@@ -1,11 +1,13 @@
-from typing import Dict
+from typing import Dict, Optional
 
+from rest_framework import status
 from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from app.exceptions.http import HttpException
 from app.service.user import UserService
-from app.service.validateToken import validate_jwt
+from app.utils.etag import etag_matches
 
 
 class BaseAPI(APIView):
@@ -17,33 +19,29 @@ class BaseAPI(APIView):
         :param only_admin: accept only admin
         :return: current user as dictionary
         """
-        token = request.headers.get('Authorization')
-        if token is None:
-            raise HttpException(401, 'Token is missing')
-
-        token = token.replace('Bearer ', '')
-
-        # decode token
-        try:
-            current_user = validate_jwt(token)
-        except Exception:
-            raise HttpException(401, 'Invalid user token')
-
-        # check user exists
-        if not current_user:
-            raise HttpException(404, "User doesn't exist")
-
-        # check user exists
-        if not UserService().check_user_exists_by_email(current_user.get('unique_name')):
-            print(1)
-            current_user['role'] = 'admin'
-            logged_user = UserService().create_new_user_from_azure_token(current_user)
-        else:
-            print(2)
-            logged_user = UserService().get_user_info_by_email(current_user.get('unique_name'))
+        # resolved once per request by app.utils.middleware.CurrentUserMiddleware
+        if getattr(request, 'current_user_error', None) is not None:
+            raise request.current_user_error
+
+        logged_user = getattr(request, 'current_user', None)
+        if logged_user is None:
+            logged_user = UserService().get_current_user(request.headers.get('Authorization'))
 
         # check admin
         if only_admin and logged_user.get('role') != 'admin':
             raise HttpException(403, 'Only Admin users are allowed')
 
         return logged_user
+
+    def check_etag(self, request: Request, etag: str) -> Optional[Response]:
+        """
+        Answer a conditional GET whose If-None-Match holds the current ETag
+
+        :param request: request
+        :param etag: current ETag of the resource
+        :return: 304 response, None when the resource must be sent
+        """
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return None
@@ -2,12 +2,10 @@ import asyncio
 from typing import Callable
 
 from asgiref.sync import async_to_sync, sync_to_async
-from django.core.files.uploadedfile import (InMemoryUploadedFile,
-                                            SimpleUploadedFile)
 from django.urls import reverse
 from django.utils.decorators import classonlymethod
 from rest_framework import generics, status
-from rest_framework.parsers import MultiPartParser
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.request import Request
 from rest_framework.response import Response
 
@@ -17,12 +15,11 @@ from app.serializers.async_task import AsyncTaskSerializer
 from app.serializers.rule import RuleSerializer
 from app.serializers.status import StatusSerializer
 from app.serializers.test import TestSerializer
-from app.service.async_task import AsyncTaskService
 from app.service.file_import import FileImportService
 
 
 class FileImportApi(BaseAPI, generics.CreateAPIView):
-    parser_classes = [MultiPartParser]
+    parser_classes = [MultiPartParser, JSONParser]
 
     @classonlymethod
     def as_view(cls, **initkwargs) -> Callable:
@@ -35,31 +32,37 @@ class FileImportApi(BaseAPI, generics.CreateAPIView):
         return await self.create(request, *args, **kwargs)
 
     @staticmethod
-    def __create(request, filename, current_user, loop):
+    def __create(request, filename, current_user):
         if filename == 'rule':
             rule = FileImportService().import_rule(request.data.get('file'), current_user)
             return Response(RuleSerializer(rule).to_dict(), status=status.HTTP_201_CREATED)
 
         elif filename == 'project':
-            running = AsyncTaskService().get_running_tasks()
-            if len(running):
-                raise HttpException(
-                    409,
-                    'Another tasks already running: {}'.format(
-                        list(running.values_list('pk', flat=True))
-                    ),
+            # 409 only when another running import writes one of the projects of the file
+            if request.data.get('uploadId'):
+                task = FileImportService().submit_import_project_upload(
+                    request.data.get('uploadId'), current_user
+                )
+            else:
+                task = FileImportService().submit_import_project(
+                    request.data.get('file'), current_user
                 )
 
-            file = request.data.get('file')
-            if isinstance(file, InMemoryUploadedFile):
-                # Clone a new file for InMemoryUploadedFile.
-                # Because the old one will be closed by Django.
-                file = SimpleUploadedFile(file.name, file.read(), file.content_type)
-
-            task = AsyncTaskService().create_new_async_task(current_user)
-            loop.create_task(
-                sync_to_async(FileImportService().import_project)(file, task_id=task.pk)
+            return Response(
+                AsyncTaskSerializer(task).to_dict(),
+                status=status.HTTP_202_ACCEPTED,
+                headers={'location': reverse('retrieve-async-task', args=[task.pk])},
             )
+        elif filename == 'rules':
+            # a zip of rule workbooks, imported by a background job
+            if request.data.get('uploadId'):
+                task = FileImportService().submit_import_rules_upload(
+                    request.data.get('uploadId'), current_user
+                )
+            else:
+                task = FileImportService().submit_import_rules(
+                    request.data.get('file'), current_user
+                )
 
             return Response(
                 AsyncTaskSerializer(task).to_dict(),
@@ -80,10 +83,9 @@ class FileImportApi(BaseAPI, generics.CreateAPIView):
             current_user = await sync_to_async(self.check_user_token)(request)
             if current_user.get('role') != 'admin':
                 raise HttpException(403, 'Only Admin users are allowed')
-            if request.data.get('file') is None:
+            if request.data.get('file') is None and request.data.get('uploadId') is None:
                 raise HttpException(400, 'No file uploaded')
-            loop = asyncio.get_event_loop()
-            return await sync_to_async(self.__create)(request, filename, current_user, loop)
+            return await sync_to_async(self.__create)(request, filename, current_user)
         except HttpException as e:
             return Response(
                 StatusSerializer(e.code, e.message).to_dict(),
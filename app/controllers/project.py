@@ -1,13 +1,22 @@
+import json
+from typing import Any, Dict, Iterator, List
+
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from app.controllers.base import BaseAPI
 from app.exceptions.http import HttpException
+from app.models import Project
 from app.serializers.project import ProjectSerializer
+from app.serializers.query import QuerySerializer
+from app.serializers.selection import Selection
 from app.serializers.status import StatusSerializer
 from app.service.project import ProjectService
 from app.utils import helper
+from app.utils.etag import COLLECTION_TABLES, collection_etag, resource_etag
+from app.utils.response_cache import cached_response
 
 
 class ProjectDetailAPI(BaseAPI):
@@ -22,7 +31,13 @@ class ProjectDetailAPI(BaseAPI):
         try:
             # check id and user token
             helper.check_int('id parameter', id)
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
+
+            # answer a conditional GET before reading the project
+            etag = resource_etag(request, Project, id, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
 
             # get project
             project = ProjectService().get_project(id)
@@ -34,12 +49,16 @@ class ProjectDetailAPI(BaseAPI):
 
         # success
         return Response(
-            ProjectSerializer(project).to_dict(),
+            ProjectSerializer(
+                project, selection=Selection.from_query(request.query_params, 'vins')
+            ).to_dict(),
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
 
 class ProjectListAPI(BaseAPI):
+    @cached_response(COLLECTION_TABLES[Project])
     def get(self, request: Request) -> Response:
         """
         Get project list
@@ -49,7 +68,13 @@ class ProjectListAPI(BaseAPI):
         """
         try:
             # check user token
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
+
+            # answer a conditional GET before reading the projects
+            etag = collection_etag(request, Project, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
 
             # search project
             paging_dict = ProjectService().search_projects(request.query_params)
@@ -63,4 +88,63 @@ class ProjectListAPI(BaseAPI):
         return Response(
             paging_dict,
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
+
+
+class ProjectMatrixAPI(BaseAPI):
+    def get(self, request: Request, id: str) -> Response:
+        """
+        Get the columnar vin x test matrix of project
+
+        `tests` limits the columns to a comma separated list of test ids.
+        `stream=true` sends the header, then every chunk of `chunkSize` vins, as lines of NDJSON.
+
+        :param request: request
+        :param id: project id
+        :return: response
+        """
+        try:
+            # check id and user token
+            helper.check_int('id parameter', id)
+            self.check_user_token(request)
+
+            # get matrix
+            header, chunks = ProjectService().get_project_matrix(id, request.query_params)
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # stream
+        if QuerySerializer(request.query_params).get('stream') == 'true':
+            return StreamingHttpResponse(
+                self.stream(header, chunks), content_type='application/x-ndjson'
+            )
+
+        matrix = {**header, 'vins': [], 'values': [], 'qualifiers': []}
+        for chunk in chunks:
+            matrix['vins'].extend(chunk['vins'])
+            matrix['values'].extend(chunk['values'])
+            matrix['qualifiers'].extend(chunk['qualifiers'])
+
+        # success
+        return Response(
+            matrix,
+            status=status.HTTP_200_OK,
+        )
+
+    def stream(
+        self, header: Dict[str, Any], chunks: Iterator[Dict[str, List[Any]]]
+    ) -> Iterator[str]:
+        """
+        Encode the header and row chunks as NDJSON lines
+        :param header: matrix header
+        :param chunks: row chunks
+        :return: lines
+        """
+        yield json.dumps(header, separators=(',', ':')) + '\n'
+
+        for chunk in chunks:
+            yield json.dumps(chunk, separators=(',', ':')) + '\n'
@@ -0,0 +1,32 @@
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from app.controllers.base import BaseAPI
+from app.exceptions.http import HttpException
+from app.serializers.status import StatusSerializer
+from app.utils.response_cache import get_stats
+
+
+class ResponseCacheStatsAPI(BaseAPI):
+    def get(self, request: Request) -> Response:
+        """
+        Get the hits, misses and hit ratio of the cached views, only admin
+
+        :param request: request
+        :return: response
+        """
+        try:
+            # check user token - only admin
+            self.check_user_token(request, True)
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # success
+        return Response(
+            get_stats(),
+            status=status.HTTP_200_OK,
+        )
@@ -4,10 +4,14 @@ from rest_framework.response import Response
 
 from app.controllers.base import BaseAPI
 from app.exceptions.http import HttpException
+from app.models import Rule
 from app.serializers.rule import RuleSerializer
+from app.serializers.selection import Selection
 from app.serializers.status import StatusSerializer
 from app.service.rule import RuleService
 from app.utils import helper
+from app.utils.etag import COLLECTION_TABLES, collection_etag, resource_etag
+from app.utils.response_cache import cached_response
 
 
 class RuleDetailAPI(BaseAPI):
@@ -22,7 +26,13 @@ class RuleDetailAPI(BaseAPI):
         # check id parameter and user token
         try:
             helper.check_int('id parameter', id)
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
+
+            # answer a conditional GET before reading the rule
+            etag = resource_etag(request, Rule, id, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
 
             # get rule
             rule = RuleService().get_rule(id)
@@ -34,8 +44,11 @@ class RuleDetailAPI(BaseAPI):
 
         # success
         return Response(
-            RuleSerializer(rule).to_dict(),
+            RuleSerializer(
+                rule, selection=Selection.from_query(request.query_params, 'ruleVersions')
+            ).to_dict(),
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def delete(self, request: Request, id: str) -> Response:
@@ -87,6 +100,7 @@ class RuleDetailAPI(BaseAPI):
 
 
 class RuleListAPI(BaseAPI):
+    @cached_response(COLLECTION_TABLES[Rule])
     def get(self, request: Request) -> Response:
         """
         Get rule list
@@ -95,7 +109,13 @@ class RuleListAPI(BaseAPI):
         """
         try:
             # check validation and get current user dictionary
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
+
+            # answer a conditional GET before reading the rules
+            etag = collection_etag(request, Rule, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
 
             # search rules
             paging_dict = RuleService().search_rules(request.query_params)
@@ -109,6 +129,7 @@ class RuleListAPI(BaseAPI):
         return Response(
             paging_dict,
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def post(self, request: Request) -> Response:
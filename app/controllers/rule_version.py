@@ -4,11 +4,14 @@ from rest_framework.response import Response
 
 from app.controllers.base import BaseAPI
 from app.exceptions.http import HttpException
-from app.serializers.rule_version import RuleVersionSerializer
+from app.models import RuleVersion
 from app.serializers.rule_version_node import RuleVersionNodeSerializer
+from app.serializers.selection import Selection
 from app.serializers.status import StatusSerializer
 from app.service.rule import RuleVersionService
+from app.service.rule_version_document import RuleVersionDocumentService
 from app.utils import helper
+from app.utils.etag import collection_etag, resource_etag
 
 
 class RuleVersionDetailAPI(BaseAPI):
@@ -23,9 +26,20 @@ class RuleVersionDetailAPI(BaseAPI):
         try:
             # check id parameter and user token
             helper.check_int('id parameter', id)
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
 
-            rule_version = RuleVersionService().get_rule_version(id)
+            # answer a conditional GET before reading the rule version
+            etag = resource_etag(request, RuleVersion, id, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
+
+            rule_version = RuleVersionDocumentService().get_document(
+                id,
+                Selection.from_query(
+                    request.query_params, 'ruleTree,notes,tests,enabledVins.testResults'
+                ),
+            )
         except HttpException as e:
             return Response(
                 StatusSerializer(e.code, e.message).to_dict(),
@@ -34,8 +48,9 @@ class RuleVersionDetailAPI(BaseAPI):
 
         # success
         return Response(
-            RuleVersionSerializer(rule_version).to_dict(),
+            rule_version,
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def delete(self, request: Request, id: str) -> Response:
@@ -97,7 +112,13 @@ class RuleVersionListAPI(BaseAPI):
         # check id parameter and user token
         try:
             helper.check_int('id parameter', id)
-            self.check_user_token(request)
+            current_user = self.check_user_token(request)
+
+            # answer a conditional GET before reading the rule versions
+            etag = collection_etag(request, RuleVersion, current_user, id)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
 
             paging_dict = RuleVersionService().search_rule_versions(id, request.query_params)
         except HttpException as e:
@@ -110,6 +131,7 @@ class RuleVersionListAPI(BaseAPI):
         return Response(
             paging_dict,
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def post(self, request: Request, id: str) -> Response:
@@ -138,7 +160,7 @@ class RuleVersionListAPI(BaseAPI):
 
         # success
         return Response(
-            RuleVersionSerializer(created_rule_version).to_dict(),
+            RuleVersionDocumentService().get_document(created_rule_version.id),
             status=status.HTTP_201_CREATED,
         )
 
@@ -228,8 +250,7 @@ class RuleVersionModifyAPI(RuleVersionDetailAPI):
 
             # success
             if modify_type == 'convert' or modify_type == 'tests':
-                rule_version = RuleVersionService().get_rule_version(id)
-                return Response(RuleVersionSerializer(rule_version).to_dict())
+                return Response(RuleVersionDocumentService().get_document(id))
             else:
                 return Response(status=status.HTTP_204_NO_CONTENT)
         except HttpException as e:
@@ -257,8 +278,7 @@ class RuleVersionModifyAPI(RuleVersionDetailAPI):
                 # clone rule version
                 rule_version_id = RuleVersionService().clone_rule_version(current_user, id)
 
-                rule_version = RuleVersionService().get_rule_version(rule_version_id)
-                return Response(RuleVersionSerializer(rule_version).to_dict())
+                return Response(RuleVersionDocumentService().get_document(rule_version_id))
             else:
                 RuleVersionService().create_new_notes(current_user, modify_type, id, request.data)
         except HttpException as e:
@@ -8,6 +8,7 @@ from app.serializers.status import StatusSerializer
 from app.serializers.test_category import TestCategorySerializer
 from app.service.test_category import TestCategoryService
 from app.utils import helper
+from app.utils.response_cache import cached_response
 
 
 class TestCategoryAPI(BaseAPI):
@@ -108,6 +109,7 @@ class TestCategoryListAPI(BaseAPI):
 
 
 class TestCategoryWithTestListAPI(BaseAPI):
+    @cached_response(('test*',))
     def get(self, request: Request) -> Response:
         """
         Get test category list pagination
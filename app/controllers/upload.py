@@ -0,0 +1,112 @@
+import io
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from app.controllers.base import BaseAPI
+from app.exceptions.http import HttpException
+from app.serializers.query import QuerySerializer
+from app.serializers.status import StatusSerializer
+from app.serializers.upload import UploadSerializer
+from app.service.upload import UploadService
+from app.utils import helper
+
+
+class UploadListAPI(BaseAPI):
+    parser_classes = [JSONParser]
+
+    def post(self, request: Request) -> Response:
+        """
+        Start a chunked upload
+
+        :param request: request with `name`, `size` and `sha256` of the file
+        :return: response
+        """
+        try:
+            current_user = self.check_user_token(request)
+            upload = UploadService().create_upload(current_user, request.data)
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # success
+        return Response(
+            UploadSerializer(upload).to_dict(),
+            status=status.HTTP_201_CREATED,
+            headers={'location': reverse('retrieve-upload', args=[upload.pk])},
+        )
+
+
+class UploadDetailAPI(BaseAPI):
+    def get(self, request: Request, id: str) -> Response:
+        """
+        Get an upload, its offset is where to resume
+
+        :param request: request
+        :param id: upload id
+        :return: response
+        """
+        try:
+            current_user = self.check_user_token(request)
+            upload = UploadService().get_upload(id, current_user)
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # success
+        return Response(UploadSerializer(upload).to_dict(), status=status.HTTP_200_OK)
+
+    def put(self, request: Request, id: str) -> Response:
+        """
+        Append the raw request body at `offset`, which must be the offset of the upload
+
+        :param request: request
+        :param id: upload id
+        :return: response
+        """
+        try:
+            offset = QuerySerializer(request.query_params).get('offset', None)
+            if offset is None:
+                raise HttpException(400, 'offset parameter is required')
+            helper.check_int('offset parameter', offset)
+
+            current_user = self.check_user_token(request)
+            service = UploadService()
+            upload = service.get_upload(id, current_user)
+            upload = service.append_chunk(upload, int(offset), request.stream or io.BytesIO())
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # success
+        return Response(UploadSerializer(upload).to_dict(), status=status.HTTP_200_OK)
+
+    def delete(self, request: Request, id: str) -> Response:
+        """
+        Abort an upload
+
+        :param request: request
+        :param id: upload id
+        :return: response
+        """
+        try:
+            current_user = self.check_user_token(request)
+            service = UploadService()
+            service.delete_upload(service.get_upload(id, current_user))
+        except HttpException as e:
+            return Response(
+                StatusSerializer(e.code, e.message).to_dict(),
+                status=e.get_http_status(),
+            )
+
+        # success
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -4,14 +4,19 @@ from rest_framework.response import Response
 
 from app.controllers.base import BaseAPI
 from app.exceptions.http import HttpException
+from app.models import Workspace
+from app.serializers.selection import Selection
 from app.serializers.status import StatusSerializer
 from app.serializers.workspace import WorkspaceSerializer
 from app.serializers.workspace_expanded import WorkspaceExpandedSerializer
 from app.service.workspace import WorkspaceService
 from app.utils import helper
+from app.utils.etag import SHARED_TABLES, collection_etag, resource_etag
+from app.utils.response_cache import cached_response
 
 
 class WorkspaceDetailAPI(BaseAPI):
+    @cached_response(SHARED_TABLES[Workspace])
     def get(self, request: Request, id: str) -> Response:
         """
         Get workspace detail only user is a member
@@ -27,6 +32,12 @@ class WorkspaceDetailAPI(BaseAPI):
             # check is member
             WorkspaceService().check_is_member(id, current_user.get('id'))
 
+            # answer a conditional GET before reading the workspace
+            etag = resource_etag(request, Workspace, id, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
+
             # get workspace
             workspace = WorkspaceService().get_workspace(id)
         except HttpException as e:
@@ -37,8 +48,12 @@ class WorkspaceDetailAPI(BaseAPI):
 
         # success
         return Response(
-            WorkspaceExpandedSerializer(workspace).to_dict(),
+            WorkspaceExpandedSerializer(
+                workspace,
+                selection=Selection.from_query(request.query_params, 'members,projects,rules'),
+            ).to_dict(),
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def delete(self, request: Request, id: str) -> Response:
@@ -102,6 +117,12 @@ class WorkspaceListAPI(BaseAPI):
             # check user token
             current_user = self.check_user_token(request)
 
+            # answer a conditional GET before reading the workspaces
+            etag = collection_etag(request, Workspace, current_user)
+            not_modified = self.check_etag(request, etag)
+            if not_modified is not None:
+                return not_modified
+
             # search workspaces
             paging_dict = WorkspaceService().search_workspaces(current_user, request.query_params)
         except HttpException as e:
@@ -113,6 +134,7 @@ class WorkspaceListAPI(BaseAPI):
         return Response(
             paging_dict,
             status=status.HTTP_200_OK,
+            headers={'ETag': etag},
         )
 
     def post(self, request: Request) -> Response:
@@ -0,0 +1,139 @@
+import os
+import re
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from app.models import (AsyncTask, Project, ProjectsHasVin, SubVin, Test,
+                        TestCategory, User, Vin, VinTests)
+from app.service.file_import import FileImportService
+from app.utils import invalidation
+from app.utils.spreadsheet import SpreadsheetReader
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark of FileImportService.import_project throughput in rows per second. '
+        'Imports commit, so the writer threads see the fixtures, and the rows they created '
+        'are deleted after each run. The projects of the file must not exist yet, vins and '
+        'subvins that already exist keep the changes of the import.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='project spreadsheet')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError('No such file: %s' % path)
+
+        service = FileImportService()
+        with open(path, 'rb') as handle:
+            names = service.get_project_names(File(handle, name=os.path.basename(path)))
+        existing = Project.objects.filter(name__in=names).values_list('name', flat=True)
+        if existing:
+            raise CommandError('Projects of the file already exist: %s' % ', '.join(existing))
+
+        timings = []
+
+        for _ in range(options['repeat']):
+            task, created = self.prepare(path)
+            last_ids = {model: self.last_id(model) for model in (Vin, SubVin)}
+
+            try:
+                with open(path, 'rb') as handle:
+                    start = time.perf_counter()
+                    service.import_project(File(handle, name=os.path.basename(path)), task.pk)
+                    timings.append(time.perf_counter() - start)
+
+                task.refresh_from_db()
+            finally:
+                self.clean_up(names, last_ids, created)
+
+            if task.is_running or task.progress != 100:
+                raise CommandError('Import failed: %s' % task.result)
+
+        best = min(timings)
+        self.stdout.write('rows=%d tests=%d' % (self.rows, self.tests))
+        self.stdout.write('best:       %.3f s' % best)
+        self.stdout.write('throughput: %.0f rows/s' % (self.rows / best))
+
+    def prepare(self, path):
+        """
+        Create the benchmark user, task and the tests named in the header row
+        :param path: spreadsheet path
+        :return: (async task, rows created for the run)
+        """
+        header, self.rows = self.read_header(path)
+        names = {re.sub(r'\*qualifier\w*$', '', name, flags=re.IGNORECASE) for name in header[3:]}
+        self.tests = len(names)
+
+        created = []
+        category, is_new = TestCategory.objects.get_or_create(name='Benchmark')
+        for name in names:
+            test, is_new_test = Test.objects.get_or_create(
+                name=name, defaults=dict(test_category=category)
+            )
+            if is_new_test:
+                created.append(test)
+        if is_new:
+            created.append(category)
+
+        user, is_new = User.objects.get_or_create(
+            email='benchmark@example.com', defaults=dict(name='benchmark', role='admin')
+        )
+        task = AsyncTask.objects.create(user=user)
+        created.append(task)
+        if is_new:
+            created.append(user)
+
+        return task, created
+
+    @staticmethod
+    def last_id(model):
+        """
+        Get the highest id of a table
+        :param model: model
+        :return: id, 0 for an empty table
+        """
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def clean_up(self, names, last_ids, created):
+        """
+        Delete the rows of an import run and its fixtures
+        :param names: project names of the file
+        :param last_ids: highest Vin and SubVin ids before the run
+        :param created: fixtures created for the run, deleted in order
+        :return: void
+        """
+        with transaction.atomic():
+            VinTests.objects.filter(project__name__in=names).delete()
+            ProjectsHasVin.objects.filter(project__name__in=names).delete()
+            Project.objects.filter(name__in=names).delete()
+            SubVin.objects.filter(pk__gt=last_ids[SubVin]).delete()
+            Vin.objects.filter(pk__gt=last_ids[Vin]).delete()
+            for row in created:
+                row.delete()
+
+            # queryset deletes send no signals
+            for model in (VinTests, ProjectsHasVin, Project, Vin):
+                invalidation.publish(model)
+
+    def read_header(self, path):
+        """
+        Read the header row and data row count of the spreadsheet
+        :param path: spreadsheet path
+        :return: (header, row count)
+        """
+        with open(path, 'rb') as handle:
+            reader = SpreadsheetReader(File(handle, name=os.path.basename(path)))
+            total = reader.total
+            if total is None:
+                total = sum(len(rows) for rows in reader.chunks(1000))
+            reader.close()
+
+        return reader.header, total
@@ -0,0 +1,94 @@
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from app.parser.Sankey.parse_to_json_tracker import (
+    get_vin_matrix, get_vin_matrix_from_columns)
+from app.service.rule_function import RuleFunctionService
+
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmark of the Sankey request decode, from the JSON body to the '
+        "engine's vin matrix, for the per-vin and the columnar formats (no parsing)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vins', type=int, default=50000)
+        parser.add_argument('--tests', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        legacy, columnar = self.build_payloads(options['vins'], options['tests'])
+        service = RuleFunctionService.__new__(RuleFunctionService)
+
+        def decode_legacy(body):
+            data = json.loads(body)
+            vins = data['vins']
+            measurements = {v.get('name'): v.get('testResults') for v in vins}
+            qualifiers = {v.get('name'): v.get('qualifiers', '') for v in vins}
+            return get_vin_matrix(measurements, qualifiers)
+
+        def decode_columnar(body):
+            data = json.loads(body)
+            service.check_columns(data)
+            return get_vin_matrix_from_columns(
+                data['tests'], data['vins'], data['values'], data['qualifiers']
+            )
+
+        if decode_legacy(legacy) != decode_columnar(columnar):
+            self.stderr.write('per-vin and columnar matrices differ')
+
+        self.stdout.write('vins=%d tests=%d' % (options['vins'], options['tests']))
+        for name, decode, body in (
+            ('per-vin', decode_legacy, legacy),
+            ('columnar', decode_columnar, columnar),
+        ):
+            parse_time = min(
+                timeit.repeat(lambda: json.loads(body), number=1, repeat=options['repeat'])
+            )
+            decode_time = min(
+                timeit.repeat(lambda: decode(body), number=1, repeat=options['repeat'])
+            )
+            self.stdout.write(
+                '%-9s body: %6.1f MB  json: %.3f s  json + matrix: %.3f s'
+                % (name, len(body) / 1e6, parse_time, decode_time)
+            )
+
+    def build_payloads(self, vin_count, test_count):
+        """
+        Build the same request body in both formats
+        :param vin_count: vin count
+        :param test_count: test count
+        :return: (per-vin body, columnar body)
+        """
+        rng = random.Random(0)
+        tests = ['I.BRK/test-%02d test' % i for i in range(test_count)]
+        vins, values, qualifiers = [], [], []
+
+        for i in range(vin_count):
+            vins.append('VIN%08d' % i)
+            values.append(
+                [round(rng.random() * 100, 2) if rng.random() > 0.1 else None for _ in tests]
+            )
+            qualifiers.append(
+                [rng.choice(('AR', 'BR')) if rng.random() < 0.05 else None for _ in tests]
+            )
+
+        legacy = {
+            'vins': [
+                {
+                    'name': vin,
+                    'testResults': {t: v for t, v in zip(tests, row) if v is not None},
+                    'qualifiers': {
+                        t + ' QUALIFIER': q for t, q in zip(tests, qualifier_row) if q is not None
+                    },
+                }
+                for vin, row, qualifier_row in zip(vins, values, qualifiers)
+            ]
+        }
+        columnar = {'tests': tests, 'vins': vins, 'values': values, 'qualifiers': qualifiers}
+
+        return json.dumps(legacy), json.dumps(columnar)
@@ -0,0 +1,141 @@
+import datetime
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from app.models import (RuleVersion, RuleVersionNode, RuleVersionNodeNote,
+                        RuleVersionNote, Test, TestCategory, User, Vin,
+                        VinTests)
+from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
+from app.serializers.rule_version import RuleVersionSerializer
+
+BOOKKEEPING = {'fields', 'omit_none', 'relations', 'selection', '_field_defaults'}
+
+
+def reflective_to_dict(self):
+    """
+    The former dir()-based BaseSerializer.to_dict, kept as the benchmark baseline
+    """
+    fields = [
+        attr
+        for attr in dir(self)
+        if not hasattr(getattr(self, attr), '__call__')
+        and not attr.startswith('__')
+        and attr not in BOOKKEEPING
+    ]
+
+    return {field: getattr(self, field) for field in fields}
+
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmark of the compiled serializers against dir() reflection '
+        'on a large in-memory RuleVersionSerializer payload (no database access)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vins', type=int, default=2000)
+        parser.add_argument('--tests', type=int, default=40)
+        parser.add_argument('--nodes', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rule_version, loader = self.build_payload(
+            options['vins'], options['tests'], options['nodes']
+        )
+        serialize = lambda: RuleVersionSerializer(rule_version, loader).to_dict()
+
+        compiled = serialize()
+        compiled_time = min(timeit.repeat(serialize, number=1, repeat=options['repeat']))
+
+        patched = self.patch(reflective_to_dict)
+        try:
+            reflective = serialize()
+            reflective_time = min(timeit.repeat(serialize, number=1, repeat=options['repeat']))
+        finally:
+            self.patch(None, patched)
+
+        if compiled != reflective:
+            self.stderr.write('compiled and reflective output differ')
+
+        self.stdout.write(
+            'vins=%d tests=%d nodes=%d' % (options['vins'], options['tests'], options['nodes'])
+        )
+        self.stdout.write('reflective: %.3f s' % reflective_time)
+        self.stdout.write('compiled:   %.3f s' % compiled_time)
+        self.stdout.write('speedup:    %.1fx' % (reflective_time / compiled_time))
+
+    def patch(self, to_dict, previous=None):
+        """
+        Swap BaseSerializer.to_dict, which every serializer goes through
+        :param to_dict: replacement, or None to restore
+        :param previous: value returned by the patching call when restoring
+        :return: original to_dict
+        """
+        if previous is not None:
+            BaseSerializer.to_dict = previous
+            return previous
+
+        original = BaseSerializer.__dict__['to_dict']
+        BaseSerializer.to_dict = to_dict
+
+        return original
+
+    def build_payload(self, vin_count, test_count, node_count):
+        """
+        Build an unsaved rule version and a loader filled by hand
+        :param vin_count: enabled vin count
+        :param test_count: test results per vin
+        :param node_count: rule tree size
+        :return: (rule version, loader)
+        """
+        today = datetime.date.today()
+        user = User(id=1, name='benchmark', email='benchmark@example.com', role='admin')
+        category = TestCategory(id=1, name='Brake')
+        tests = [Test(id=i, name='TEST %d' % i, test_category=category) for i in range(test_count)]
+        rule_version = RuleVersion(
+            id=1,
+            rule_id=1,
+            version_number='v1.0',
+            user=user,
+            date_created=today,
+            date_modified=today,
+            state='Draft',
+            text='',
+        )
+
+        loader = RelationLoader()
+        loader.tests_by_rule_version[1] = tests[:1]
+
+        for node_id in range(1, node_count + 1):
+            loader.nodes_by_rule_version[1].append(
+                RuleVersionNode(
+                    node_id=node_id,
+                    rule_text='IF TEST %d > 1 THEN' % node_id,
+                    rule_version_id=1,
+                    parent_id=node_id - 1 or None,
+                )
+            )
+            loader.node_notes[(1, node_id)].append(
+                RuleVersionNodeNote(
+                    user=user, date_created=today, node_id=node_id, rule_version_id=1, notes='n'
+                )
+            )
+        loader.notes_by_rule_version[1].append(
+            RuleVersionNote(user=user, date_created=today, rule_version_id=1, notes='n')
+        )
+
+        for vin_id in range(vin_count):
+            loader.vins_by_rule_version[1].append(Vin(id=vin_id, name='VIN%08d' % vin_id))
+            loader.vin_tests_by_vin[vin_id] = [
+                VinTests(
+                    tests=test,
+                    vin_id=vin_id,
+                    value=str(vin_id * test.id),
+                    qualifier='Q' if test.id % 4 == 0 else None,
+                )
+                for test in tests
+            ]
+
+        return rule_version, loader
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.models import RuleVersion
+from app.service.rule_version_document import CHUNK_SIZE, RuleVersionDocumentService
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the denormalized document of every rule version again, in batches, '
+        'e.g. after a deploy or to repair documents written outside the service'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=CHUNK_SIZE, help='rule versions per transaction'
+        )
+
+    def handle(self, *args, **options):
+        total = RuleVersion.objects.count()
+        started = time.monotonic()
+        done = 0
+
+        for ids in RuleVersionDocumentService().rebuild(options['batch_size']):
+            done += len(ids)
+            self.stdout.write('%d / %d rule versions' % (done, total))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Rebuilt %d documents in %.1fs' % (done, time.monotonic() - started)
+            )
+        )
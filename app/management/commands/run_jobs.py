@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.service.job_queue import JobQueueService
+from app.utils.job_process import init_process, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (AsyncTask with a kind) on a process pool. '
+        'Several workers can run against the same database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='pool size, default settings.JOB_WORKERS; 0 runs jobs in this process',
+        )
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes is None:
+            processes = settings.JOB_WORKERS
+        worker = '%s:%d' % (socket.gethostname(), os.getpid())
+        self.stopping = False
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write('Worker %s, %d processes' % (worker, processes))
+
+        if processes == 0:
+            self.run_inline(worker, options['once'], settings.JOB_POLL_INTERVAL)
+        else:
+            self.run_pool(worker, processes, options['once'], settings.JOB_POLL_INTERVAL)
+
+    def stop(self, signum, frame):
+        """
+        Stop claiming jobs, running ones finish
+        """
+        self.stdout.write('Stopping after the running jobs')
+        self.stopping = True
+
+    def run_inline(self, worker, once, poll):
+        """
+        Run jobs one at a time in this process, used with SQLite test databases
+        :param worker: worker id
+        :param once: exit when the queue is empty
+        :param poll: seconds between polls of an empty queue
+        :return: void
+        """
+        while not self.stopping:
+            tasks = JobQueueService.claim(worker)
+            for task in tasks:
+                self.stdout.write('Job %d (%s)' % (task.pk, task.kind))
+                JobQueueService.run(task.pk, worker)
+
+            if not tasks:
+                if once:
+                    return
+                time.sleep(poll)
+
+    def run_pool(self, worker, processes, once, poll):
+        """
+        Claim at most one job per free process and run them on the pool
+        :param worker: worker id
+        :param processes: pool size
+        :param once: exit when the queue is empty
+        :param poll: seconds between polls of an empty queue
+        :return: void
+        """
+        # spawned processes do not share the connection of this one
+        context = multiprocessing.get_context('spawn')
+        running = set()
+
+        with ProcessPoolExecutor(processes, context, init_process) as pool:
+            while not self.stopping:
+                tasks = JobQueueService.claim(worker, processes - len(running))
+                for task in tasks:
+                    self.stdout.write('Job %d (%s)' % (task.pk, task.kind))
+                    running.add(pool.submit(run_job, task.pk, worker))
+
+                if not running and once:
+                    return
+
+                if running:
+                    done, running = wait(running, poll, FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is not None:
+                            self.stderr.write('Job failed: %s' % future.exception())
+                elif not tasks:
+                    time.sleep(poll)
+
+            wait(running)
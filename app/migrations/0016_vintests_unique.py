@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+def merge_duplicate_vin_tests(apps, schema_editor):
+    """
+    Keep one row per (project, vin, tests) before adding the unique key. Imports used
+    to add a new row on every re-import and readers used the latest one, so the kept
+    row gets the latest value and the latest qualifier.
+    """
+    VinTests = apps.get_model('app', 'VinTests')
+
+    duplicates = (
+        VinTests.objects.values_list('project_id', 'vin_id', 'tests_id')
+        .order_by()
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+
+    for project_id, vin_id, tests_id, _ in duplicates.iterator():
+        rows = list(
+            VinTests.objects.filter(project_id=project_id, vin_id=vin_id, tests_id=tests_id)
+            .order_by('id')
+        )
+        latest = rows[-1]
+        qualifiers = [row.qualifier for row in rows if row.qualifier is not None]
+        latest.qualifier = qualifiers[-1] if qualifiers else None
+        latest.save(update_fields=['qualifier'])
+        VinTests.objects.filter(id__in=[row.id for row in rows[:-1]]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0015_asynctask'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_vin_tests, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='vintests',
+            unique_together={('project', 'vin', 'tests')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0016_vintests_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportLock',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=128, unique=True)),
+                (
+                    'task',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to='app.asynctask'
+                    ),
+                ),
+            ],
+            options={
+                'db_table': 'import_locks',
+            },
+        ),
+    ]
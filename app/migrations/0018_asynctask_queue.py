@@ -0,0 +1,51 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0017_importlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asynctask',
+            name='kind',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='payload',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='max_attempts',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='run_after',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='locked_by',
+            field=models.CharField(max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='locked_until',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='asynctask',
+            index=models.Index(fields=['is_running', 'kind'], name='async_tasks_queue'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:51
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0018_asynctask_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                (
+                    'id',
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('path', models.CharField(max_length=1024)),
+                ('is_complete', models.BooleanField(default=False)),
+                (
+                    'user',
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.user'),
+                ),
+            ],
+            options={
+                'db_table': 'uploads',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-18 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0019_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asynctask',
+            name='file_hash',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctask',
+            name='checkpoint',
+            field=models.JSONField(null=True),
+        ),
+    ]
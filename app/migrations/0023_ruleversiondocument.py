@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 00:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0022_resourceversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleVersionDocument',
+            fields=[
+                (
+                    'rule_version',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        primary_key=True,
+                        serialize=False,
+                        to='app.RuleVersion',
+                    ),
+                ),
+                ('document', models.JSONField()),
+            ],
+            options={
+                'db_table': 'rule_version_documents',
+            },
+        ),
+    ]
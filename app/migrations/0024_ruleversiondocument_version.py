@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-19 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0023_ruleversiondocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ruleversiondocument',
+            name='document',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='ruleversiondocument',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-19 01:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('app', '0024_ruleversiondocument_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -293,6 +293,7 @@ class VinTests(models.Model):
     qualifier = models.CharField(max_length=100, null=True)
 
     class Meta:
+        unique_together = (('project', 'vin', 'tests'),)
         db_table = 'vin_tests'
 
 
@@ -306,16 +307,124 @@ class AsyncTask(models.Model):
     progress = models.PositiveIntegerField(default=0, validators=[MaxValueValidator(100)])
     is_running = models.BooleanField(default=True)
     result = models.JSONField(null=True)
+    # queued job (see app.service.job_queue), kind is null for tasks run in the request process
+    kind = models.CharField(max_length=64, null=True)
+    payload = models.JSONField(null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_after = models.DateTimeField(null=True)
+    locked_by = models.CharField(max_length=128, null=True)
+    locked_until = models.DateTimeField(null=True)
+    # last committed chunk of a project import and the SHA-256 of its file, to resume it
+    file_hash = models.CharField(max_length=64, null=True, db_index=True)
+    checkpoint = models.JSONField(null=True)
 
     class Meta:
         db_table = 'async_tasks'
+        indexes = [models.Index(fields=['is_running', 'kind'], name='async_tasks_queue')]
 
     @property
     def is_finished(self):
         return not self.is_running and self.progress == 100
 
+    def finish(self, result=None) -> bool:
+        """
+        Finish the task at 100% with a single UPDATE guarded by is_running, so a cancel
+        written meanwhile wins and the lease columns of its worker are left alone
+        :param result: task result
+        :return: False when the task was cancelled
+        """
+        finished = AsyncTask.objects.filter(pk=self.pk, is_running=True).update(
+            progress=100, is_running=False, result=result, checkpoint=None
+        )
+
+        self.is_running = False
+        if finished:
+            self.progress = 100
+            self.result = result
+            self.checkpoint = None
+
+        return bool(finished)
+
     def finish_with_error(self, error: str):
+        if AsyncTask.objects.filter(pk=self.pk, is_running=True).update(
+            is_running=False, result=error
+        ):
+            self.result = error
         self.is_running = False
-        self.result = error
-        self.save()
         return self
+
+
+class ImportLock(models.Model):
+    """
+    Project name locked by a running import
+    """
+
+    id = models.AutoField(primary_key=True, null=False)
+    name = models.CharField(max_length=128, unique=True)
+    task = models.ForeignKey(AsyncTask, null=False, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'import_locks'
+
+
+class Upload(models.Model):
+    """
+    File uploaded in chunks, appended to `path` until `offset` reaches `size`
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date_created = models.DateTimeField(auto_now_add=True, null=False)
+    date_updated = models.DateTimeField(auto_now=True, null=False)
+    user = models.ForeignKey(User, null=False, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255, null=False)
+    size = models.PositiveBigIntegerField(null=False)
+    sha256 = models.CharField(max_length=64, null=False)
+    offset = models.PositiveBigIntegerField(default=0)
+    path = models.CharField(max_length=1024, null=False)
+    is_complete = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'uploads'
+
+
+class CacheVersion(models.Model):
+    """
+    Version of a table, bumped after its rows change so every process drops its caches
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'cache_versions'
+
+
+class ResourceVersion(models.Model):
+    """
+    Version of a rule, rule version, project or workspace, named `<table>:<id>`, bumped
+    after a change of its payload
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'resource_versions'
+
+
+class RuleVersionDocument(models.Model):
+    """
+    Rule version serialized with every relation expanded, rewritten by the rule version
+    write paths (see app.service.rule_version_document). `document` is null once expired,
+    and `version` counts the writes that rewrote or expired it.
+    """
+
+    rule_version = models.OneToOneField(
+        RuleVersion, primary_key=True, null=False, on_delete=models.PROTECT
+    )
+    document = models.JSONField(null=True)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'rule_version_documents'
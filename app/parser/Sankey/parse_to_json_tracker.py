@@ -2,7 +2,7 @@ import json
 import math
 import re
 import threading
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 import ply.lex as lex
 import ply.yacc as yacc
@@ -1152,9 +1152,7 @@ def adjust_qualifier_name(test_name: str) -> str:
     return adjusted_qualifier_name.strip()
 
 
-def get_script_dot(
-    text: str,
-    ams: Dict[str, List[str]],
+def get_vin_matrix(
     measurements: Dict[str, Dict[str, float]],
     qualifiers: Dict[str, Union[Dict[str, str], str]],
 ):
@@ -1163,7 +1161,6 @@ def get_script_dot(
     #   'vin': {...}, ...}
     vin_measures = {}  # .clear()
     vin_qualifiers = {}
-    vin_qualifiers.clear()
 
     all_vin_names = set()
     all_test_names = set()
@@ -1179,7 +1176,6 @@ def get_script_dot(
             # set qualifiers for test names to be empty by default
             vin_qualifiers[vin_name][adjusted_test_name] = 'EMPTY'
 
-    print(f'QUALIFIERS {qualifiers}')
     for vin_name in qualifiers:
         if vin_name not in vin_qualifiers:
             vin_qualifiers[vin_name] = {}
@@ -1196,8 +1192,60 @@ def get_script_dot(
             if test not in vin_qualifiers[vin_name]:
                 vin_qualifiers[vin_name][test] = 'EMPTY'
 
-    print(f'QUALIFIERS2 {vin_qualifiers}')
+    return vin_measures, vin_qualifiers
+
+
+def get_vin_matrix_from_columns(
+    tests: List[str],
+    vins: List[str],
+    values: List[List[Optional[float]]],
+    qualifiers: Optional[List[List[Optional[str]]]] = None,
+):
+    # columnar form of the same matrix:
+    # tests: ['test_name', ...], vins: ['vin', ...],
+    # values[i][j] / qualifiers[i][j]: cell of vins[i] and tests[j],
+    # None where there is no measurement / qualifier.
+    # Test names are normalized once per column, not once per cell.
+    test_names = [adjust_test_name(test) for test in tests]
+    measured = set()
+    vin_measures = {}
+    vin_qualifiers = {}
+
+    for vin_name, row in zip(vins, values):
+        if None in row:
+            cells = {
+                test_name: value
+                for test_name, value in zip(test_names, row)
+                if value is not None
+            }
+            measured.update(cells)
+        else:
+            cells = dict(zip(test_names, row))
+            if len(measured) < len(test_names):
+                measured.update(test_names)
+        vin_measures[vin_name] = cells
+
+    # qualifiers of every measured test are empty by default
+    measured = [test_name for test_name in test_names if test_name in measured]
+    for vin_name in vin_measures:
+        vin_qualifiers[vin_name] = dict.fromkeys(measured, 'EMPTY')
+
+    if qualifiers is not None:
+        for vin_name, row in zip(vins, qualifiers):
+            vin_qualifiers[vin_name].update(
+                (test_name, qualifier)
+                for test_name, qualifier in zip(test_names, row)
+                if qualifier)
+
+    return vin_measures, vin_qualifiers
 
+
+def run_script_dot(
+    text: str,
+    ams: Dict[str, List[str]],
+    vin_measures: Dict[str, Dict[str, float]],
+    vin_qualifiers: Dict[str, Dict[str, str]],
+):
     adjusted_ams = {}
     for i, key in enumerate(ams):
         adjusted_tests = []
@@ -1213,10 +1261,32 @@ def get_script_dot(
         vin_measures=vin_measures,
         vin_qualifiers=vin_qualifiers,
     )
-    print(f'r is {r}')
     return f'{r}'
 
 
+def get_script_dot(
+    text: str,
+    ams: Dict[str, List[str]],
+    measurements: Dict[str, Dict[str, float]],
+    qualifiers: Dict[str, Union[Dict[str, str], str]],
+):
+    vin_measures, vin_qualifiers = get_vin_matrix(measurements, qualifiers)
+    return run_script_dot(text, ams, vin_measures, vin_qualifiers)
+
+
+def get_script_dot_from_columns(
+    text: str,
+    ams: Dict[str, List[str]],
+    tests: List[str],
+    vins: List[str],
+    values: List[List[Optional[float]]],
+    qualifiers: Optional[List[List[Optional[str]]]] = None,
+):
+    vin_measures, vin_qualifiers = get_vin_matrix_from_columns(
+        tests, vins, values, qualifiers)
+    return run_script_dot(text, ams, vin_measures, vin_qualifiers)
+
+
 def get_sankey_info(inps: Dict[
     str,
     Union[
@@ -1229,6 +1299,10 @@ def get_sankey_info(inps: Dict[
 ]):
     text = inps['ruleText']
     ams = inps['ams']
+    if 'values' in inps:
+        return get_script_dot_from_columns(text, ams, inps['tests'],
+                                           inps['vins'], inps['values'],
+                                           inps.get('qualifiers'))
     measurements = inps['vins']
     qualifiers = inps['vinsQualifiers']
     return get_script_dot(text, ams, measurements, qualifiers)
@@ -1,7 +1,7 @@
 import io
 import math
 from contextlib import redirect_stderr
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 import ply.lex as lex
@@ -9,7 +9,11 @@ import ply.yacc as yacc
 from ply.yacc import LRParser
 
 import app.parser.constants as constants
-from app.parser.constants import ERROR_TEXT, reserved
+# token names and regular expression rules, read by lex from this module
+from app.parser.constants import (ERROR_TEXT, reserved, t_COMMA, t_COMP,
+                                  t_ignore, t_LPAREN, t_MATH_OPER, t_NUM,
+                                  t_NUM_FOLD, t_NUMNM, t_NUMUM, t_RPAREN,
+                                  tokens)
 from app.parser.ParserErrors import (IncompleteRuleError,
                                      IncorrectGrammarError, LexError)
 
@@ -502,6 +506,38 @@ def get_lexer():
     return lex.lex()
 
 
+def split_rule_nodes(text: str, lexer=None) -> List[Dict[str, Any]]:
+    """
+    Split plain rule text into rule version nodes, a new node at every THEN and OTHERWISE
+    :param text: rule text
+    :param lexer: lexer to reuse, a new one is built when None
+    :return: nodes with id, text and parentId
+    """
+    lexer = lexer or get_lexer()
+    lexer.input(text)
+    counter = 1
+    tokens = []
+    parent_id = None
+    nodes = []
+
+    while True:
+        token = lexer.token()
+        if not token or token.value == 'THEN' or token.value == 'OTHERWISE':
+            nodes.append(dict(id=counter, text=' '.join(tokens), parentId=parent_id))
+            tokens = token and [token.value]
+            counter += 1
+            if not token:
+                break
+            if token.value == 'THEN':
+                parent_id = counter - 1
+        else:
+            if token.type == 'PRINT_VAL':
+                token.value = '"' + token.value + '"'
+            tokens.append(token.value)
+
+    return nodes
+
+
 def set_mappings(p: LRParser, ams: Optional[Tuple[None, None, None]]) -> None:
     if ams is not None:
         p.test_mappings = ams
@@ -7,6 +7,8 @@ class AsyncTaskSerializer(BaseSerializer):
     Async task serializer
     """
 
+    fields = ('id', 'dateCreated', 'userId', 'progress', 'isRunning', 'result')
+
     id = 0
     dateCreated = None
     userId = 0
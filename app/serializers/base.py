@@ -1,20 +1,145 @@
-from typing import Any, Dict
+import ast
+import copy
+from typing import Any, Dict, Tuple
 
 
-class BaseSerializer:
+def _literal(value: Any) -> str:
+    """
+    Source for a default value; literals are inlined so every instance gets a fresh copy
+    :param value: default value
+    :return: python expression or None when the value is not a literal
+    """
+    source = repr(value)
+
+    try:
+        if ast.literal_eval(source) == value:
+            return source
+    except (ValueError, SyntaxError):
+        pass
+
+    return None
+
+
+class SerializerMeta(type):
+    """
+    Compiles a serializer class from its declared `fields`
+
+    Class-level values of declared fields become per-instance defaults, the fields
+    become `__slots__` and `to_dict` / `_set_defaults` are generated once, when the
+    class is created.
+    """
+
+    def __new__(mcs, name: str, bases: Tuple[type, ...], namespace: Dict[str, Any]):
+        declared = tuple(namespace.get('fields', ()))
+        inherited = tuple(field for base in bases for field in getattr(base, 'fields', ()))
+        defaults = {}
+
+        for field in declared:
+            if field in namespace:
+                defaults[field] = namespace.pop(field)
+
+        namespace['fields'] = inherited + tuple(f for f in declared if f not in inherited)
+        namespace['__slots__'] = tuple(namespace.get('__slots__', ())) + tuple(
+            f for f in declared if f not in inherited
+        )
+
+        cls = super().__new__(mcs, name, bases, namespace)
+
+        all_defaults = {}
+        for base in reversed(cls.__mro__[1:]):
+            all_defaults.update(getattr(base, '_field_defaults', {}))
+        all_defaults.update(defaults)
+        cls._field_defaults = all_defaults
+
+        mcs.compile(cls)
+
+        return cls
+
+    @staticmethod
+    def compile(cls) -> None:
+        """
+        Generate `to_dict` and `_set_defaults` for the class
+        :param cls: serializer class
+        :return: void
+        """
+        scope = {'_defaults': cls._field_defaults, '_copy': copy.deepcopy}
+
+        lines = ['def _set_defaults(self):']
+        for field, value in cls._field_defaults.items():
+            source = _literal(value)
+            if source is None:
+                source = '_copy(_defaults[%r])' % field
+            lines.append('    self.%s = %s' % (field, source))
+        lines.append('    pass')
+
+        # keys are emitted in alphabetical order, as the former dir()-based to_dict did
+        fields = sorted(cls.fields)
+        if cls.__dict__.get('omit_none', getattr(cls, 'omit_none', False)):
+            lines.append('def to_dict(self):')
+            lines.append('    result = {}')
+            for field in fields:
+                lines.append('    value = self.%s' % field)
+                lines.append('    if value is not None:')
+                lines.append('        result[%r] = value' % field)
+            lines.append('    return result')
+        else:
+            lines.append('def to_dict(self):')
+            lines.append(
+                '    return {%s}' % ', '.join('%r: self.%s' % (field, field) for field in fields)
+            )
+
+        exec(compile('\n'.join(lines), '<serializer %s>' % cls.__qualname__, 'exec'), scope)
+
+        cls._set_defaults = scope['_set_defaults']
+        cls._compiled_to_dict = scope['to_dict']
+
+
+class BaseSerializer(metaclass=SerializerMeta):
     """
     base serializer
+
+    Subclasses declare their output keys in `fields`; a class-level value of a
+    declared field is used as the default for each instance.
+    `omit_none = True` leaves None values out of the dictionary.
+    `relations` maps output keys to the `expand` name that embeds them.
     """
 
+    __slots__ = ('selection',)
+
+    fields = ()
+    omit_none = False
+    relations = {}
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls)
+        self.selection = None
+        self._set_defaults()
+        return self
+
     def to_dict(self) -> Dict[str, Any]:
         """
         change class to dictionary
         :return: dictionary
         """
-        fields = [
-            attr
-            for attr in dir(self)
-            if not hasattr(getattr(self, attr), '__call__') and not attr.startswith('__')
-        ]
+        result = self._compiled_to_dict()
+
+        if self.selection is not None:
+            result = self.selection.prune(result, self.relations)
 
-        return {field: getattr(self, field) for field in fields}
+        return result
+
+    def expands(self, relation: str) -> bool:
+        """
+        Check the relation should be loaded and embedded
+        :param relation: expand name
+        :return: boolean
+        """
+        return self.selection is None or self.selection.expands(relation)
+
+    def child(self, relation: str):
+        """
+        Get the selection for an embedded relation
+        :param relation: expand name
+        :return: selection, None for the full payload
+        """
+        return None if self.selection is None else self.selection.child(relation)
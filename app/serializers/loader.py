@@ -0,0 +1,268 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models import (Project, ProjectsHasVin, Rule, RuleVersion,
+                        RuleVersionHasVin, RuleVersionNode,
+                        RuleVersionNodeNote, RuleVersionNote,
+                        RuleVersionsHasTests, Test, User, Vin, VinTests,
+                        Workspace, WorkspacesMember, WorkspacesProject,
+                        WorkspacesRule)
+from app.serializers.selection import Selection
+
+# keep every IN (...) list below the SQLite host parameter limit
+CHUNK_SIZE = 500
+
+
+def expands(selection: Optional[Selection], relation: str) -> bool:
+    """
+    Check a relation is selected; no selection loads everything
+    :param selection: selection or None
+    :param relation: expand name
+    :return: boolean
+    """
+    return selection is None or selection.expands(relation)
+
+
+def child(selection: Optional[Selection], relation: str) -> Optional[Selection]:
+    """
+    Get the selection of a relation; no selection loads everything
+    :param selection: selection or None
+    :param relation: expand name
+    :return: selection or None
+    """
+    return None if selection is None else selection.child(relation)
+
+
+class RelationLoader:
+    """
+    relation loader
+
+    Collects the keys of a whole page of objects, fetches every related table
+    once and serves the serializers from in-memory maps. Relations left out of
+    the given selection are not queried at all.
+
+    load_workspaces(): load members, projects and rules of workspaces
+    load_workspace_ids(): load member, project and rule ids of workspaces
+    load_projects(): load vins of projects
+    load_rules(): load rule versions of rules
+    load_rule_versions(): load nodes, notes, vins and tests of rule versions
+    load_node_notes(): load notes of rule version nodes
+    load_vin_tests(): load test results of vins
+    """
+
+    def __init__(self) -> None:
+        self.members_by_workspace: Dict[int, List[User]] = defaultdict(list)
+        self.projects_by_workspace: Dict[int, List[Project]] = defaultdict(list)
+        self.rules_by_workspace: Dict[int, List[Rule]] = defaultdict(list)
+        self.member_ids_by_workspace: Dict[int, List[int]] = defaultdict(list)
+        self.project_ids_by_workspace: Dict[int, List[int]] = defaultdict(list)
+        self.rule_ids_by_workspace: Dict[int, List[int]] = defaultdict(list)
+        self.vins_by_project: Dict[int, List[Vin]] = defaultdict(list)
+        self.rule_versions_by_rule: Dict[int, List[RuleVersion]] = defaultdict(list)
+        self.nodes_by_rule_version: Dict[int, List[RuleVersionNode]] = defaultdict(list)
+        self.node_notes: Dict[Tuple[int, int], List[RuleVersionNodeNote]] = defaultdict(list)
+        self.notes_by_rule_version: Dict[int, List[RuleVersionNote]] = defaultdict(list)
+        self.vins_by_rule_version: Dict[int, List[Vin]] = defaultdict(list)
+        self.tests_by_rule_version: Dict[int, List[Test]] = defaultdict(list)
+        self.vin_tests_by_vin: Dict[int, List[VinTests]] = defaultdict(list)
+
+    def load_workspaces(
+        self, workspaces: Iterable[Workspace], selection: Optional[Selection] = None
+    ) -> 'RelationLoader':
+        """
+        Load members, projects and rules with their relations
+        :param workspaces: workspace list
+        :param selection: selection, None loads everything
+        :return: self
+        """
+        ids = [workspace.id for workspace in workspaces]
+
+        if expands(selection, 'members'):
+            workspace_members = WorkspacesMember.objects.filter(workspace_id__in=ids)
+            for workspace_member in workspace_members.select_related('user'):
+                self.members_by_workspace[workspace_member.workspace_id].append(
+                    workspace_member.user
+                )
+
+        if expands(selection, 'projects'):
+            workspace_projects = WorkspacesProject.objects.filter(workspace_id__in=ids)
+            for workspace_project in workspace_projects.select_related('project'):
+                self.projects_by_workspace[workspace_project.workspace_id].append(
+                    workspace_project.project
+                )
+
+            projects = {p.id: p for ps in self.projects_by_workspace.values() for p in ps}
+            self.load_projects(projects.values(), child(selection, 'projects'))
+
+        if expands(selection, 'rules'):
+            workspace_rules = WorkspacesRule.objects.filter(workspace_id__in=ids)
+            for workspace_rule in workspace_rules.select_related('rule'):
+                self.rules_by_workspace[workspace_rule.workspace_id].append(workspace_rule.rule)
+
+            rules = {r.id: r for rs in self.rules_by_workspace.values() for r in rs}
+            self.load_rules(rules.values(), child(selection, 'rules'))
+
+        return self
+
+    def load_workspace_ids(self, workspaces: Iterable[Workspace]) -> 'RelationLoader':
+        """
+        Load member, project and rule ids only
+        :param workspaces: workspace list
+        :return: self
+        """
+        ids = [workspace.id for workspace in workspaces]
+
+        for workspace_id, user_id in WorkspacesMember.objects.filter(
+            workspace_id__in=ids
+        ).values_list('workspace_id', 'user_id'):
+            self.member_ids_by_workspace[workspace_id].append(user_id)
+
+        for workspace_id, project_id in WorkspacesProject.objects.filter(
+            workspace_id__in=ids
+        ).values_list('workspace_id', 'project_id'):
+            self.project_ids_by_workspace[workspace_id].append(project_id)
+
+        for workspace_id, rule_id in WorkspacesRule.objects.filter(
+            workspace_id__in=ids
+        ).values_list('workspace_id', 'rule_id'):
+            self.rule_ids_by_workspace[workspace_id].append(rule_id)
+
+        return self
+
+    def load_projects(
+        self, projects: Iterable[Project], selection: Optional[Selection] = None
+    ) -> 'RelationLoader':
+        """
+        Load vins of projects with their test results
+        :param projects: project list
+        :param selection: selection, None loads everything
+        :return: self
+        """
+        if not expands(selection, 'vins'):
+            return self
+
+        ids = [project.id for project in projects]
+        project_has_vins = ProjectsHasVin.objects.filter(project_id__in=ids).select_related('vin')
+
+        for project_has_vin in project_has_vins.order_by('vin_id'):
+            self.vins_by_project[project_has_vin.project_id].append(project_has_vin.vin)
+
+        if expands(child(selection, 'vins'), 'testResults'):
+            self.load_vin_tests({vin.id for vins in self.vins_by_project.values() for vin in vins})
+
+        return self
+
+    def load_rules(
+        self, rules: Iterable[Rule], selection: Optional[Selection] = None
+    ) -> 'RelationLoader':
+        """
+        Load rule versions of rules with their relations
+        :param rules: rule list
+        :param selection: selection, None loads everything
+        :return: self
+        """
+        if not expands(selection, 'ruleVersions'):
+            return self
+
+        ids = [rule.id for rule in rules]
+        rule_versions = list(
+            RuleVersion.objects.filter(rule_id__in=ids)
+            .select_related('user')
+            .order_by('version_number')
+        )
+
+        for rule_version in rule_versions:
+            self.rule_versions_by_rule[rule_version.rule_id].append(rule_version)
+
+        self.load_rule_versions(rule_versions, child(selection, 'ruleVersions'))
+
+        return self
+
+    def load_rule_versions(
+        self, rule_versions: Iterable[RuleVersion], selection: Optional[Selection] = None
+    ) -> 'RelationLoader':
+        """
+        Load nodes, node notes, notes, enabled vins and tests of rule versions
+        :param rule_versions: rule version list
+        :param selection: selection, None loads everything
+        :return: self
+        """
+        ids = [rule_version.id for rule_version in rule_versions]
+
+        if expands(selection, 'ruleTree'):
+            for node in RuleVersionNode.objects.filter(rule_version_id__in=ids).order_by('id'):
+                self.nodes_by_rule_version[node.rule_version_id].append(node)
+
+            self.load_node_notes_by_rule_version_ids(ids)
+
+        if expands(selection, 'notes'):
+            notes = RuleVersionNote.objects.filter(rule_version_id__in=ids)
+            for note in notes.select_related('user').order_by('id'):
+                self.notes_by_rule_version[note.rule_version_id].append(note)
+
+        if expands(selection, 'enabledVins'):
+            rule_version_has_vins = RuleVersionHasVin.objects.filter(rule_version_id__in=ids)
+            for rule_version_has_vin in rule_version_has_vins.select_related('vins').order_by(
+                'vins_id'
+            ):
+                self.vins_by_rule_version[rule_version_has_vin.rule_version_id].append(
+                    rule_version_has_vin.vins
+                )
+
+            if expands(child(selection, 'enabledVins'), 'testResults'):
+                self.load_vin_tests(
+                    {vin.id for vins in self.vins_by_rule_version.values() for vin in vins}
+                )
+
+        # always loaded, testCategory is derived from the first test, category names come
+        # from the catalogue
+        rule_versions_has_tests = RuleVersionsHasTests.objects.filter(rule_versions_id__in=ids)
+        for rule_versions_has_test in rule_versions_has_tests.select_related('tests').order_by(
+            'id'
+        ):
+            self.tests_by_rule_version[rule_versions_has_test.rule_versions_id].append(
+                rule_versions_has_test.tests
+            )
+
+        return self
+
+    def load_node_notes(self, nodes: Iterable[RuleVersionNode]) -> 'RelationLoader':
+        """
+        Load notes of rule version nodes
+        :param nodes: rule version node list
+        :return: self
+        """
+        return self.load_node_notes_by_rule_version_ids({node.rule_version_id for node in nodes})
+
+    def load_node_notes_by_rule_version_ids(self, ids: Iterable[int]) -> 'RelationLoader':
+        """
+        Load notes of every node of the given rule versions
+        :param ids: rule version id list
+        :return: self
+        """
+        node_notes = RuleVersionNodeNote.objects.filter(rule_version_id__in=list(ids))
+
+        for node_note in node_notes.select_related('user').order_by('id'):
+            self.node_notes[(node_note.rule_version_id, node_note.node_id)].append(node_note)
+
+        return self
+
+    def load_vin_tests(self, vin_ids: Iterable[int]) -> 'RelationLoader':
+        """
+        Load test results of vins
+        :param vin_ids: vin id list
+        :return: self
+        """
+        vin_ids = sorted({vin_id for vin_id in vin_ids if vin_id not in self.vin_tests_by_vin})
+
+        for vin_id in vin_ids:
+            self.vin_tests_by_vin[vin_id] = []
+
+        # the results of a vin are in a single chunk, so they stay in id order
+        for start in range(0, len(vin_ids), CHUNK_SIZE):
+            chunk = vin_ids[start : start + CHUNK_SIZE]
+            vin_tests = VinTests.objects.filter(vin_id__in=chunk).select_related('tests')
+            for vin_test in vin_tests.order_by('id'):
+                self.vin_tests_by_vin[vin_test.vin_id].append(vin_test)
+
+        return self
@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
 from app.serializers.base import BaseSerializer
 
@@ -8,17 +8,49 @@ class PagingSerializer(BaseSerializer):
     paging serializer
     """
 
+    fields = ('results', 'paginationInfo')
+
     results = []
     paginationInfo = {
         'limit': 0,
         'offset': 0,
         'totalCount': 0,
+        'nextCursor': None,
+        'prevCursor': None,
     }
 
     def __init__(
-        self, offset: int = 0, limit: int = 0, total: int = 0, data: List[Any] = []
+        self,
+        offset: Optional[int] = 0,
+        limit: int = 0,
+        total: Optional[int] = 0,
+        data: List[Any] = [],
+        next_cursor: Optional[str] = None,
+        prev_cursor: Optional[str] = None,
     ) -> None:
-        self.paginationInfo['offset'] = offset
-        self.paginationInfo['limit'] = limit
-        self.paginationInfo['totalCount'] = total
+        self.paginationInfo = {
+            'limit': limit,
+            'offset': offset,
+            'totalCount': total,
+            'nextCursor': next_cursor,
+            'prevCursor': prev_cursor,
+        }
         self.results = data
+
+    @classmethod
+    def from_paginator(cls, paginator, total: Optional[int], data: List[Any]) -> 'PagingSerializer':
+        """
+        Build from a keyset paginator that fetched the page
+        :param paginator: keyset paginator
+        :param total: total count or None
+        :param data: page results
+        :return: serializer
+        """
+        return cls(
+            paginator.offset,
+            paginator.limit,
+            total,
+            data,
+            paginator.next_cursor,
+            paginator.prev_cursor,
+        )
@@ -1,7 +1,9 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Optional
 
-from app.models import Project, ProjectsHasVin, Vin
+from app.models import Project
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
+from app.serializers.selection import Selection
 from app.serializers.vin import VinSerializer
 
 
@@ -10,31 +12,38 @@ class ProjectSerializer(BaseSerializer):
     project serializer
     """
 
+    fields = ('id', 'name', 'vins')
+    relations = {'vins': 'vins'}
+
     id = 0
     name = None
     vins = []
 
-    def __init__(self, project: Project) -> None:
+    def __init__(
+        self,
+        project: Project,
+        loader: Optional[RelationLoader] = None,
+        selection: Optional[Selection] = None,
+    ) -> None:
+        self.selection = selection
+
+        if loader is None:
+            loader = RelationLoader().load_projects([project], selection)
+
         self.id = project.id
         self.name = project.name
-        self.vins = self.get_vins(project)
 
-    def get_vins(self, project: Project) -> List[Dict[str, str]]:
+        if self.expands('vins'):
+            self.vins = self.get_vins(project, loader)
+
+    def get_vins(self, project: Project, loader: RelationLoader) -> List[Dict[str, str]]:
         """
         Get associated vins
         :param project: project
+        :param loader: relation loader
         :return: vin list
         """
-        results = []
-        vin_ids = []
-        project_has_vins = ProjectsHasVin.objects.filter(project=project)
-
-        for project_has_vin in list(project_has_vins):
-            vin_ids.append(project_has_vin.vin_id)
-
-        vins = Vin.objects.filter(id__in=vin_ids)
-
-        for vin in list(vins):
-            results.append(VinSerializer(vin).to_dict())
-
-        return results
+        return [
+            VinSerializer(vin, loader=loader, selection=self.child('vins')).to_dict()
+            for vin in loader.vins_by_project[project.id]
+        ]
@@ -1,9 +1,10 @@
-from datetime import date
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, List, Optional, Tuple, Union
 
-from app.models import Rule, RuleVersion
+from app.models import Rule
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
 from app.serializers.rule_version import RuleVersionSerializer
+from app.serializers.selection import Selection
 
 
 class RuleSerializer(BaseSerializer):
@@ -11,25 +12,38 @@ class RuleSerializer(BaseSerializer):
     rule serializer
     """
 
+    fields = ('id', 'name', 'ruleVersions')
+    relations = {'ruleVersions': 'ruleVersions'}
+
     id = 0
     name = None
     ruleVersions = []
 
-    def __init__(self, rule: Union[Tuple[Rule, bool], Rule]) -> None:
+    def __init__(
+        self,
+        rule: Union[Tuple[Rule, bool], Rule],
+        loader: Optional[RelationLoader] = None,
+        selection: Optional[Selection] = None,
+    ) -> None:
+        self.selection = selection
+
+        if loader is None:
+            loader = RelationLoader().load_rules([rule], selection)
+
         self.id = rule.id
         self.name = rule.name
-        self.ruleVersions = self.get_rule_version_list(rule)
 
-    def get_rule_version_list(self, rule: Rule) -> List[Any]:
+        if self.expands('ruleVersions'):
+            self.ruleVersions = self.get_rule_version_list(rule, loader)
+
+    def get_rule_version_list(self, rule: Rule, loader: RelationLoader) -> List[Any]:
         """
         Get rule versions by rule object
         :param rule: rule object
+        :param loader: relation loader
         :return: rule version list
         """
-      
-
-        rule_versions = RuleVersion.objects.filter(rule=rule).order_by('version_number')
-
         return [
-            RuleVersionSerializer(rule_version).to_dict() for rule_version in list(rule_versions)
+            RuleVersionSerializer(rule_version, loader, self.child('ruleVersions')).to_dict()
+            for rule_version in loader.rule_versions_by_rule[rule.id]
         ]
@@ -1,11 +1,16 @@
-from typing import Dict, Optional, Set
+from typing import Optional, Set
 
+from app.serializers.base import BaseSerializer
 
-class RuleFunctionSerializer:
+
+class RuleFunctionSerializer(BaseSerializer):
     """
     rule function serializer
     """
 
+    fields = ('nextTokens', 'translation', 'parses', 'isComplete', 'nodes')
+    omit_none = True
+
     nextTokens = None
     translation = None
     parses = None
@@ -25,21 +30,3 @@ class RuleFunctionSerializer:
         self.parses = parses
         self.isComplete = is_complete
         self.nodes = nodes
-
-    def to_dict(self) -> Dict[str, Set[str]]:
-        """
-        change class to dictionary
-        :return: dictionary
-        """
-        Dic = {}
-        fields = [
-            attr
-            for attr in dir(self)
-            if not hasattr(getattr(self, attr), '__call__') and not attr.startswith('__')
-        ]
-
-        for field in fields:
-            if getattr(self, field) is not None:
-                dic[field] = getattr(self, field)
-
-        return dic
@@ -1,13 +1,13 @@
 from typing import Any, Dict, List, Optional, Union
 
-from app.models import (RuleVersion, RuleVersionHasVin, RuleVersionNode,
-                        RuleVersionNote, RuleVersionsHasTests, Test, Vin)
+from app.models import RuleVersion
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
 from app.serializers.rule_version_node import RuleVersionNodeSerializer
 from app.serializers.rule_version_note import RuleVersionNoteSerializer
+from app.serializers.selection import Selection
 from app.serializers.test import TestSerializer
 from app.serializers.vin import VinSerializer
-from app.service.test_category import TestCategoryService
 
 
 class RuleVersionSerializer(BaseSerializer):
@@ -15,6 +15,32 @@ class RuleVersionSerializer(BaseSerializer):
     rule version serializer
     """
 
+    fields = (
+        'id',
+        'parentRuleId',
+        'versionNumber',
+        'authorUserId',
+        'authorUserName',
+        'ruleTree',
+        'enabledVins',
+        'dateCreated',
+        'dateModified',
+        'state',
+        'text',
+        'specificTest',
+        'testCategory',
+        'testType',
+        'notes',
+        'lock',
+        'tests',
+    )
+    relations = {
+        'ruleTree': 'ruleTree',
+        'enabledVins': 'enabledVins',
+        'notes': 'notes',
+        'tests': 'tests',
+    }
+
     id = 0
     parentRuleId = 0
     versionNumber = None
@@ -33,99 +59,99 @@ class RuleVersionSerializer(BaseSerializer):
     lock = None
     tests = []
 
-    def __init__(self, rule_version: RuleVersion) -> None:
+    def __init__(
+        self,
+        rule_version: RuleVersion,
+        loader: Optional[RelationLoader] = None,
+        selection: Optional[Selection] = None,
+    ) -> None:
+        self.selection = selection
+
+        if loader is None:
+            loader = RelationLoader().load_rule_versions([rule_version], selection)
+
         self.id = rule_version.id
-        self.parentRuleId = rule_version.rule.id
+        self.parentRuleId = rule_version.rule_id
         self.versionNumber = rule_version.version_number
-        self.authorUserId = rule_version.user.id
+        self.authorUserId = rule_version.user_id
         self.authorUserName = rule_version.user.name
-        self.ruleTree = self.get_rule_version_node_list(rule_version)
-        self.enabledVins = self.get_enabled_vins(rule_version)
         self.dateCreated = rule_version.date_created
         self.dateModified = rule_version.date_modified
         self.state = rule_version.state
         self.text = rule_version.text
         self.specificTest = rule_version.specific_test
         self.testType = rule_version.test_type
-        self.notes = self.get_rule_version_note_list(rule_version)
         self.lock = {
             'isLocked': rule_version.is_locked,
             'lockedByUserId': rule_version.locked_by_user_id,
         }
-        self.tests = self.get_rule_version_has_tests_list(rule_version)
+        self.tests = self.get_rule_version_has_tests_list(rule_version, loader)
 
         if len(self.tests) > 0:
-            self.testCategory = (
-                TestCategoryService()
-                .get_test_category_with_id(
-                    self.tests[0].get('testCategoryId'),
-                )
-                .name
-            )
+            self.testCategory = self.tests[0].get('testCategoryName')
+
+        if self.expands('ruleTree'):
+            self.ruleTree = self.get_rule_version_node_list(rule_version, loader)
+
+        if self.expands('enabledVins'):
+            self.enabledVins = self.get_enabled_vins(rule_version, loader)
+
+        if self.expands('notes'):
+            self.notes = self.get_rule_version_note_list(rule_version, loader)
 
     def get_rule_version_node_list(
-        self, rule_version: RuleVersion
+        self, rule_version: RuleVersion, loader: RelationLoader
     ) -> List[Dict[str, Optional[Union[int, str]]]]:
         """
         Get associated rule version node list
         :param rule_version: rule version
+        :param loader: relation loader
         :return: rule version node list
         """
-        results = []
-        rule_version_nodes = RuleVersionNode.objects.filter(rule_version=rule_version)
-
-        for rule_version_node in list(rule_version_nodes):
-            results.append(RuleVersionNodeSerializer(rule_version_node).to_dict())
-
-        return results
-
-    def get_rule_version_note_list(self, rule_version: RuleVersion) -> List[Any]:
+        return [
+            RuleVersionNodeSerializer(rule_version_node, loader).to_dict()
+            for rule_version_node in loader.nodes_by_rule_version[rule_version.id]
+        ]
+
+    def get_rule_version_note_list(
+        self, rule_version: RuleVersion, loader: RelationLoader
+    ) -> List[Any]:
         """
         Get associated rule version note list
         :param rule_version: rule version
+        :param loader: relation loader
         :return: rule version note list
         """
-        results = []
-        rule_version_notes = RuleVersionNote.objects.filter(rule_version=rule_version)
-
-        for rule_version_note in list(rule_version_notes):
-            results.append(RuleVersionNoteSerializer(rule_version_note).to_dict())
-
-        return results
-
-    def get_enabled_vins(self, rule_version: RuleVersion) -> List[Dict[str, Union[int, str]]]:
+        return [
+            RuleVersionNoteSerializer(rule_version_note).to_dict()
+            for rule_version_note in loader.notes_by_rule_version[rule_version.id]
+        ]
+
+    def get_enabled_vins(
+        self, rule_version: RuleVersion, loader: RelationLoader
+    ) -> List[Dict[str, Union[int, str]]]:
         """
         Get enabled vins
         :param rule_version: rule version
+        :param loader: relation loader
         :return: vin list
         """
-        results = []
-        vin_ids = []
-        rule_version_has_vins = RuleVersionHasVin.objects.filter(rule_version=rule_version)
-
-        for rule_version_has_vin in list(rule_version_has_vins):
-            vin_ids.append(rule_version_has_vin.vins.id)
-
-        vins = Vin.objects.prefetch_related('vintests_set', 'vintests_set__tests').filter(
-            id__in=vin_ids
-        )
-
-        for vin in list(vins):
-            results.append(VinSerializer(vin, include_tests=True).to_dict())
-
-        return results
-
-    def get_rule_version_has_tests_list(self, rule_version: RuleVersion) -> List[Any]:
+        return [
+            VinSerializer(
+                vin, include_tests=True, loader=loader, selection=self.child('enabledVins')
+            ).to_dict()
+            for vin in loader.vins_by_rule_version[rule_version.id]
+        ]
+
+    def get_rule_version_has_tests_list(
+        self, rule_version: RuleVersion, loader: RelationLoader
+    ) -> List[Any]:
         """
         Get rule versions has tests list
         :param rule_version: rule version
+        :param loader: relation loader
         :return: test list
         """
-        results = []
-        rule_versions_has_tests = RuleVersionsHasTests.objects.filter(rule_versions=rule_version)
-
-        for rule_versions_has_test in list(rule_versions_has_tests):
-            test = Test.objects.get(id=rule_versions_has_test.tests_id)
-            results.append(TestSerializer(test).to_dict())
-
-        return results
+        return [
+            TestSerializer(test).to_dict() for test in loader.tests_by_rule_version[rule_version.id]
+        ]
@@ -1,7 +1,8 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from app.models import RuleVersionNode, RuleVersionNodeNote
+from app.models import RuleVersionNode
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
 from app.serializers.rule_version_node_note import \
     RuleVersionNodeNoteSerializer
 
@@ -11,29 +12,36 @@ class RuleVersionNodeSerializer(BaseSerializer):
     rule version node serializer
     """
 
+    fields = ('id', 'parentId', 'text', 'notes')
+
     id = 0
     parentId = 0
     text = None
+    notes = []
+
+    def __init__(
+        self, rule_version_node: RuleVersionNode, loader: Optional[RelationLoader] = None
+    ) -> None:
+        if loader is None:
+            loader = RelationLoader().load_node_notes([rule_version_node])
 
-    def __init__(self, rule_version_node: RuleVersionNode) -> None:
         self.id = rule_version_node.node_id
         self.parentId = rule_version_node.parent_id
         self.text = rule_version_node.rule_text
-        self.notes = self.get_rule_version_node_note_list(rule_version_node)
+        self.notes = self.get_rule_version_node_note_list(rule_version_node, loader)
 
-    def get_rule_version_node_note_list(self, rule_version_node: RuleVersionNode) -> List[Any]:
+    def get_rule_version_node_note_list(
+        self, rule_version_node: RuleVersionNode, loader: RelationLoader
+    ) -> List[Any]:
         """
         Get associated rule version node note list
         :param rule_version_node: rule version node
+        :param loader: relation loader
         :return: rule version node note list
         """
-        results = []
-        rule_version_node_notes = RuleVersionNodeNote.objects.filter(
-            rule_version=rule_version_node.rule_version,
-            node_id=rule_version_node.node_id,
-        )
-
-        for rule_version_node_note in list(rule_version_node_notes):
-            results.append(RuleVersionNodeNoteSerializer(rule_version_node_note).to_dict())
+        key = (rule_version_node.rule_version_id, rule_version_node.node_id)
 
-        return results
+        return [
+            RuleVersionNodeNoteSerializer(rule_version_node_note).to_dict()
+            for rule_version_node_note in loader.node_notes[key]
+        ]
@@ -6,6 +6,8 @@ class RuleVersionNoteSerializer(BaseSerializer):
     rule version note serializer
     """
 
+    fields = ('authorUserId', 'authorUserName', 'dateCreated', 'notes')
+
     authorUserId = 0
     authorUserName = 0
     dateCreated = None
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Optional, Set
+
+from django.http.request import QueryDict
+
+from app.serializers.query import QuerySerializer
+
+
+class Selection:
+    """
+    sparse fieldset and expansion selection
+
+    Built from the `fields` and `expand` query parameters, both comma separated
+    lists of dotted paths, e.g. `fields=id,name,ruleVersions.versionNumber` and
+    `expand=ruleVersions.enabledVins.testResults`. `expand=all` embeds every
+    relation. Relations are loaded only when expanded; naming a relation in
+    `fields` expands it as well.
+    """
+
+    ALL = 'all'
+
+    def __init__(self, fields: Optional[Set[str]] = None, expand_all: bool = False) -> None:
+        self.fields = fields
+        self.expand_all = expand_all
+        self.children: Dict[str, 'Selection'] = {}
+
+    @classmethod
+    def from_query(cls, query: QueryDict, default_expand: str = '') -> 'Selection':
+        """
+        Parse fields and expand query parameters
+        :param query: query params
+        :param default_expand: expand value used when the parameter is absent
+        :return: selection
+        """
+        query = QuerySerializer(query)
+        fields = query.get('fields', '')
+        expand = query.get('expand', default_expand)
+
+        selection = cls()
+
+        if expand == cls.ALL:
+            selection.expand_all = True
+        else:
+            for path in cls.split(expand):
+                selection.add_path(path.split('.'))
+
+        for path in cls.split(fields):
+            *relations, field = path.split('.')
+            node = selection.add_path(relations)
+            if node.fields is None:
+                node.fields = set()
+            node.fields.add(field)
+
+        return selection
+
+    @staticmethod
+    def split(value: str):
+        """
+        Split a comma separated parameter
+        :param value: parameter value
+        :return: non-empty items
+        """
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def add_path(self, relations) -> 'Selection':
+        """
+        Expand every relation along a path
+        :param relations: relation names
+        :return: selection of the last relation
+        """
+        node = self
+
+        for relation in relations:
+            if relation not in node.children:
+                node.children[relation] = Selection(expand_all=node.expand_all)
+            node = node.children[relation]
+
+        return node
+
+    def expands(self, relation: str) -> bool:
+        """
+        Check the relation is expanded
+        :param relation: expand name
+        :return: boolean
+        """
+        return (
+            self.expand_all
+            or relation in self.children
+            or (self.fields is not None and relation in self.fields)
+        )
+
+    def child(self, relation: str) -> 'Selection':
+        """
+        Get the selection of an expanded relation
+        :param relation: expand name
+        :return: selection
+        """
+        if relation in self.children:
+            return self.children[relation]
+
+        return Selection(expand_all=self.expand_all)
+
+    def prune(self, result: Dict[str, Any], relations: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Drop unselected fields and unexpanded relations from a serialized object
+        :param result: serialized object
+        :param relations: output key to expand name mapping of the serializer
+        :return: serialized object
+        """
+        pruned = {}
+
+        for key, value in result.items():
+            if key in relations:
+                if self.expands(relations[key]):
+                    pruned[key] = value
+            elif self.fields is None or key in self.fields:
+                pruned[key] = value
+
+        return pruned
@@ -6,6 +6,8 @@ class StatusSerializer(BaseSerializer):
     status serializer
     """
 
+    fields = ('code', 'message')
+
     code = 0
     message = None
 
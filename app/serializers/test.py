@@ -1,4 +1,6 @@
+from app.models import Test
 from app.serializers.base import BaseSerializer
+from app.utils.catalogue import get_catalogue
 
 
 class TestSerializer(BaseSerializer):
@@ -6,6 +8,8 @@ class TestSerializer(BaseSerializer):
     tests serializer
     """
 
+    fields = ('id', 'name', 'testCategoryId', 'testCategoryName')
+
     id = 0
     name = None
     testCategoryId = 0
@@ -15,4 +19,9 @@ class TestSerializer(BaseSerializer):
         self.id = test.id
         self.name = test.name
         self.testCategoryId = test.test_category_id
-        self.testCategoryName = test.test_category.name
+
+        # a category not joined by the query is read from the catalogue
+        category_name = None
+        if not Test.test_category.is_cached(test):
+            category_name = get_catalogue().category_name(test.test_category_id)
+        self.testCategoryName = category_name or test.test_category.name
@@ -7,6 +7,8 @@ class TestCategorySerializer(BaseSerializer):
     test categories
     """
 
+    fields = ('id', 'name')
+
     id = 0
     name = None
 
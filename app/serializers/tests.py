@@ -6,6 +6,8 @@ class TestsSerializer(BaseSerializer):
     tests serializer
     """
 
+    fields = ('id', 'name', 'type', 'testCategoryId')
+
     id = 0
     name = None
     type = None
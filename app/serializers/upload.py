@@ -0,0 +1,27 @@
+from app.models import Upload
+from app.serializers.base import BaseSerializer
+
+
+class UploadSerializer(BaseSerializer):
+    """
+    Chunked upload serializer
+    """
+
+    fields = ('id', 'dateCreated', 'dateUpdated', 'name', 'size', 'offset', 'isComplete')
+
+    id = ''
+    dateCreated = None
+    dateUpdated = None
+    name = ''
+    size = 0
+    offset = 0
+    isComplete = False
+
+    def __init__(self, upload: Upload):
+        self.id = str(upload.id)
+        self.dateCreated = upload.date_created
+        self.dateUpdated = upload.date_updated
+        self.name = upload.name
+        self.size = upload.size
+        self.offset = upload.offset
+        self.isComplete = upload.is_complete
@@ -7,6 +7,8 @@ class UserSerializer(BaseSerializer):
     user serializer
     """
 
+    fields = ('id', 'name', 'email', 'role', 'thumbnailUrl')
+
     id = 0
     name = None
     email = None
@@ -1,7 +1,9 @@
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Optional, Union
 
-from app.models import Vin
+from app.models import Vin, VinTests
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
+from app.serializers.selection import Selection
 
 
 class VinSerializer(BaseSerializer):
@@ -9,38 +11,53 @@ class VinSerializer(BaseSerializer):
     vin serializer
     """
 
+    fields = ('id', 'vin', 'testResults', 'testQualifiers')
+    relations = {'testResults': 'testResults', 'testQualifiers': 'testResults'}
+
     id = 0
     vin = None
     testResults = None
     testQualifiers = None
 
-    def __init__(self, vin: Vin, include_tests: bool = True) -> None:
+    def __init__(
+        self,
+        vin: Vin,
+        include_tests: bool = True,
+        loader: Optional[RelationLoader] = None,
+        selection: Optional[Selection] = None,
+    ) -> None:
+        self.selection = selection
         self.id = vin.id
         self.vin = vin.name
 
-        if include_tests:
-            self.testResults = self.get_test_results(vin)
-            self.testQualifiers = self.get_test_qualifiers(vin) or None
+        if include_tests and self.expands('testResults'):
+            if loader is None:
+                loader = RelationLoader().load_vin_tests([vin.id])
+
+            vin_tests = loader.vin_tests_by_vin[vin.id]
+            self.testResults = self.get_test_results(vin_tests)
+            self.testQualifiers = self.get_test_qualifiers(vin_tests) or None
 
-    def get_test_results(self, vin: Vin) -> Dict[Any, Any]:
+    def get_test_results(self, vin_tests: List[VinTests]) -> Dict[Any, Any]:
         """
         Get VinTests for vin
-        :param vin: Vin
+        :param vin_tests: VinTests of the vin
         :return: dictionary
         """
-        return {'%s' % (x.tests.name): x.value for x in vin.vintests_set.all()}
+        return {'%s' % (x.tests.name): x.value for x in vin_tests}
 
-    def get_test_qualifiers(self, vin: Vin) -> Dict[Any, Any]:
+    def get_test_qualifiers(self, vin_tests: List[VinTests]) -> Dict[Any, Any]:
         """
         Get qualifier value for every VinTests with non-null qualifier for vin
-        :param vin: Vin
+        :param vin_tests: VinTests of the vin
         :return: dictionary
         """
         # return dict(('p%s %s test QUALIFIER' % (x.tests.type, x.tests.name), x.qualifier)
         #            for x in vin.vintests_set.filter(qualifier__isnull=False))
         return {
             '%s*qualifier' % (x.tests.name): x.qualifier
-            for x in vin.vintests_set.filter(qualifier__isnull=False)
+            for x in vin_tests
+            if x.qualifier is not None
         }
 
     def to_dict(self) -> Dict[str, Union[int, str]]:
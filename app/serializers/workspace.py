@@ -1,8 +1,9 @@
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 
-from app.models import (Workspace, WorkspacesMember, WorkspacesProject,
-                        WorkspacesRule)
+from app.models import Workspace
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
+from app.serializers.selection import Selection
 
 
 class WorkspaceSerializer(BaseSerializer):
@@ -10,6 +11,8 @@ class WorkspaceSerializer(BaseSerializer):
     workspace serializer
     """
 
+    fields = ('id', 'name', 'ownerUserId', 'memberUserIds', 'ruleIds', 'projectIds')
+
     id = 0
     name = None
     ownerUserId = 0
@@ -17,52 +20,49 @@ class WorkspaceSerializer(BaseSerializer):
     ruleIds = []
     projectIds = []
 
-    def __init__(self, workspace: Workspace) -> None:
+    def __init__(
+        self,
+        workspace: Workspace,
+        loader: Optional[RelationLoader] = None,
+        selection: Optional[Selection] = None,
+    ) -> None:
+        self.selection = selection
+
+        if loader is None:
+            loader = RelationLoader().load_workspace_ids([workspace])
+
         self.id = workspace.id
         self.name = workspace.name
-        self.ownerUserId = workspace.user.id
-        self.memberUserIds = self.get_member_id_list(workspace)
-        self.projectIds = self.get_project_id_list(workspace)
-        self.ruleIds = self.get_rule_id_list(workspace)
+        self.ownerUserId = workspace.user_id
+        self.memberUserIds = self.get_member_id_list(workspace, loader)
+        self.projectIds = self.get_project_id_list(workspace, loader)
+        self.ruleIds = self.get_rule_id_list(workspace, loader)
 
-    def get_member_id_list(self, workspace: Workspace) -> List[int]:
+    def get_member_id_list(self, workspace: Workspace, loader: RelationLoader) -> List[int]:
         """
         Get member id list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: member id list
         """
-        results = []
-        workspace_members = WorkspacesMember.objects.filter(workspace=workspace)
-
-        for workspace_member in list(workspace_members):
-            results.append(workspace_member.user.id)
-
-        return results
+        return list(loader.member_ids_by_workspace[workspace.id])
 
-    def get_project_id_list(self, workspace: Workspace) -> List[Union[int, Any]]:
+    def get_project_id_list(
+        self, workspace: Workspace, loader: RelationLoader
+    ) -> List[Union[int, Any]]:
         """
         Get project id list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: project id list
         """
-        results = []
-        workspace_projects = WorkspacesProject.objects.filter(workspace=workspace)
+        return list(loader.project_ids_by_workspace[workspace.id])
 
-        for workspace_project in list(workspace_projects):
-            results.append(workspace_project.project.id)
-
-        return results
-
-    def get_rule_id_list(self, workspace: Workspace) -> List[Any]:
+    def get_rule_id_list(self, workspace: Workspace, loader: RelationLoader) -> List[Any]:
         """
         Get rule id list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: rule id list
         """
-        results = []
-        workspace_rules = WorkspacesRule.objects.filter(workspace=workspace)
-
-        for workspace_rule in list(workspace_rules):
-            results.append(workspace_rule.rule.id)
-
-        return results
+        return list(loader.rule_ids_by_workspace[workspace.id])
@@ -1,5 +1,5 @@
-from app.models import WorkspacesMember, WorkspacesProject, WorkspacesRule
 from app.serializers.base import BaseSerializer
+from app.serializers.loader import RelationLoader
 from app.serializers.project import ProjectSerializer
 from app.serializers.rule import RuleSerializer
 from app.serializers.user import UserSerializer
@@ -10,6 +10,9 @@ class WorkspaceExpandedSerializer(BaseSerializer):
     workspace serializer
     """
 
+    fields = ('id', 'name', 'owner', 'members', 'rules', 'projects')
+    relations = {'members': 'members', 'rules': 'rules', 'projects': 'projects'}
+
     id = 0
     name = None
     owner = None
@@ -17,52 +20,56 @@ class WorkspaceExpandedSerializer(BaseSerializer):
     rules = []
     projects = []
 
-    def __init__(self, workspace):
+    def __init__(self, workspace, loader=None, selection=None):
+        self.selection = selection
+
+        if loader is None:
+            loader = RelationLoader().load_workspaces([workspace], selection)
+
         self.id = workspace.id
         self.name = workspace.name
         self.owner = UserSerializer(workspace.user).to_dict()
-        self.members = self.get_member_list(workspace)
-        self.projects = self.get_project_list(workspace)
-        self.rules = self.get_rule_list(workspace)
 
-    def get_member_list(self, workspace):
+        if self.expands('members'):
+            self.members = self.get_member_list(workspace, loader)
+
+        if self.expands('projects'):
+            self.projects = self.get_project_list(workspace, loader)
+
+        if self.expands('rules'):
+            self.rules = self.get_rule_list(workspace, loader)
+
+    def get_member_list(self, workspace, loader):
         """
         Get member list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: member list
         """
-        results = []
-        workspace_members = WorkspacesMember.objects.filter(workspace=workspace)
+        return [
+            UserSerializer(user).to_dict() for user in loader.members_by_workspace[workspace.id]
+        ]
 
-        for workspace_member in list(workspace_members):
-            results.append(UserSerializer(workspace_member.user).to_dict())
-
-        return results
-
-    def get_project_list(self, workspace):
+    def get_project_list(self, workspace, loader):
         """
         Get project list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: project list
         """
-        results = []
-        workspace_projects = WorkspacesProject.objects.filter(workspace=workspace)
-
-        for workspace_project in list(workspace_projects):
-            results.append(ProjectSerializer(workspace_project.project).to_dict())
+        return [
+            ProjectSerializer(project, loader, self.child('projects')).to_dict()
+            for project in loader.projects_by_workspace[workspace.id]
+        ]
 
-        return results
-
-    def get_rule_list(self, workspace):
+    def get_rule_list(self, workspace, loader):
         """
         Get rule list
         :param workspace: workspace object
+        :param loader: relation loader
         :return: rule list
         """
-        results = []
-        workspace_rules = WorkspacesRule.objects.filter(workspace=workspace)
-
-        for workspace_rule in list(workspace_rules):
-            results.append(RuleSerializer(workspace_rule.rule).to_dict())
-
-        return results
+        return [
+            RuleSerializer(rule, loader, self.child('rules')).to_dict()
+            for rule in loader.rules_by_workspace[workspace.id]
+        ]
@@ -1,14 +1,25 @@
-from typing import Dict, Optional, Union
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
+from django.conf import settings
+from django.db import connection
 from django.db.models.query import QuerySet
 
 from app.exceptions.http import HttpException
 from app.models import AsyncTask
+from app.service.job_queue import JobQueueService
 
 
 class AsyncTaskService:
     """
     async task service
+
+    get_async_task(): get async task
+    create_new_async_task(): create async task of user
+    get_running_tasks(): get running tasks
+    cancel_async_task(): cancel running task
+    get_etag(): get the entity tag of the state of task
     """
 
     @staticmethod
@@ -34,8 +45,193 @@ class AsyncTaskService:
             raise HttpException(404, 'Async Task not found')
         if user_dict.get('role') != 'admin' and user_dict.get('id') != task.user_id:
             raise HttpException(403, "Only task's owner or admin can cancel a running task")
-        if not task.is_running:
+        # guarded, so a task finishing meanwhile stays finished and the lease is left alone
+        if not AsyncTask.objects.filter(pk=task.pk, is_running=True).update(is_running=False):
             raise HttpException(409, 'Task not running')
         task.is_running = False
-        task.save()
+
+        # a queued job never starts, nothing else removes its files
+        if task.kind is not None and task.locked_by is None:
+            JobQueueService.discard_files(task)
+
+        # the running task sees it on its next progress write
+        TaskNotifier.notify(task)
+
         return task
+
+    @staticmethod
+    def get_etag(task: AsyncTask) -> str:
+        return '"%d-%d-%d"' % (task.pk, task.progress, task.is_running)
+
+
+class TaskProgress:
+    """
+    throttled progress reporter of a running task
+
+    Progress is written at most every settings.TASK_PROGRESS_INTERVAL seconds or
+    settings.TASK_PROGRESS_ROWS processed rows, whichever comes first. The write is a
+    single UPDATE guarded by is_running, so it also detects cancellation, made
+    by any process: a cancelled task stops at most one interval later.
+
+    update(): record progress, return False once the task is cancelled
+    flush(): write progress now, return False once the task is cancelled
+    """
+
+    def __init__(
+        self,
+        task: AsyncTask,
+        interval: Optional[float] = None,
+        rows: Optional[int] = None,
+    ) -> None:
+        self.task = task
+        self.interval = interval or getattr(settings, 'TASK_PROGRESS_INTERVAL', 1.0)
+        self.rows = rows or getattr(settings, 'TASK_PROGRESS_ROWS', 5000)
+        self.cancelled = False
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def update(self, progress: int, rows: int = 1) -> bool:
+        """
+        Record progress, written when the interval or row count is reached
+        :param progress: progress in percent
+        :param rows: rows processed since the last update
+        :return: False once the task is cancelled
+        """
+        if self.cancelled:
+            return False
+
+        self.task.progress = progress
+        self.pending += rows
+
+        if self.pending >= self.rows or time.monotonic() - self.last_flush >= self.interval:
+            return self.flush(progress)
+
+        return True
+
+    def flush(self, progress: Optional[int] = None) -> bool:
+        """
+        Write progress now
+        :param progress: progress in percent, None for the last recorded one
+        :return: False once the task is cancelled
+        """
+        if progress is not None:
+            self.task.progress = progress
+
+        updated = AsyncTask.objects.filter(pk=self.task.pk, is_running=True).update(
+            progress=self.task.progress
+        )
+
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.cancelled = self.cancelled or not updated
+
+        if self.cancelled:
+            self.task.is_running = False
+
+        TaskNotifier.notify(self.task)
+
+        return not self.cancelled
+
+
+class TaskNotifier:
+    """
+    in-process notifier of async task changes
+
+    Clients waiting for a task block on a condition, so an idle wait costs no query.
+    Changes written in this process wake them at once. Changes written by job
+    workers are picked up by one watcher thread, which reads the state of every
+    watched task in a single query each settings.TASK_WATCH_INTERVAL seconds, however
+    many clients wait.
+
+    state(): get the (progress, is_running) state of a task
+    wait(): block until the state of a task differs from a known one
+    notify(): record the state of a task written in this process
+    """
+
+    condition = threading.Condition()
+    states: Dict[int, Tuple[int, bool]] = {}
+    waiters: Dict[int, int] = {}
+    watcher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def state(task: AsyncTask) -> Tuple[int, bool]:
+        return task.progress, task.is_running
+
+    @classmethod
+    def wait(cls, task: AsyncTask, known: Tuple[int, bool], timeout: float) -> bool:
+        """
+        Block until the state of the task differs from a known one
+        :param task: task
+        :param known: state known by the client
+        :param timeout: seconds
+        :return: True when the state changed, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+
+        with cls.condition:
+            cls.states.setdefault(task.pk, cls.state(task))
+            cls.waiters[task.pk] = cls.waiters.get(task.pk, 0) + 1
+            if cls.watcher is None:
+                cls.watcher = threading.Thread(target=cls.watch, name='task-watcher', daemon=True)
+                cls.watcher.start()
+
+            try:
+                while cls.states[task.pk] == known:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    cls.condition.wait(remaining)
+
+                return True
+            finally:
+                cls.waiters[task.pk] -= 1
+                if not cls.waiters[task.pk]:
+                    del cls.waiters[task.pk]
+                    del cls.states[task.pk]
+
+    @classmethod
+    def notify(cls, task: AsyncTask) -> None:
+        """
+        Record the state of a task written in this process and wake its waiters
+        :param task: task
+        :return: void
+        """
+        with cls.condition:
+            if task.pk in cls.waiters and cls.states[task.pk] != cls.state(task):
+                cls.states[task.pk] = cls.state(task)
+                cls.condition.notify_all()
+
+    @classmethod
+    def watch(cls) -> None:
+        """
+        Poll the watched tasks in one query per interval, until no client waits
+        :return: void
+        """
+        try:
+            while True:
+                time.sleep(getattr(settings, 'TASK_WATCH_INTERVAL', 1.0))
+
+                with cls.condition:
+                    ids = list(cls.waiters)
+                    if not ids:
+                        cls.watcher = None
+                        return
+
+                rows = AsyncTask.objects.filter(pk__in=ids).values_list(
+                    'pk', 'progress', 'is_running'
+                )
+
+                with cls.condition:
+                    changed = False
+                    for pk, progress, is_running in rows:
+                        if pk in cls.states and cls.states[pk] != (progress, is_running):
+                            cls.states[pk] = (progress, is_running)
+                            changed = True
+                    if changed:
+                        cls.condition.notify_all()
+        except Exception:
+            with cls.condition:
+                cls.watcher = None
+            raise
+        finally:
+            connection.close()
@@ -0,0 +1,183 @@
+import logging
+from typing import Dict, Iterable, Iterator, List, Tuple, Type
+
+from django.db import models, transaction
+
+from app.exceptions.http import HttpException
+from app.models import (Invitation, Rule, RuleVersion, RuleVersionDocument,
+                        RuleVersionHasVin, RuleVersionNode,
+                        RuleVersionNodeNote, RuleVersionNote,
+                        RuleVersionsHasTests, Workspace, WorkspacesMember,
+                        WorkspacesProject, WorkspacesRule)
+from app.utils import invalidation
+
+# keep every IN (...) list below the SQLite host parameter limit
+CHUNK_SIZE = 500
+
+
+class BulkDeleteService:
+    """
+    bulk delete service
+
+    delete_rule_versions(): delete rule versions and every dependent row
+    delete_rules(): delete rules, their versions and workspace links
+    delete_workspaces(): delete workspaces, their links and invitations
+    publish_rule_versions(): publish the deletion of rule versions
+    """
+
+    def delete_rule_versions(self, ids: Iterable[int]) -> Dict[str, int]:
+        """
+        Delete rule versions with associates
+        :param ids: rule version ids
+        :return: deleted row count per table
+        """
+        ids = list(ids)
+        self.check_not_published(ids)
+
+        # the rules lose versions
+        rule_ids = set()
+        for chunk in self.chunks(ids):
+            rule_ids.update(
+                RuleVersion.objects.filter(pk__in=chunk).values_list('rule_id', flat=True)
+            )
+
+        plan = self.collect_rule_version_dependents(ids)
+        plan.append((RuleVersion, ids))
+
+        counts = self.delete_plan(plan)
+        self.publish_rule_versions(ids, rule_ids)
+
+        return counts
+
+    def delete_rules(self, ids: Iterable[int]) -> Dict[str, int]:
+        """
+        Delete rules with rule versions and associates
+        :param ids: rule ids
+        :return: deleted row count per table
+        """
+        ids = list(ids)
+        rule_version_ids = self.collect_ids(RuleVersion, 'rule_id', ids)
+        self.check_not_published(rule_version_ids)
+
+        plan = [(WorkspacesRule, self.collect_ids(WorkspacesRule, 'rule_id', ids))]
+        plan.extend(self.collect_rule_version_dependents(rule_version_ids))
+        plan.append((RuleVersion, rule_version_ids))
+        plan.append((Rule, ids))
+
+        counts = self.delete_plan(plan)
+        self.publish_rule_versions(rule_version_ids, ids)
+
+        return counts
+
+    def delete_workspaces(self, ids: Iterable[int]) -> Dict[str, int]:
+        """
+        Delete workspaces with members, project links, rule links and invitations
+        :param ids: workspace ids
+        :return: deleted row count per table
+        """
+        ids = list(ids)
+        plan = [
+            (model, self.collect_ids(model, 'workspace_id', ids))
+            for model in (WorkspacesProject, WorkspacesMember, WorkspacesRule, Invitation)
+        ]
+        plan.append((Workspace, ids))
+
+        return self.delete_plan(plan)
+
+    def collect_rule_version_dependents(
+        self, rule_version_ids: List[int]
+    ) -> List[Tuple[Type[models.Model], List[int]]]:
+        """
+        Collect ids of every row that references the given rule versions
+        :param rule_version_ids: rule version ids
+        :return: list of (model, ids) in deletion order
+        """
+        dependents = [
+            (RuleVersionDocument, 'rule_version_id'),
+            (RuleVersionHasVin, 'rule_version_id'),
+            (RuleVersionsHasTests, 'rule_versions_id'),
+            (RuleVersionNote, 'rule_version_id'),
+            (RuleVersionNodeNote, 'rule_version_id'),
+            (RuleVersionNode, 'rule_version_id'),
+        ]
+
+        return [
+            (model, self.collect_ids(model, field, rule_version_ids))
+            for model, field in dependents
+        ]
+
+    def publish_rule_versions(self, rule_version_ids: List[int], rule_ids: Iterable[int]) -> None:
+        """
+        Publish the deletion of rule versions with their associates, queryset deletes send
+        no signals
+        :param rule_version_ids: rule version ids
+        :param rule_ids: ids of the rules of the rule versions
+        :return: void
+        """
+        for model in (
+            RuleVersion,
+            RuleVersionNode,
+            RuleVersionNote,
+            RuleVersionNodeNote,
+            RuleVersionHasVin,
+        ):
+            invalidation.publish(model, rule_version_ids)
+
+        invalidation.publish(Rule, rule_ids)
+
+    def check_not_published(self, rule_version_ids: List[int]) -> None:
+        """
+        Refuse to delete published rule versions
+        :param rule_version_ids: rule version ids
+        :return: void
+        """
+        for chunk in self.chunks(rule_version_ids):
+            if RuleVersion.objects.filter(id__in=chunk, state='Published').exists():
+                raise HttpException(
+                    403, "Rule version cannot be modified or deleted in 'Published' state"
+                )
+
+    def collect_ids(self, model: Type[models.Model], field: str, values: List[int]) -> List[int]:
+        """
+        Collect primary keys of rows whose `field` is in `values`
+        :param model: model class
+        :param field: foreign key column name
+        :param values: foreign key values
+        :return: primary key list
+        """
+        ids = []
+
+        for chunk in self.chunks(values):
+            ids.extend(model.objects.filter(**{field + '__in': chunk}).values_list('pk', flat=True))
+
+        return ids
+
+    def delete_plan(self, plan: List[Tuple[Type[models.Model], List[int]]]) -> Dict[str, int]:
+        """
+        Delete rows table by table in a single transaction
+        :param plan: list of (model, ids) in deletion order
+        :return: deleted row count per table
+        """
+        counts = {}
+
+        with transaction.atomic():
+            for model, ids in plan:
+                deleted = 0
+                for chunk in self.chunks(ids):
+                    deleted += model.objects.filter(pk__in=chunk).delete()[0]
+                counts[model._meta.db_table] = deleted
+
+        logging.info('Bulk delete %s', counts)
+
+        return counts
+
+    @staticmethod
+    def chunks(values: List[int], size: int = CHUNK_SIZE) -> Iterator[List[int]]:
+        """
+        Split a list into chunks
+        :param values: list
+        :param size: chunk size
+        :return: chunk iterator
+        """
+        for start in range(0, len(values), size):
+            yield values[start : start + size]
@@ -1,30 +1,82 @@
+import hashlib
 import math
+import multiprocessing
 import os
 import re
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import (Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
 
 import xlrd
-from django.db import transaction
-from django.db.models import CharField
-from django.db.models import Value as V
-from django.db.models.functions import Concat
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
 
 from app.exceptions.http import HttpException
-from app.models import (Project, ProjectsHasVin, SubVin, Test, TestCategory,
-                        Vin, VinTests)
+from app.models import (AsyncTask, Project, ProjectsHasVin, Rule,
+                        RuleVersion, RuleVersionNode, RuleVersionNote,
+                        SubVin, Test, TestCategory, Vin, VinTests)
 from app.parser import constants
+from app.utils import invalidation
+from app.utils.rule_workbook import read_rule_workbook
+from app.utils.spreadsheet import SpreadsheetReader
 
-from .async_task import AsyncTaskService
+from .async_task import AsyncTaskService, TaskProgress
+from .import_lock import ImportLockService
+from .job_queue import JobQueueService
 from .rule import RuleService
 from .rule_version import RuleVersionService
+from .rule_version_document import RuleVersionDocumentService
+from .upload import UploadService
+
+def _close_connection_after(function, *args):
+    """
+    Run a function on a pool thread, then close the thread's database connection
+    :param function: function
+    :param args: arguments
+    :return: result of the function
+    """
+    try:
+        return function(*args)
+    finally:
+        connection.close()
+
+
+def run_import_project(task):
+    """
+    Job handler of queued project imports. Errors of the file fail the task, other errors
+    are raised so the job is retried from its checkpoint.
+    :param task: claimed async task
+    :return: void
+    """
+    with open(task.payload['path'], 'rb') as handle:
+        FileImportService().import_project(File(handle, name=task.payload['name']), task.pk)
+
+
+def run_import_rules(task):
+    """
+    Job handler of queued zip rule imports. Errors of the archive fail the task, other
+    errors are raised so the job is retried, skipping the rules already written.
+    :param task: claimed async task
+    :return: void
+    """
+    FileImportService().import_rules(task.payload['path'], task.pk)
 
 
 class FileImportService:
     """
     file import service
 
+    get_project_names(): get the project names of a projects file
+    submit_import_project(): lock the projects of a file and queue its import
+    submit_import_project_upload(): lock the projects of a chunked upload and queue its import
     import_project(): create projects, vins and subvins from an Excel file
     import_rule(): create a rule, rule version and mappings from an Excel file
+    submit_import_rules(): store a zip of rule workbooks and queue its import
+    submit_import_rules_upload(): queue the import of a zip of rule workbooks from a chunked upload
+    import_rules(): create rules, rule versions and nodes from a zip of rule workbooks
     """
 
     def __init__(self):
@@ -33,34 +85,168 @@ class FileImportService:
         """
         constants.read_parser_out_file()
 
+    def get_project_names(self, file):
+        """
+        Get the project names of a projects file, in one streaming pass
+        :param file: uploaded file
+        :return: set of project names
+        """
+        try:
+            reader = SpreadsheetReader(file)
+        except ValueError as e:
+            raise HttpException(400, 'Invalid Excel file: ' + str(e))
+        except Exception:
+            raise HttpException(400, 'Invalid Excel file')
+
+        try:
+            return {row[0] for row in reader.rows() if row[0]}
+        finally:
+            reader.close()
+            file.seek(0)
+
+    def submit_import_project(self, file, user_data):
+        """
+        Store an uploaded file and queue its import
+        :param file: uploaded file
+        :param user_data: current user
+        :return: async task
+        """
+        path = JobQueueService.store_file(file)
+
+        try:
+            return self.submit_import_project_file(path, file.name, user_data)
+        except Exception:
+            os.remove(path)
+            raise
+
+    def submit_import_project_upload(self, upload_id, user_data):
+        """
+        Queue the import of a complete chunked upload, the job takes over its file
+        :param upload_id: upload id
+        :param user_data: current user
+        :return: async task
+        """
+        upload = UploadService().get_complete_upload(upload_id, user_data)
+
+        with transaction.atomic():
+            task = self.submit_import_project_file(
+                upload.path, upload.name, user_data, upload.sha256
+            )
+            upload.delete()
+
+        return task
+
+    def submit_import_project_file(self, path, name, user_data, file_hash=None):
+        """
+        Lock the projects of a stored file and queue its import for `manage.py run_jobs`.
+        Imports of other projects run in parallel. The job removes the file when it ends.
+        The import of a file whose last import failed or was cancelled resumes from the
+        checkpoint of that import.
+        :param path: path of the file, readable by the workers
+        :param name: file name
+        :param user_data: current user
+        :param file_hash: SHA-256 hex digest of the file, computed when None
+        :return: async task
+        """
+        with open(path, 'rb') as handle:
+            names = self.get_project_names(File(handle, name=name))
+
+        if file_hash is None:
+            file_hash = self.__hash_file(path)
+
+        with transaction.atomic():
+            task = JobQueueService.enqueue(
+                'import_project', user_data, dict(path=path, name=name, files=[path])
+            )
+            task.file_hash = file_hash
+            task.checkpoint = self.__take_checkpoint(file_hash)
+            task.save(update_fields=['file_hash', 'checkpoint'])
+            ImportLockService.acquire(task, names)
+
+        return task
+
+    def __hash_file(self, path):
+        """
+        Hash a file in bounded reads
+        :param path: file path
+        :return: SHA-256 hex digest
+        """
+        digest = hashlib.sha256()
+
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    def __take_checkpoint(self, file_hash):
+        """
+        Take over the checkpoint of the last unfinished import of a file, so it resumes once
+        :param file_hash: SHA-256 hex digest of the file
+        :return: checkpoint, None when no import of the file stopped early
+        """
+        previous = (
+            AsyncTask.objects.filter(
+                kind='import_project',
+                file_hash=file_hash,
+                is_running=False,
+                checkpoint__isnull=False,
+            )
+            .order_by('-pk')
+            .first()
+        )
+        if previous is None:
+            return None
+
+        # only one submission takes it, when two race the other one starts over
+        taken = AsyncTask.objects.filter(pk=previous.pk, checkpoint__isnull=False).update(
+            checkpoint=None
+        )
+
+        return previous.checkpoint if taken else None
+
     def import_project(self, file, task_id):
         task = AsyncTaskService().get_async_task(task_id)
+        progress = TaskProgress(task)
+
+        try:
+            return self.__import_project(file, task, progress)
+        finally:
+            # a job queued again for a retry keeps its projects locked
+            if not task.is_running:
+                ImportLockService.release(task)
 
+    def __import_project(self, file, task, progress):
         try:
-            sheet = xlrd.open_workbook(file_contents=file.read()).sheet_by_index(0)
-            projects = self.__fill_to(self.__get_column(sheet, 0), sheet.nrows - 1)
-            vins = self.__fill_to(self.__get_column(sheet, 1), sheet.nrows - 1)
-            subvins = self.__fill_to(self.__get_column(sheet, 2), sheet.nrows - 1)
+            reader = SpreadsheetReader(file)
+        except ValueError as e:
+            task.finish_with_error(str(e))
+            raise HttpException(400, 'Invalid Excel file: ' + str(e))
         except Exception as e:
             task.finish_with_error(str(e))
             raise HttpException(400, 'Invalid Excel file')
 
+        try:
+            return self.__import_project_rows(reader, task, progress)
+        finally:
+            reader.close()
+
+    def __import_project_rows(self, reader, task, progress):
         try:
             pattern = re.compile('(?P<name>.+?)(?P<q>\*qualifier\w*)?$', re.IGNORECASE)
-            # We're creating a dictionary which for each Test has a list of values corresponding with sheet's rows and another similar one for qualifiers
+            # We're mapping each Test to its column of values and another similar one for qualifiers
+            columns = [pattern.match(name).groupdict() for name in reader.header[3:]]
+            by_name = Test.objects.in_bulk({c['name'] for c in columns}, field_name='name')
             tests = {}
             qualifiers = {}
-            for i in range(3, sheet.ncols):
-                test_data = pattern.match(sheet.cell(0, i).value).groupdict()
-                test = Test.objects.get(name=test_data['name'])
+            for i, test_data in enumerate(columns, 3):
+                test = by_name.get(test_data['name'])
+                if test is None:
+                    raise Test.DoesNotExist('Test matching query does not exist.')
                 if test_data['q'] is None:
-                    tests[test] = [
-                        x.strip() if x.strip() != '' else None for x in self.__get_column(sheet, i)
-                    ]
+                    tests[test] = i
                 else:
-                    qualifiers[test] = [
-                        x.strip() if x.strip() != '' else None for x in self.__get_column(sheet, i)
-                    ]
+                    qualifiers[test] = i
         except AttributeError as err:
             task.finish_with_error(str(err))
             raise HttpException(400, 'Invalid Excel file: wrong format: ' + str(err))
@@ -71,174 +257,229 @@ class FileImportService:
             task.finish_with_error(str(err))
             raise HttpException(400, 'Invalid Excel file: test value must be float')
 
-        try:
-            Project.objects.bulk_create((Project(name=i) for i in projects), ignore_conflicts=True)
-            projects_dict = Project.objects.filter(name__in=projects).in_bulk(field_name='name')
-
-            Vin.objects.bulk_create((Vin(name=i) for i in vins), ignore_conflicts=True)
-            vins_dict = Vin.objects.filter(name__in=vins).in_bulk(field_name='name')
-
-            project_id = None
-            vin_id = None
-            project_vin = []
-            result = []
-            cancelled = False
-
-            subvins_set = set()
-            subvins_data = {}
-            data_set = set()
-            data = {}
-            data_q_set = set()
-            data_q = {}
-
-            for index in range(sheet.nrows - 1):
-                print(index)
-                if projects[index]:
-                    project_id = projects_dict[projects[index]].pk
-                    result.append(project_id)
-                if project_id is None:
-                    task.finish_with_error('No project in row {}'.format(index + 2))
-                    return
-                if vins[index]:
-                    vin_id = vins_dict[vins[index]].pk
-                    project_vin.append((project_id, vin_id))
-                if vin_id is None and subvins[index]:
-                    return task.finish_with_error('No Vin in row {}'.format(index + 2))
-                if subvins[index]:
-                    subvins_set.add(subvins[index])
-                    subvins_data[subvins[index]] = vin_id
-                if vin_id is not None:
-                    for test_id in tests.keys():
-                        value = tests[test_id][index]
-                        if value is not None:
-                            key = '#'.join(str(x) for x in [project_id, vin_id, test_id])
-                            data_set.add(key)
-                            data[key] = value
-                    for test, q_list in qualifiers.items():
-                        value = tests[test][index]
-                        qualifier = q_list[index]
-                        if value is not None and qualifier is not None:
-                            key = '#'.join(str(x) for x in [project_id, vin_id, test_id])
-                            data_q_set.add(key)
-                            data_q[key] = (value, qualifier)
-                task.progress = math.floor(80 * (index + 1) / (sheet.nrows - 1))
-                task.save(update_fields=['progress'])
-                task.refresh_from_db()
-                if not task.is_running:
-                    cancelled = True
-                    break
-
-            if not cancelled:
-                ProjectsHasVin.objects.bulk_create(
-                    (ProjectsHasVin(project_id=t[0], vin_id=t[1]) for t in project_vin),
-                    ignore_conflicts=True,
-                )
-                del project_vin
+        # a resumed import starts after the last row its checkpoint covers, with the
+        # project and vin of that row carried over like between chunks
+        checkpoint = task.checkpoint or {}
+        index = checkpoint.get('row', 0)
+        state = dict(project_id=checkpoint.get('project_id'), vin_id=checkpoint.get('vin_id'))
+        result = list(checkpoint.get('result', []))
 
-                existins_subvins = SubVin.objects.filter(name__in=subvins_set).in_bulk(
-                    field_name='name'
-                )
-                subvins_to_create = subvins_set.difference(existins_subvins.keys())
-                SubVin.objects.bulk_create(
-                    (SubVin(name=name, vins_id=subvins_data[name]) for name in subvins_to_create),
-                    ignore_conflicts=True,
-                )
+        # writes of the same project stay in file order, at most 2 chunks per worker queued
+        last_write = {}
+        writes = deque()
+
+        # bounded writer threads of this import, SQLite takes one writer at a time
+        pool = None
+        if connection.vendor != 'sqlite':
+            pool = ThreadPoolExecutor(settings.IMPORT_WORKERS, thread_name_prefix='import-writer')
+
+        try:
+            for rows in reader.chunks(settings.IMPORT_CHUNK_SIZE, index):
+                groups, error = self.__group_project_rows(rows, index, state, result)
+                if error is not None:
+                    return task.finish_with_error(error)
 
-                for name, subvin in existins_subvins.items():
-                    subvin.vins_id = subvins_data[name]
-                SubVin.objects.bulk_update(existins_subvins, ['vins_id'])
-                del existins_subvins
-                del subvins_to_create
-
-                v = V('#')
-
-                # in_bulk doesn't work for annotated fields
-                existing_vin_tests = {
-                    vt.key: vt
-                    for vt in VinTests.objects.filter(qualifier=None)
-                    .annotate(
-                        key=Concat(
-                            'project_id',
-                            V('#'),
-                            'vin_id',
-                            V('#'),
-                            'tests_id',
-                            output_field=CharField(),
-                        )
+                chunk_writes = []
+                for project_id, project_rows in groups.items():
+                    if project_id in last_write:
+                        last_write[project_id].result()
+                    last_write[project_id] = self.__submit_write(
+                        pool, project_id, project_rows, tests, qualifiers
                     )
-                    .filter(key__in=data_set)
-                }
-                vin_tests_to_create = data_set.difference(existing_vin_tests.keys())
-                VinTests.objects.bulk_create(
-                    (
-                        VinTests(**self.__key_to_attrs(key), value=data[key])
-                        for key in vin_tests_to_create
-                    ),
-                    ignore_conflicts=True,
-                )
+                    chunk_writes.append(last_write[project_id])
 
-                vt_to_update = {
-                    k: vt for k, vt in existing_vin_tests.items() if data[k] != vt.value
-                }
-                for key, vin_test in existing_vin_tests.items():
-                    vin_test.value = data[key]
-                VinTests.objects.bulk_update(vt_to_update.values(), ['value'], batch_size=1000)
+                index += len(rows)
+                writes.append((chunk_writes, dict(row=index, result=list(result), **state)))
 
-                del data
-                del data_set
+                while len(writes) > 2 * settings.IMPORT_WORKERS:
+                    self.__save_checkpoint(task, *writes.popleft())
 
-                task.progress = 90
-                task.save(update_fields=['progress'])
-                task.refresh_from_db()
-                if not task.is_running:
+                # without a known row count progress stays at 0 until the end
+                percent = min(math.floor(95 * index / reader.total), 95) if reader.total else 0
+                if not progress.update(percent, len(rows)):
                     return task
+        finally:
+            wait([write for chunk_writes, _ in writes for write in chunk_writes])
+            if pool is not None:
+                pool.shutdown()
 
-                # in_bulk doesn't work for annotated fields
-                existing_vin_tests = {
-                    vt.key: vt
-                    for vt in VinTests.objects.filter(qualifier__isnull=False)
-                    .annotate(
-                        key=Concat(
-                            'project_id',
-                            v,
-                            'vin_id',
-                            v,
-                            'tests_id',
-                            output_field=CharField(),
-                        )
-                    )
-                    .filter(key__in=data_q_set)
-                }
-                vin_tests_to_create = data_q_set.difference(existing_vin_tests.keys())
-                VinTests.objects.bulk_create(
-                    (
-                        VinTests(
-                            **self.__key_to_attrs(key),
-                            value=data_q[key][0],
-                            qualifier=data_q[key][1]
-                        )
-                        for key in vin_tests_to_create
-                    ),
-                    ignore_conflicts=True,
-                )
+            # the checkpoint stops before the first chunk with a failed write
+            while writes and not any(write.exception() for write in writes[0][0]):
+                self.__save_checkpoint(task, *writes.popleft())
 
-                vt_to_update = {
-                    k: vt
-                    for k, vt in existing_vin_tests.items()
-                    if data_q[k] != (vt.value, vt.qualifier)
-                }
-                for key, vin_test in vt_to_update.items():
-                    vin_test.value, vin_test.qualifier = data_q[key]
-                VinTests.objects.bulk_update(
-                    vt_to_update.values(), ['value', 'qualifier'], batch_size=1000
-                )
-                task.progress = 100
-                task.is_running = False
-                task.result = result
-                task.save()
-                return task
+        for chunk_writes, _ in writes:
+            for write in chunk_writes:
+                write.result()
+
+        # a cancel after the last progress write wins, its checkpoint stays to resume
+        task.finish(result)
+        return task
+
+    def __save_checkpoint(self, task, chunk_writes, checkpoint):
+        """
+        Wait for the writes of a chunk and record it as committed. Chunks are passed in
+        file order, so the checkpoint covers every row up to the end of this chunk.
+        :param task: import task
+        :param chunk_writes: futures of the writes of the chunk
+        :param checkpoint: `row` after the chunk, `project_id` and `vin_id` carried
+            over and the `result` so far
+        :return: void
+        """
+        for write in chunk_writes:
+            write.result()
+
+        task.checkpoint = checkpoint
+        AsyncTask.objects.filter(pk=task.pk).update(checkpoint=checkpoint)
+
+    def __group_project_rows(self, rows, start, state, result):
+        """
+        Create the projects and vins of a chunk and group its rows by project
+        :param rows: rows of the chunk
+        :param start: index of the first row of the chunk
+        :param state: project and vin ids carried over from the previous rows
+        :param result: imported project ids, appended to
+        :return: ({project id: [(vin id, subvin, row)]}, error message or None)
+        """
+        projects = {row[0] for row in rows if row[0]}
+        vins = {row[1] for row in rows if row[1]}
+
+        Project.objects.bulk_create((Project(name=i) for i in projects), ignore_conflicts=True)
+        projects_dict = Project.objects.filter(name__in=projects).in_bulk(field_name='name')
+
+        Vin.objects.bulk_create((Vin(name=i) for i in vins), ignore_conflicts=True)
+        vins_dict = Vin.objects.filter(name__in=vins).in_bulk(field_name='name')
+
+        # bulk_create sends no signals
+        invalidation.publish(Project, [project.pk for project in projects_dict.values()])
+        invalidation.publish(Vin, [vin.pk for vin in vins_dict.values()])
+
+        project_id = state['project_id']
+        vin_id = state['vin_id']
+        groups = defaultdict(list)
+
+        for index, row in enumerate(rows, start):
+            project, vin, subvin = row[:3]
+            if project:
+                project_id = projects_dict[project].pk
+                result.append(project_id)
+            if project_id is None:
+                return groups, 'No project in row {}'.format(index + 2)
+            if vin:
+                vin_id = vins_dict[vin].pk
+            if vin_id is None and subvin:
+                return groups, 'No Vin in row {}'.format(index + 2)
+            if vin_id is not None:
+                groups[project_id].append((vin_id, subvin, row))
+
+        state['project_id'] = project_id
+        state['vin_id'] = vin_id
+
+        return groups, None
+
+    def __submit_write(self, pool, project_id, rows, tests, qualifiers):
+        """
+        Write rows of one project on the writer pool of the import. Without a pool
+        (SQLite) the rows are written right away in the calling thread.
+        :param pool: writer pool, None to write in the calling thread
+        :param project_id: project id
+        :param rows: [(vin id, subvin, row)] of the project
+        :param tests: value column of each test
+        :param qualifiers: qualifier column of each test
+        :return: future of the write
+        """
+        if pool is not None:
+            return pool.submit(
+                _close_connection_after,
+                self.__write_project_rows,
+                project_id,
+                rows,
+                tests,
+                qualifiers,
+            )
+
+        future = Future()
+        try:
+            future.set_result(self.__write_project_rows(project_id, rows, tests, qualifiers))
         except Exception as e:
-            task.finish_with_error(str(e))
+            future.set_exception(e)
+
+        return future
+
+    def __write_project_rows(self, project_id, rows, tests, qualifiers):
+        """
+        Write vins, subvins and test values of one project in one transaction
+        :param project_id: project id
+        :param rows: [(vin id, subvin, row)] of the project
+        :param tests: value column of each test
+        :param qualifiers: qualifier column of each test
+        :return: void
+        """
+        vin_ids = set()
+        subvins_data = {}
+        data = {}
+
+        for vin_id, subvin, row in rows:
+            vin_ids.add(vin_id)
+            if subvin:
+                subvins_data[subvin] = vin_id
+            for test, column in tests.items():
+                value = row[column] or None
+                if value is not None:
+                    qualifier = row[qualifiers[test]] or None if test in qualifiers else None
+                    data[(project_id, vin_id, test.pk)] = (value, qualifier)
+
+        with transaction.atomic():
+            ProjectsHasVin.objects.bulk_create(
+                (ProjectsHasVin(project_id=project_id, vin_id=vin_id) for vin_id in vin_ids),
+                ignore_conflicts=True,
+            )
+            invalidation.publish(ProjectsHasVin, [project_id])
+
+            existins_subvins = SubVin.objects.filter(name__in=subvins_data.keys()).in_bulk(
+                field_name='name'
+            )
+            subvins_to_create = set(subvins_data).difference(existins_subvins.keys())
+            SubVin.objects.bulk_create(
+                (SubVin(name=name, vins_id=subvins_data[name]) for name in subvins_to_create),
+                ignore_conflicts=True,
+            )
+
+            for name, subvin in existins_subvins.items():
+                subvin.vins_id = subvins_data[name]
+            SubVin.objects.bulk_update(existins_subvins.values(), ['vins_id'])
+
+            self.__save_vin_tests(data)
+
+    def __save_vin_tests(self, data):
+        """
+        Create or update the VinTests of a chunk in one pass, with an upsert on the
+        (project, vin, tests) unique key
+        :param data: (value, qualifier) of each (project id, vin id, test id)
+        :return: void
+        """
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            target = dict(unique_fields=['project', 'vin', 'tests'])
+        else:
+            target = {}
+
+        VinTests.objects.bulk_create(
+            (
+                VinTests(
+                    project_id=project_id,
+                    vin_id=vin_id,
+                    tests_id=test_id,
+                    value=value,
+                    qualifier=qualifier,
+                )
+                for (project_id, vin_id, test_id), (value, qualifier) in data.items()
+            ),
+            batch_size=1000,
+            update_conflicts=True,
+            update_fields=['value', 'qualifier'],
+            **target,
+        )
+        invalidation.publish(VinTests, {vin_id for _, vin_id, _ in data})
 
     def import_rule(self, file, user_data):
         try:
@@ -264,10 +505,201 @@ class FileImportService:
                 )
                 RuleVersionService().lock_unlock_rule_version(user_data, False, rule_version.id)
                 rule_version.save()
+                RuleVersionDocumentService().refresh([rule_version.id])
                 return RuleService().get_rule(rule.id)
         except IntegrityError as err:
             raise HttpException(400, 'Invalid Excel file: ' + str(err))
 
+    def submit_import_rules(self, file, user_data):
+        """
+        Store an uploaded zip of rule workbooks and queue its import
+        :param file: uploaded file
+        :param user_data: current user
+        :return: async task
+        """
+        path = JobQueueService.store_file(file)
+
+        try:
+            return self.submit_import_rules_file(path, file.name, user_data)
+        except Exception:
+            os.remove(path)
+            raise
+
+    def submit_import_rules_upload(self, upload_id, user_data):
+        """
+        Queue the import of a complete chunked upload of a zip, the job takes over its file
+        :param upload_id: upload id
+        :param user_data: current user
+        :return: async task
+        """
+        upload = UploadService().get_complete_upload(upload_id, user_data)
+
+        with transaction.atomic():
+            task = self.submit_import_rules_file(upload.path, upload.name, user_data)
+            upload.delete()
+
+        return task
+
+    def submit_import_rules_file(self, path, name, user_data):
+        """
+        Queue the import of a stored zip of rule workbooks for `manage.py run_jobs`.
+        The job removes the file when it ends.
+        :param path: path of the file, readable by the workers
+        :param name: file name
+        :param user_data: current user
+        :return: async task
+        """
+        if not zipfile.is_zipfile(path):
+            raise HttpException(400, 'Invalid zip file')
+
+        return JobQueueService.enqueue(
+            'import_rules', user_data, dict(path=path, name=name, files=[path])
+        )
+
+    def import_rules(self, path, task_id):
+        """
+        Create a rule, a v1.0 rule version and its nodes from each .xls or .xlsx file of a
+        zip. Workbooks are parsed on a process pool, then written in batches of
+        settings.RULE_IMPORT_BATCH with bulk inserts, one transaction per batch. Existing
+        rules are skipped and files that fail are reported in the task result.
+        :param path: zip path
+        :param task_id: task id
+        :return: async task
+        """
+        task = AsyncTaskService().get_async_task(task_id)
+        progress = TaskProgress(task)
+        result = dict(rules=[], skipped=[], errors=[])
+
+        try:
+            archive = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as e:
+            task.finish_with_error(str(e))
+            return task
+
+        pool = None
+        try:
+            members = [
+                member
+                for member in archive.infolist()
+                if not member.is_dir()
+                and not member.filename.startswith('__MACOSX/')
+                and os.path.splitext(member.filename)[1].lower() in ('.xls', '.xlsx')
+            ]
+            if not members:
+                task.finish_with_error('No .xls or .xlsx files in the archive')
+                return task
+
+            # spawning the pool costs more than parsing a single batch
+            if settings.RULE_IMPORT_PROCESSES and len(members) > settings.RULE_IMPORT_BATCH:
+                pool = ProcessPoolExecutor(
+                    min(settings.RULE_IMPORT_PROCESSES, len(members)),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+
+            names = set()
+            batch_size = settings.RULE_IMPORT_BATCH
+            for start in range(0, len(members), batch_size):
+                batch = members[start : start + batch_size]
+                files = [member.filename for member in batch]
+                contents = [archive.read(member) for member in batch]
+
+                if pool is None:
+                    parsed = list(map(read_rule_workbook, files, contents))
+                else:
+                    parsed = list(pool.map(read_rule_workbook, files, contents))
+
+                rules = []
+                for rule in parsed:
+                    if 'error' not in rule and rule['name'] in names:
+                        rule = dict(file=rule['file'], error='Duplicate rule name')
+                    if 'error' in rule:
+                        result['errors'].append(rule)
+                    else:
+                        names.add(rule['name'])
+                        rules.append(rule)
+
+                self.__write_rules(rules, task.user_id, result)
+
+                percent = math.floor(99 * (start + len(batch)) / len(members))
+                if not progress.update(percent, len(batch)):
+                    return task
+
+            # a cancel after the last progress write wins
+            task.finish(result)
+            return task
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            archive.close()
+
+    def __write_rules(self, rules, user_id, result):
+        """
+        Insert the parsed rules of a batch in one transaction, with one bulk_create per
+        table. The rule versions match import_rule: a v1.0 Draft, unlocked, with a note.
+        :param rules: parsed rules with name, file and nodes
+        :param user_id: id of the user creating the versions
+        :param result: task result, created rules and errors are added to it
+        :return: void
+        """
+        try:
+            with transaction.atomic():
+                existing = Rule.objects.in_bulk([r['name'] for r in rules], field_name='name')
+                result['skipped'].extend(r['name'] for r in rules if r['name'] in existing)
+                rules = [r for r in rules if r['name'] not in existing]
+                if not rules:
+                    return
+
+                Rule.objects.bulk_create(Rule(name=r['name']) for r in rules)
+                created = Rule.objects.in_bulk([r['name'] for r in rules], field_name='name')
+
+                RuleVersion.objects.bulk_create(
+                    RuleVersion(
+                        rule=created[r['name']],
+                        version_number='v1.0',
+                        user_id=user_id,
+                        state='Draft',
+                    )
+                    for r in rules
+                )
+                versions = dict(
+                    RuleVersion.objects.filter(
+                        rule__in=created.values(), version_number='v1.0'
+                    ).values_list('rule_id', 'pk')
+                )
+
+                RuleVersionNote.objects.bulk_create(
+                    RuleVersionNote(
+                        user_id=user_id,
+                        notes='Import from File',
+                        rule_version_id=versions[rule.pk],
+                    )
+                    for rule in created.values()
+                )
+                RuleVersionNode.objects.bulk_create(
+                    RuleVersionNode(
+                        node_id=node['id'],
+                        rule_text=node['text'],
+                        rule_version_id=versions[created[r['name']].pk],
+                        parent_id=node['parentId'],
+                    )
+                    for r in rules
+                    for node in r['nodes']
+                )
+
+                invalidation.publish(Rule, [rule.pk for rule in created.values()])
+                invalidation.publish(RuleVersion, versions.values())
+                invalidation.publish(RuleVersionNote, versions.values())
+                invalidation.publish(RuleVersionNode, versions.values())
+
+                RuleVersionDocumentService().refresh(versions.values())
+        except IntegrityError as err:
+            result['errors'].extend(dict(file=r['file'], error=str(err)) for r in rules)
+            return
+
+        result['rules'].extend(
+            dict(id=created[r['name']].pk, name=r['name'], file=r['file']) for r in rules
+        )
+
     def import_mappings(self, file, user_data):
         try:
             with transaction.atomic():
@@ -279,24 +711,58 @@ class FileImportService:
                     categories = self.__fill_to(categories, len(tests))
                 except:
                     raise HttpException(400, 'Invalid Excel file')
+                # the category of a row carries over to the following rows without one
                 category = None
-                result_tests = []
+                test_categories = {}
                 for index, test in enumerate(tests):
                     if categories[index]:
-                        category, created = TestCategory.objects.get_or_create(
-                            name=categories[index]
-                        )
+                        category = categories[index]
                     if category is None:
                         raise HttpException(400, 'No category for test "' + test + '"')
-                    new_test, created = Test.objects.get_or_create(
-                        name=test, defaults=dict(test_category=category)
-                    )
-                    result_tests.append(new_test)
+                    test_categories.setdefault(test, category)
+
+                category_rows, new_categories = self.__get_or_create_named(
+                    TestCategory, {name: TestCategory(name=name) for name in categories if name}
+                )
+                test_rows, new_tests = self.__get_or_create_named(
+                    Test,
+                    {
+                        name: Test(name=name, test_category=category_rows[category])
+                        for name, category in test_categories.items()
+                    },
+                )
+                result_tests = [test_rows[test] for test in tests]
+
+                # bulk_create sends no signals, existing rows are left unchanged
+                if new_categories:
+                    invalidation.publish(TestCategory, new_categories)
+                if new_tests:
+                    invalidation.publish(Test, new_tests)
 
                 return result_tests
         except IntegrityError as err:
             raise HttpException(400, 'Invalid Excel file: ' + str(err))
 
+    def __get_or_create_named(self, model, objects):
+        """
+        Get or create rows by their unique name in a constant number of queries: existing
+        rows are read with one in_bulk, missing ones inserted with one bulk_create and
+        everything read again for the ids. Existing rows are not updated.
+        :param model: model with a unique `name` field
+        :param objects: unsaved instances by name, inserted when missing
+        :return: (saved instances by name, ids of the rows missing from the first read)
+        """
+        names = list(objects)
+        found = model.objects.in_bulk(names, field_name='name')
+        missing = [name for name in objects if name not in found]
+
+        if missing:
+            # rows inserted meanwhile by another import are conflicts, read back below
+            model.objects.bulk_create([objects[name] for name in missing], ignore_conflicts=True)
+            found = model.objects.in_bulk(names, field_name='name')
+
+        return found, [found[name].pk for name in missing]
+
     def __get_column(self, sheet, index):
         """
         Get a list of values from the given column in Excel `sheet`
@@ -317,11 +783,3 @@ class FileImportService:
         :return: extended list
         """
         return l + [value] * (length - len(l))
-
-    def __key_to_attrs(self, key: str):
-        attrs = key.split('#')
-        return {
-            'project_id': int(attrs[0]),
-            'vin_id': int(attrs[1]),
-            'tests_id': int(attrs[3].split(':')[0]),
-        }
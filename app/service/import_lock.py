@@ -0,0 +1,65 @@
+from typing import Iterable, List
+
+from django.db import IntegrityError, transaction
+
+from app.exceptions.http import HttpException
+from app.models import AsyncTask, ImportLock
+
+
+class ImportLockService:
+    """
+    import lock service
+
+    Imports lock the names of the projects they write, one row per name in a table
+    with a unique key, so the locks hold across processes and on every database
+    backend, SQLite included. Locks of tasks that are no longer running (finished,
+    failed or cancelled) are stale and taken over.
+
+    acquire(): lock project names for a task, 409 if another import holds one
+    release(): unlock the project names of a task
+    get_locked_names(): get the names locked by running tasks
+    """
+
+    @staticmethod
+    def acquire(task: AsyncTask, names: Iterable[str]) -> None:
+        """
+        Lock project names, all or none
+        :param task: import task
+        :param names: project names
+        :return: void
+        """
+        names = sorted(set(names))
+
+        try:
+            with transaction.atomic():
+                ImportLock.objects.filter(name__in=names, task__is_running=False).delete()
+                ImportLock.objects.bulk_create(ImportLock(name=name, task=task) for name in names)
+        except IntegrityError:
+            raise HttpException(
+                409,
+                'Projects already being imported: {}'.format(
+                    ImportLockService.get_locked_names(names)
+                ),
+            )
+
+    @staticmethod
+    def release(task: AsyncTask) -> None:
+        """
+        Unlock the project names of a task
+        :param task: import task
+        :return: void
+        """
+        ImportLock.objects.filter(task=task).delete()
+
+    @staticmethod
+    def get_locked_names(names: Iterable[str]) -> List[str]:
+        """
+        Get the names locked by running tasks
+        :param names: project names
+        :return: locked names
+        """
+        return list(
+            ImportLock.objects.filter(name__in=list(names), task__is_running=True)
+            .order_by('name')
+            .values_list('name', flat=True)
+        )
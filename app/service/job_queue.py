@@ -0,0 +1,210 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from app.models import AsyncTask
+
+# job kind -> handler, called with the claimed task in a worker process
+JOB_HANDLERS = {
+    'import_project': 'app.service.file_import.run_import_project',
+    'import_rules': 'app.service.file_import.run_import_rules',
+}
+
+
+class JobQueueService:
+    """
+    database job queue on AsyncTask
+
+    A queued job is a running task with a `kind`. Workers (`manage.py run_jobs`)
+    claim due jobs with a compare-and-set UPDATE, so no two workers get the same
+    job on any backend, SQLite included. A claim is a lease: the worker extends
+    `locked_until` with a heartbeat while the job runs, and a job whose lease
+    expired (crashed worker) is claimed again. Failed jobs are retried with an
+    exponential delay until `max_attempts`.
+
+    enqueue(): create a queued job
+    store_file(): copy an uploaded file where workers can read it
+    claim(): lease due jobs to a worker
+    heartbeat(): extend the lease of a claimed job
+    run(): run a claimed job with heartbeat and retry
+    discard_files(): remove the stored files of a job
+    """
+
+    @staticmethod
+    def enqueue(
+        kind: str,
+        user_dict: Dict[str, Any],
+        payload: Dict[str, Any],
+        max_attempts: Optional[int] = None,
+    ) -> AsyncTask:
+        """
+        Create a queued job
+        :param kind: job kind, a key of JOB_HANDLERS
+        :param user_dict: user dictionary
+        :param payload: JSON arguments of the handler, `files` are removed when the job ends
+        :param max_attempts: attempts before the job fails, default settings.JOB_MAX_ATTEMPTS
+        :return: async task
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError('Unknown job: ' + kind)
+
+        return AsyncTask.objects.create(
+            user_id=user_dict.get('id'),
+            kind=kind,
+            payload=payload,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+
+    @staticmethod
+    def store_file(file) -> str:
+        """
+        Copy an uploaded file to settings.JOB_FILES_DIR
+        :param file: uploaded file
+        :return: path
+        """
+        os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+        suffix = os.path.splitext(file.name or '')[1]
+
+        file.seek(0)
+        with tempfile.NamedTemporaryFile(
+            dir=settings.JOB_FILES_DIR, suffix=suffix, delete=False
+        ) as stored:
+            shutil.copyfileobj(file, stored)
+
+        return stored.name
+
+    @staticmethod
+    def claim(worker: str, limit: int = 1) -> List[AsyncTask]:
+        """
+        Lease due jobs to a worker
+        :param worker: worker id
+        :param limit: maximum jobs to claim
+        :return: claimed tasks
+        """
+        now = timezone.now()
+        lease = now + timedelta(seconds=settings.JOB_LEASE)
+
+        due = AsyncTask.objects.filter(is_running=True, kind__isnull=False).filter(
+            Q(run_after__isnull=True) | Q(run_after__lte=now),
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        )
+
+        # a lease that expired on the last attempt means the job keeps killing its worker
+        for task in due.filter(attempts__gte=F('max_attempts')):
+            task.finish_with_error('Job abandoned by its worker after %d attempts' % task.attempts)
+            JobQueueService.discard_files(task)
+
+        claimed = []
+        for task_id in due.order_by('id').values_list('pk', flat=True)[: limit * 4]:
+            if len(claimed) >= limit:
+                break
+
+            updated = due.filter(pk=task_id, attempts__lt=F('max_attempts')).update(
+                locked_by=worker, locked_until=lease, attempts=F('attempts') + 1
+            )
+            if updated:
+                claimed.append(AsyncTask.objects.get(pk=task_id))
+
+        return claimed
+
+    @staticmethod
+    def heartbeat(task_id: int, worker: str) -> bool:
+        """
+        Extend the lease of a claimed job
+        :param task_id: task id
+        :param worker: worker id
+        :return: False when the job is no longer leased to the worker
+        """
+        return bool(
+            AsyncTask.objects.filter(pk=task_id, locked_by=worker, is_running=True).update(
+                locked_until=timezone.now() + timedelta(seconds=settings.JOB_LEASE)
+            )
+        )
+
+    @staticmethod
+    def run(task_id: int, worker: str) -> None:
+        """
+        Run a claimed job, with a heartbeat thread extending its lease
+        :param task_id: task id
+        :param worker: worker id
+        :return: void
+        """
+        task = AsyncTask.objects.get(pk=task_id)
+        stopped = threading.Event()
+
+        def beat():
+            try:
+                while not stopped.wait(settings.JOB_LEASE / 3):
+                    JobQueueService.heartbeat(task_id, worker)
+            finally:
+                connection.close()
+
+        heartbeat = threading.Thread(target=beat, name='job-heartbeat-%d' % task_id, daemon=True)
+        heartbeat.start()
+
+        try:
+            import_string(JOB_HANDLERS[task.kind])(task)
+        except Exception as e:
+            logging.exception('Job %d (%s) failed', task_id, task.kind)
+            JobQueueService.retry_or_fail(task, str(e))
+        else:
+            # handlers finish their task, a task left running is done
+            AsyncTask.objects.filter(pk=task_id, is_running=True).update(
+                is_running=False, progress=100
+            )
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+        task.refresh_from_db()
+        AsyncTask.objects.filter(pk=task_id, locked_by=worker).update(locked_until=None)
+        if not task.is_running:
+            JobQueueService.discard_files(task)
+
+    @staticmethod
+    def retry_or_fail(task: AsyncTask, error: str) -> None:
+        """
+        Queue a failed job again after settings.JOB_RETRY_DELAY * 2 ^ (attempts - 1)
+        seconds, or fail it after its last attempt
+        :param task: task
+        :param error: error message
+        :return: void
+        """
+        task.refresh_from_db()
+        if not task.is_running:
+            return
+
+        if task.attempts >= task.max_attempts:
+            task.finish_with_error(error)
+            return
+
+        delay = settings.JOB_RETRY_DELAY * 2 ** (task.attempts - 1)
+        AsyncTask.objects.filter(pk=task.pk, is_running=True).update(
+            progress=0,
+            locked_by=None,
+            locked_until=None,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    @staticmethod
+    def discard_files(task: AsyncTask) -> None:
+        """
+        Remove the stored files of a job
+        :param task: task
+        :return: void
+        """
+        for path in (task.payload or {}).get('files', []):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -16,12 +16,14 @@ def decode_value(val):
     return int.from_bytes(decoded, 'big')
 
 
+def rsa_public_key_from_jwk(jwk):
+    return RSAPublicNumbers(n=decode_value(jwk['n']), e=decode_value(jwk['e'])).public_key(
+        default_backend()
+    )
+
+
 def rsa_pem_from_jwk(jwk):
-    return (
-        RSAPublicNumbers(n=decode_value(jwk['n']), e=decode_value(jwk['e']))
-        .public_key(default_backend())
-        .public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo,
-        )
+    return rsa_public_key_from_jwk(jwk).public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
     )
@@ -1,13 +1,18 @@
-from typing import Any, Dict, List, Union
+import itertools
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from django.http.request import QueryDict
 
 from app.exceptions.http import HttpException
-from app.models import Project
+from app.models import Project, Test, VinTests
+from app.serializers.loader import RelationLoader
 from app.serializers.paging import PagingSerializer
 from app.serializers.project import ProjectSerializer
 from app.serializers.query import QuerySerializer
+from app.serializers.selection import Selection
 from app.utils import helper
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
+from app.utils.queries import query_budget
 
 
 class ProjectService:
@@ -18,8 +23,13 @@ class ProjectService:
     get_project_list(): get project list
     get_project_total(): get project total count
     search_projects(): get project pagination
+    get_matrix_tests(): get the test columns of the project matrix
+    iter_matrix_chunks(): stream the project matrix in chunks of vins
+    get_project_matrix(): get the project vin x test matrix
     """
 
+    MATRIX_CHUNK_SIZE = 1000
+
     def get_project(self, id: str) -> Project:
         """
         Get project
@@ -31,26 +41,20 @@ class ProjectService:
         except Project.DoesNotExist:
             raise HttpException(404, 'Project not found')
 
-    def get_project_list(self, offset: int, limit: int, order: str, name: str) -> List[Any]:
+    def get_project_list(
+        self, paginator: KeysetPaginator, name: str, selection: Optional[Selection] = None
+    ) -> List[Any]:
         """
         Get project list
-        :param offset: offset
-        :param limit: limit
-        :param order: order
+        :param paginator: keyset paginator
         :param name: name
+        :param selection: fields and relations to load, None for the full payload
         :return: project list
         """
-        sort_by = 'name' if order == 'asc' else '-name'
-
-        results = []
-        projects = Project.objects.filter(name__icontains=name).order_by(sort_by)[
-            offset : offset + limit
-        ]
+        projects = paginator.paginate(Project.objects.filter(name__icontains=name))
+        loader = RelationLoader().load_projects(projects, selection)
 
-        for project in list(projects):
-            results.append(ProjectSerializer(project).to_dict())
-
-        return results
+        return [ProjectSerializer(project, loader, selection).to_dict() for project in projects]
 
     def get_project_total(self, name: str) -> int:
         """
@@ -58,8 +62,9 @@ class ProjectService:
         :param name: project name
         :return: count
         """
-        return Project.objects.filter(name__icontains=name).count()
+        return cached_count(Project.objects.filter(name__icontains=name))
 
+    @query_budget(4)
     def search_projects(self, query: QueryDict) -> Dict[str, Any]:
         """
         Get project list pagination
@@ -70,18 +75,116 @@ class ProjectService:
         query = QuerySerializer(query)
 
         name = query.get('name', '')
-        offset = query.get('offset', 0, 'int')
-        limit = query.get('limit', 10000000000, 'int')
         sort_order = query.get('sortOrder', 'asc')
+        selection = Selection.from_query(query.query)
 
         # check sort order
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
+        paginator = KeysetPaginator(query, sort_keys(['name', 'id'], sort_order))
 
         # get project list
-        project_list = self.get_project_list(offset, limit, sort_order, name)
+        project_list = self.get_project_list(paginator, name, selection)
 
         # get total
-        total = self.get_project_total(name)
+        total = self.get_project_total(name) if paginator.with_total else None
 
         # success
-        return PagingSerializer(offset, limit, total, project_list).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, project_list).to_dict()
+
+    def get_matrix_tests(self, project: Project, test_ids: Optional[List[int]]) -> List[Tuple]:
+        """
+        Get the test columns of the project matrix
+        :param project: project
+        :param test_ids: requested test ids in column order, None for every test of the project
+        :return: (id, name) list
+        """
+        if test_ids is None:
+            tests = Test.objects.filter(
+                id__in=VinTests.objects.filter(project=project).values('tests_id')
+            )
+            return list(tests.order_by('id').values_list('id', 'name'))
+
+        names = dict(Test.objects.filter(id__in=test_ids).values_list('id', 'name'))
+
+        return [
+            (test_id, names[test_id]) for test_id in dict.fromkeys(test_ids) if test_id in names
+        ]
+
+    def iter_matrix_chunks(
+        self, project: Project, test_ids: List[int], chunk_size: int
+    ) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Stream the project matrix rows from one VinTests query, chunk_size vins at a time
+        :param project: project
+        :param test_ids: test ids in column order
+        :param chunk_size: vins per chunk
+        :return: chunks of vin names, value rows and qualifier rows
+        """
+        column = {test_id: index for index, test_id in enumerate(test_ids)}
+        vin_tests = (
+            VinTests.objects.filter(project=project, tests_id__in=test_ids)
+            .order_by('vin__name')
+            .values_list('vin__name', 'tests_id', 'value', 'qualifier')
+        )
+
+        chunk = {'vins': [], 'values': [], 'qualifiers': []}
+        rows = itertools.groupby(vin_tests.iterator(chunk_size=2000), key=lambda row: row[0])
+
+        for vin_name, cells in rows:
+            values = [None] * len(column)
+            qualifiers = [None] * len(column)
+
+            for _, test_id, value, qualifier in cells:
+                values[column[test_id]] = value
+                qualifiers[column[test_id]] = qualifier
+
+            chunk['vins'].append(vin_name)
+            chunk['values'].append(values)
+            chunk['qualifiers'].append(qualifiers)
+
+            if len(chunk['vins']) >= chunk_size:
+                yield chunk
+                chunk = {'vins': [], 'values': [], 'qualifiers': []}
+
+        if chunk['vins']:
+            yield chunk
+
+    def get_project_matrix(
+        self, id: str, query: QueryDict
+    ) -> Tuple[Dict[str, Any], Iterator[Dict[str, List[Any]]]]:
+        """
+        Get the columnar vin x test matrix of a project
+        :param id: project id
+        :param query: query
+        :return: (header, row chunks)
+        """
+        # get queries
+        query = QuerySerializer(query)
+
+        tests = query.get('tests')
+        chunk_size = query.get('chunkSize', self.MATRIX_CHUNK_SIZE, 'int')
+
+        if chunk_size < 1:
+            raise HttpException(400, 'chunkSize must be a positive integer')
+
+        try:
+            test_ids = [int(test_id) for test_id in tests.split(',') if test_id] if tests else None
+        except ValueError:
+            raise HttpException(400, 'Invalid parameter type, parameter: tests')
+
+        # get project
+        project = self.get_project(id)
+
+        # get columns
+        columns = self.get_matrix_tests(project, test_ids)
+        header = {
+            'projectId': project.id,
+            'tests': {
+                'id': [test_id for test_id, _ in columns],
+                'name': [name for _, name in columns],
+            },
+        }
+
+        return header, self.iter_matrix_chunks(
+            project, [test_id for test_id, _ in columns], chunk_size
+        )
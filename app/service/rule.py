@@ -5,13 +5,18 @@ from django.db import IntegrityError, transaction
 from django.http.request import QueryDict
 
 from app.exceptions.http import HttpException
-from app.models import Rule, RuleVersion, WorkspacesRule
+from app.models import Rule, RuleVersion
+from app.serializers.loader import RelationLoader
 from app.serializers.paging import PagingSerializer
 from app.serializers.query import QuerySerializer
 from app.serializers.rule import RuleSerializer
+from app.serializers.selection import Selection
+from app.service.bulk_delete import BulkDeleteService
 from app.service.rule_version import RuleVersionService
 from app.service.user import UserService
 from app.utils import helper
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
+from app.utils.queries import query_budget
 
 
 class RuleService:
@@ -43,45 +48,28 @@ class RuleService:
         """
         Delete rule
         :param id: rule id
-        :return: void
+        :return: deleted row count per table
         """
         # get rule
         rule = self.get_rule(id)
 
-        # get rule versions
-        rule_versions = RuleVersion.objects.filter(rule=rule)
-        workspace_rules = WorkspacesRule.objects.filter(rule=rule)
-
-        with transaction.atomic():
-            # delete workspace rules
-            workspace_rules.delete()
-
-            # delete rule versions
-            for rule_version in list(rule_versions):
-                RuleVersionService().delete_rule_version(rule_version.id)
+        # delete workspace rules, rule versions with associates and rule
+        return BulkDeleteService().delete_rules([rule.id])
 
-            # delete rule
-            rule.delete()
-
-    def get_rule_list(self, name: str, offset: int, limit: int, order: str) -> List[Any]:
+    def get_rule_list(
+        self, name: str, paginator: KeysetPaginator, selection: Optional[Selection] = None
+    ) -> List[Any]:
         """
         Get rule list
         :param name: name filter
-        :param offset: offset
-        :param limit: limit
-        :param order: order direction
+        :param paginator: keyset paginator
+        :param selection: fields and relations to load, None for the full payload
         :return: rule list
         """
-        sort_by = 'name' if order == 'asc' else '-name'
-
-        results = []
-        rules = Rule.objects.filter(name__icontains=name).order_by(sort_by)[offset : offset + limit]
+        rules = paginator.paginate(Rule.objects.filter(name__icontains=name))
+        loader = RelationLoader().load_rules(rules, selection)
 
-        for rule in list(rules):
-            _rule = RuleSerializer(rule).to_dict()
-            results.append(_rule)
-
-        return results
+        return [RuleSerializer(rule, loader, selection).to_dict() for rule in rules]
 
     def get_rule_total(self, name):
         """
@@ -89,8 +77,9 @@ class RuleService:
         :param name: rule name
         :return: count
         """
-        return Rule.objects.filter(name__icontains=name).count()
+        return cached_count(Rule.objects.filter(name__icontains=name))
 
+    @query_budget(9)
     def search_rules(self, query: QueryDict) -> Dict[str, Any]:
         """
         search rules
@@ -101,20 +90,21 @@ class RuleService:
         query = QuerySerializer(query)
 
         name = query.get('name', '')
-        offset = query.get('offset', 0, 'int')
-        limit = query.get('limit', 10000000000, 'int')
         sort_order = query.get('sortOrder', 'asc')
+        selection = Selection.from_query(query.query)
 
         # check sort order
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
+        paginator = KeysetPaginator(query, sort_keys(['name', 'id'], sort_order))
 
         # get rules
-        rules = self.get_rule_list(name, offset, limit, sort_order)
+        rules = self.get_rule_list(name, paginator, selection)
+
+        # get total
+        total = self.get_rule_total(name) if paginator.with_total else None
 
         # success
-        return PagingSerializer(
-            offset, limit, Rule.objects.filter(name__icontains=name).count(), rules
-        ).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, rules).to_dict()
 
     def update_rule(self, id: str, data: Dict[str, Union[int, str]]) -> None:
         """
@@ -171,7 +161,7 @@ class RuleService:
         # get data
         rule = self.get_rule(id)
         name = data.get('name')
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         # check name validation
         if name is None or name == '':
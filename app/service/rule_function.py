@@ -12,6 +12,7 @@ from app.parser.Sankey.parse_to_json_tracker import get_sankey_info
 from app.serializers.query import QuerySerializer
 from app.serializers.rule_function import RuleFunctionSerializer
 from app.utils import helper
+from app.utils.catalogue import get_catalogue
 
 
 class RuleFunctionService:
@@ -21,6 +22,8 @@ class RuleFunctionService:
     parse_rule_text(): parse ruleText according to function
     parse_node_text(): parse nodeText according to function
     get_test_by_category(): get specific tests with category
+    transform_for_sankey(): get nodes list in Sankey format
+    check_columns(): check the columnar Sankey format
     """
 
     def __init__(self) -> None:
@@ -81,15 +84,40 @@ class RuleFunctionService:
         helper.check_required('ams', ams)
         helper.check_array('vins', vins)
 
-        to_list = lambda d: {k: [v] for k, v in d.items()}
-
-        data['vins'] = {v.get('name'): v.get('testResults') for v in vins}
-        data['vinsQualifiers'] = {v.get('name'): v.get('qualifiers', '') for v in vins}
+        if 'values' in data:
+            # columnar format, decoded by the engine as is
+            self.check_columns(data)
+        else:
+            data['vins'] = {v.get('name'): v.get('testResults') for v in vins}
+            data['vinsQualifiers'] = {v.get('name'): v.get('qualifiers', '') for v in vins}
 
         json_nodes = get_sankey_info(data)
         nodes = json.loads(json_nodes).get('nodes')
         return RuleFunctionSerializer(nodes=nodes)
 
+    def check_columns(self, data: Dict[str, Any]) -> None:
+        """
+        Check the columnar Sankey format: `tests` names, `vins` names and `values`
+        (optionally `qualifiers`) rows, one per vin with one cell per test
+        :param data: request data
+        :return: void
+        """
+        tests = data.get('tests')
+        helper.check_array_item('tests', tests, 'string')
+
+        for field in ('values', 'qualifiers'):
+            rows = data.get(field)
+            if field == 'qualifiers' and rows is None:
+                continue
+
+            helper.check_array(field, rows)
+            if len(rows) != len(data['vins']):
+                raise HttpException(400, field + ' must have one row per vin')
+
+            for row in rows:
+                if not isinstance(row, list) or len(row) != len(tests):
+                    raise HttpException(400, field + ' rows must have one cell per test')
+
     def __get_test_by_category(self, parser, query, function):
         """
         Get rule by category for given parser
@@ -163,13 +191,8 @@ class RuleFunctionService:
 
     def __tests_to_mappings(self, tests):
         """
-        Get mappings for parser.get_rule
+        Get mappings for parser.get_rule, shared per test set by the catalogue
         :param tests: array of objects with fields testName, testType, testCategoryName and testGroupName (optional)
         :return: ams
         """
-        ams = {}
-        for test in tests:
-            if test['testCategoryName'] not in ams:
-                ams[test['testCategoryName']] = []
-            ams[test['testCategoryName']].append(test['name'])
-        return ams
+        return get_catalogue().mappings(tests)
@@ -13,9 +13,13 @@ from app.parser import constants
 from app.parser import parse_garage_language as parser
 from app.serializers.paging import PagingSerializer
 from app.serializers.query import QuerySerializer
-from app.serializers.rule_version import RuleVersionSerializer
+from app.serializers.selection import Selection
+from app.service.bulk_delete import BulkDeleteService
+from app.service.rule_version_document import RuleVersionDocumentService
 from app.service.user import UserService
-from app.utils import helper
+from app.utils import helper, invalidation
+from app.utils.pagination import KeysetPaginator, cached_count
+from app.utils.queries import query_budget
 
 
 class RuleVersionService:
@@ -120,7 +124,7 @@ class RuleVersionService:
         """
         Delete rule version
         :param id: rule version id
-        :return: void
+        :return: deleted row count per table
         """
         # get rule version
         rule_version = self.get_rule_version(id)
@@ -131,17 +135,8 @@ class RuleVersionService:
                 403, "Rule version cannot be modified or deleted in 'Published' state"
             )
 
-        # get associated
-        rule_version_nodes = RuleVersionNode.objects.filter(rule_version=rule_version)
-        rule_version_notes = RuleVersionNote.objects.filter(rule_version=rule_version)
-        rule_version_has_vins = RuleVersionHasVin.objects.filter(rule_version=rule_version)
-
-        # delete
-        with transaction.atomic():
-            rule_version_has_vins.delete()
-            rule_version_notes.delete()
-            rule_version_nodes.delete()
-            rule_version.delete()
+        # delete with associates
+        return BulkDeleteService().delete_rule_versions([rule_version.id])
 
     def patch_rule_version(
         self,
@@ -175,6 +170,7 @@ class RuleVersionService:
                     t = Test.objects.get(id=test.get('id'))
                     RuleVersionsHasTests.objects.create(rule_versions=rule_version, tests=t)
 
+                RuleVersionDocumentService().refresh([rule_version.id])
                 return
 
         self.check_draft_and_unlocked(rule_version, user_dict)
@@ -218,6 +214,7 @@ class RuleVersionService:
                 self.update_or_insert_vins(rule_version, enabled_vins)
 
             rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def validate_rule_trees(self, rule_trees):
         """
@@ -282,9 +279,12 @@ class RuleVersionService:
         # remove notes for removed nodes
         for node_id in deleted_elements:
             RuleVersionNodeNote.objects.filter(rule_version=rule_version, node_id=node_id).delete()
+        if deleted_elements:
+            invalidation.publish(RuleVersionNodeNote, [rule_version.id])
 
-        # remove existing rule version nodes
+        # remove existing rule version nodes, a queryset delete sends no signals
         rule_version_nodes.delete()
+        invalidation.publish(RuleVersionNode, [rule_version.id])
 
         # insert rule version node
         for rule_tree in rule_trees:
@@ -337,6 +337,7 @@ class RuleVersionService:
         RuleVersionHasVin.objects.filter(
             vins__in=unprocessed_vins, rule_version=rule_version
         ).delete()
+        invalidation.publish(RuleVersionHasVin, [rule_version.id])
 
     def update_rule_version_vin_selection(
         self,
@@ -368,43 +369,53 @@ class RuleVersionService:
         processed_vin_ids = []
         vin_ids = [vin.id for vin in RuleVersionHasVin.objects.filter(rule_version=id)]
 
-        if enabled_vins is not None:
-            for enabled_vin in enabled_vins:
-                vin = Vin.objects.get(id=enabled_vin.get('id'))
+        with transaction.atomic():
+            if enabled_vins is not None:
+                for enabled_vin in enabled_vins:
+                    vin = Vin.objects.get(id=enabled_vin.get('id'))
 
-                # update vin
-                vin.name = enabled_vin.get('vin')
-                vin.save()
+                    # update vin
+                    vin.name = enabled_vin.get('vin')
+                    vin.save()
 
-                # append processed vin ids
-                processed_vin_ids.append(vin.id)
+                    # append processed vin ids
+                    processed_vin_ids.append(vin.id)
 
-                # add ruleversion - vin mapping if not present
-                if vin.id not in vin_ids:
-                    RuleVersionHasVin.objects.get_or_create(rule_version=rule_version, vins=vin)
+                    # add ruleversion - vin mapping if not present
+                    if vin.id not in vin_ids:
+                        RuleVersionHasVin.objects.get_or_create(
+                            rule_version=rule_version, vins=vin
+                        )
 
-        # remove unprocessed vins and rule version has vins
-        unprocessed_vins = Vin.objects.exclude(id__in=processed_vin_ids)
-        RuleVersionHasVin.objects.filter(
-            vins__in=unprocessed_vins, rule_version=rule_version
-        ).delete()
+            # remove unprocessed vins and rule version has vins
+            unprocessed_vins = Vin.objects.exclude(id__in=processed_vin_ids)
+            RuleVersionHasVin.objects.filter(
+                vins__in=unprocessed_vins, rule_version=rule_version
+            ).delete()
+            invalidation.publish(RuleVersionHasVin, [rule_version.id])
+
+            RuleVersionDocumentService().refresh([rule_version.id])
 
-    def get_rule_version_list(self, offset: int, limit: int, id: str) -> List[Any]:
+    def get_rule_version_list(
+        self, paginator: KeysetPaginator, id: str, selection: Optional[Selection] = None
+    ) -> List[Any]:
         """
         Get rule version list
-        :param offset: offset
-        :param limit: limit
+        :param paginator: keyset paginator
         :param id: rule id
+        :param selection: fields and relations to load, None for the full payload
         :return: rule list
         """
-        results = []
-        rule = self.get_rule(id)
-        rule_versions = RuleVersion.objects.filter(rule=rule)[offset : offset + limit]
+        rule_versions = paginator.paginate(RuleVersion.objects.filter(rule_id=id).only('id'))
 
-        for rule_version in list(rule_versions):
-            results.append(RuleVersionSerializer(rule_version).to_dict())
+        # a missing rule has no versions, so only an empty page tells it apart
+        if not rule_versions:
+            self.get_rule(id)
 
-        return results
+        # documents of the page, with one query once they are built
+        return RuleVersionDocumentService().get_documents(
+            [rule_version.id for rule_version in rule_versions], selection
+        )
 
     def get_rule_versions_total(self, id: str) -> int:
         """
@@ -412,10 +423,9 @@ class RuleVersionService:
         :param id: rule id
         :return: total count
         """
-        rule = self.get_rule(id)
-
-        return RuleVersion.objects.filter(rule=rule).count()
+        return cached_count(RuleVersion.objects.filter(rule_id=id))
 
+    @query_budget(12)
     def search_rule_versions(self, id: str, query: QueryDict) -> Dict[str, Dict[str, int]]:
         """
         search rule versions
@@ -427,14 +437,14 @@ class RuleVersionService:
         query = QuerySerializer(query)
 
         # validate query params
-        offset = query.get('offset', 0, 'int')
-        limit = query.get('limit', 10000000000, 'int')
+        paginator = KeysetPaginator(query, ['id'])
+        selection = Selection.from_query(query.query)
 
         # get rule version list
-        rule_version_list = self.get_rule_version_list(offset, limit, id)
-        total = self.get_rule_versions_total(id)
+        rule_version_list = self.get_rule_version_list(paginator, id, selection)
+        total = self.get_rule_versions_total(id) if paginator.with_total else None
 
-        return PagingSerializer(offset, limit, total, rule_version_list).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, rule_version_list).to_dict()
 
     def create_new_rule_version(
         self,
@@ -452,7 +462,7 @@ class RuleVersionService:
         """
         notes = data.get('notes')
         version_number = data.get('versionNumber')
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         # check version_number validation
         if version_number is None or version_number == '':
@@ -477,6 +487,8 @@ class RuleVersionService:
                     RuleVersionNote.objects.create(
                         user=user, notes=notes, rule_version=created_rule_version
                     )
+
+                RuleVersionDocumentService().refresh([created_rule_version.id])
         except IntegrityError:
             raise HttpException(
                 409,
@@ -552,7 +564,10 @@ class RuleVersionService:
             raise HttpException(403, "Rule version state is not 'In Review': " + rule_version.state)
 
         rule_version.state = 'Draft'
-        rule_version.save()
+
+        with transaction.atomic():
+            rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def approve_publish(self, user: Dict[str, Optional[Union[str, int]]], id: str):
         """
@@ -576,11 +591,21 @@ class RuleVersionService:
 
         rule_version.state = 'Published'
         rule_version.version_number = 'v' + str(numbers[0] + 1) + '.0'
-        rule_version.save()
 
-        RuleVersion.objects.filter(
-            rule=rule_version.rule, version_number__startswith=old_major
-        ).exclude(state='Published').update(state='Deprecated')
+        with transaction.atomic():
+            rule_version.save()
+
+            deprecated = list(
+                RuleVersion.objects.filter(
+                    rule_id=rule_version.rule_id, version_number__startswith=old_major
+                )
+                .exclude(state='Published')
+                .values_list('pk', flat=True)
+            )
+            RuleVersion.objects.filter(pk__in=deprecated).update(state='Deprecated')
+            invalidation.publish(RuleVersion, deprecated)
+
+            RuleVersionDocumentService().refresh([rule_version.id, *deprecated])
 
     def request_publish(self, id: str):
         """
@@ -595,7 +620,10 @@ class RuleVersionService:
             raise HttpException(403, "Rule version state is not 'Draft': " + rule_version.state)
 
         rule_version.state = 'In Review'
-        rule_version.save()
+
+        with transaction.atomic():
+            rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def lock_unlock_rule_version(
         self,
@@ -640,7 +668,9 @@ class RuleVersionService:
             rule_version.is_locked = False
             rule_version.locked_by_user_id = 0
 
-        rule_version.save()
+        with transaction.atomic():
+            rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def modify_text(self, user_dict, text, id):
         """
@@ -670,7 +700,10 @@ class RuleVersionService:
             )
 
         rule_version.text = text
-        rule_version.save()
+
+        with transaction.atomic():
+            rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def convert_plain_text(
         self,
@@ -706,32 +739,15 @@ class RuleVersionService:
         # if not parser.parses(text):
         logging.info('Lexer %s', text)
 
-        lexer = parser.get_lexer()
-        lexer.input(text)
-        counter = 1
-        tokens = []
-        parent_id = None
-        nodes = []
-
-        while True:
-            token = lexer.token()
-            if not token or token.value == 'THEN' or token.value == 'OTHERWISE':
-                nodes.append(dict(id=counter, text=' '.join(tokens), parentId=parent_id))
-                tokens = token and [token.value]
-                counter += 1
-                if not token:
-                    break
-                if token.value == 'THEN':
-                    parent_id = counter - 1
-            else:
-                if token.type == 'PRINT_VAL':
-                    token.value = '"' + token.value + '"'
-                tokens.append(token.value)
-        self.delete_and_insert_rule_version_nodes(
-            RuleVersionNode.objects.filter(rule_version=rule_version),
-            rule_version,
-            nodes,
-        )
+        nodes = parser.split_rule_nodes(text)
+
+        with transaction.atomic():
+            self.delete_and_insert_rule_version_nodes(
+                RuleVersionNode.objects.filter(rule_version=rule_version),
+                rule_version,
+                nodes,
+            )
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def create_new_notes(
         self,
@@ -769,7 +785,7 @@ class RuleVersionService:
 
         # get data
         notes = data.get('newNotes')
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         # invalid notes
         if notes is None or notes == '':
@@ -779,6 +795,7 @@ class RuleVersionService:
             # create rule version note and update rule version modified date
             RuleVersionNote.objects.create(notes=notes, user=user, rule_version=rule_version)
             rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def create_new_node_notes(
         self,
@@ -817,7 +834,7 @@ class RuleVersionService:
 
         # get data
         notes = data.get('newNotes')
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         # invalid notes
         if notes is None or notes == '':
@@ -835,6 +852,7 @@ class RuleVersionService:
                 node_id=rule_version_node.node_id,
             )
             rule_version.save()
+            RuleVersionDocumentService().refresh([rule_version.id])
 
     def clone_rule_version(self, user_dict, id):
         """
@@ -845,7 +863,7 @@ class RuleVersionService:
         """
         rule_version = self.get_rule_version(id)
 
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         latest_rule = (
             RuleVersion.objects.filter(rule=rule_version.rule).order_by('-version_number')[:1].get()
@@ -880,6 +898,8 @@ class RuleVersionService:
                 rule_version=created_rule_version,
             )
 
+            RuleVersionDocumentService().refresh([created_rule_version.id])
+
         return created_rule_version.id
 
     def copy_rule_version(self, id, rule, user):
@@ -909,6 +929,8 @@ class RuleVersionService:
         self.copy_rule_version_has_tests(rule_version, created_rule_version)
         self.copy_rule_version_notes(rule_version, created_rule_version)
 
+        RuleVersionDocumentService().refresh([created_rule_version.id])
+
     def copy_rule_version_has_vins(self, existing_rule_version, created_rule_version):
         """
         copy rule version has vins
@@ -1013,6 +1035,8 @@ class RuleVersionService:
                 if not created:
                     raise HttpException(409, 'Test #%d already associated' % test_id)
 
+            RuleVersionDocumentService().refresh([rule_version.id])
+
     def delete_rule_version_test(
         self, user_dict: Dict[str, Optional[Union[str, int]]], id: str, test_id: str
     ):
@@ -1022,7 +1046,9 @@ class RuleVersionService:
         try:
             test = Test.objects.get(pk=test_id)
             association = RuleVersionsHasTests.objects.get(rule_versions=rule_version, tests=test)
-            association.delete()
+            with transaction.atomic():
+                association.delete()
+                RuleVersionDocumentService().refresh([rule_version.id])
         except Test.DoesNotExist:
             raise HttpException(404, 'Test not found')
         except RuleVersionsHasTests.DoesNotExist:
@@ -1046,3 +1072,5 @@ class RuleVersionService:
 
                 for test in list(tests):
                     RuleVersionsHasTests.objects.create(rule_versions=rule_version, tests=test)
+
+                RuleVersionDocumentService().refresh([rule_version.id])
@@ -0,0 +1,320 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from rest_framework.utils.encoders import JSONEncoder
+
+from app.exceptions.http import HttpException
+from app.models import (RuleVersion, RuleVersionDocument, RuleVersionHasVin,
+                        RuleVersionNodeNote, RuleVersionNote,
+                        RuleVersionsHasTests, Test, TestCategory, User, Vin,
+                        VinTests)
+from app.serializers.loader import RelationLoader
+from app.serializers.rule_version import RuleVersionSerializer
+from app.serializers.selection import Selection
+from app.serializers.vin import VinSerializer
+from app.utils import invalidation
+
+# keep every IN (...) list below the SQLite host parameter limit
+CHUNK_SIZE = 500
+
+
+class RuleVersionDocumentService:
+    """
+    denormalized rule version documents
+
+    A document is the RuleVersionSerializer payload of a rule version with every relation
+    expanded, as rendered to JSON, stored in `rule_version_documents`. The rule version
+    write paths refresh it in their transaction. Writes of the users, vins, vin tests and
+    tests it embeds expire it in their transaction too, through the invalidation bus (see
+    app.utils.invalidation), and an expired or missing document is built on its next read.
+
+    Refreshing or expiring a document bumps its version. A build on read is stored only
+    if the version it read first is still there, so a build from data read before a
+    concurrent write never outlives that write.
+
+    get_document(): get the document of a rule version
+    get_documents(): get the documents of rule versions
+    project(): drop the unselected fields and relations of a document
+    refresh(): build the documents of rule versions again
+    expire(): expire documents, built again on their next read
+    build(): build missing or expired documents on read
+    render(): serialize rule versions as documents
+    rebuild(): build every document again
+    """
+
+    def get_document(self, id: Any, selection: Optional[Selection] = None) -> Dict[str, Any]:
+        """
+        Get the document of a rule version, with one query when it is up to date
+        :param id: rule version id
+        :param selection: fields and relations to keep, None for the full payload
+        :return: serialized rule version
+        """
+        row = RuleVersionDocument.objects.filter(pk=id).values_list('document', 'version').first()
+
+        if row is None and not RuleVersion.objects.filter(pk=id).exists():
+            raise HttpException(404, 'Rule version not found')
+
+        if row is None or row[0] is None:
+            document = self.build({int(id): row and row[1]})[int(id)]
+        else:
+            document = row[0]
+
+        return self.project(document, selection)
+
+    def get_documents(
+        self, ids: List[int], selection: Optional[Selection] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the documents of rule versions, with one query when they are all up to date
+        :param ids: rule version ids
+        :param selection: fields and relations to keep, None for the full payload
+        :return: serialized rule versions, in the order of the ids
+        """
+        documents = {}
+        versions = dict.fromkeys(ids)
+        for id, document, version in RuleVersionDocument.objects.filter(pk__in=ids).values_list(
+            'rule_version_id', 'document', 'version'
+        ):
+            if document is None:
+                versions[id] = version
+            else:
+                documents[id] = document
+                del versions[id]
+
+        if versions:
+            documents.update(self.build(versions))
+
+        return [self.project(documents[id], selection) for id in ids if id in documents]
+
+    def project(
+        self, document: Dict[str, Any], selection: Optional[Selection] = None
+    ) -> Dict[str, Any]:
+        """
+        Drop the unselected fields and relations of a document, as the serializer does
+        :param document: serialized rule version with every relation expanded
+        :param selection: fields and relations to keep, None for the full payload
+        :return: serialized rule version
+        """
+        if selection is None:
+            return document
+
+        result = selection.prune(document, RuleVersionSerializer.relations)
+
+        if 'enabledVins' in result:
+            vins = selection.child('enabledVins')
+            result['enabledVins'] = [
+                vins.prune(vin, VinSerializer.relations) for vin in result['enabledVins']
+            ]
+
+        return result
+
+    def refresh(self, ids: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+        """
+        Build the documents of rule versions again, in the current transaction. Ids of
+        deleted rule versions are skipped.
+        :param ids: rule version ids
+        :return: documents by rule version id
+        """
+        documents = self.render(ids)
+
+        # builds on read that started before this write no longer find their version
+        for chunk in self.chunks(sorted(documents)):
+            RuleVersionDocument.objects.filter(pk__in=chunk).update(version=F('version') + 1)
+
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            conflicts = dict(unique_fields=['rule_version'])
+        else:
+            conflicts = dict()
+
+        RuleVersionDocument.objects.bulk_create(
+            (
+                RuleVersionDocument(rule_version_id=id, document=document)
+                for id, document in documents.items()
+            ),
+            batch_size=CHUNK_SIZE,
+            update_conflicts=True,
+            update_fields=['document'],
+            **conflicts,
+        )
+
+        return documents
+
+    def expire(self, ids: Iterable[Any]) -> None:
+        """
+        Expire the documents of rule versions in the current transaction, built again on
+        their next read
+        :param ids: rule version ids
+        :return: void
+        """
+        for chunk in self.chunks(sorted({int(id) for id in ids})):
+            # a missing document gets an expired row first, so a build on read that
+            # started before this write fails its insert
+            RuleVersionDocument.objects.bulk_create(
+                (RuleVersionDocument(rule_version_id=id, document=None) for id in chunk),
+                ignore_conflicts=True,
+            )
+            RuleVersionDocument.objects.filter(pk__in=chunk).update(
+                document=None, version=F('version') + 1
+            )
+
+    def build(self, versions: Dict[int, Optional[int]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Build missing or expired documents on read. Each one is stored only when no write
+        refreshed or expired it since its version was read.
+        :param versions: rule version id -> version read of its expired document, None
+            when it was missing
+        :return: documents by rule version id, stored or not
+        """
+        documents = self.render(versions)
+
+        RuleVersionDocument.objects.bulk_create(
+            (
+                RuleVersionDocument(rule_version_id=id, document=document)
+                for id, document in documents.items()
+                if versions[id] is None
+            ),
+            batch_size=CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+
+        for id, document in documents.items():
+            if versions[id] is not None:
+                RuleVersionDocument.objects.filter(pk=id, version=versions[id]).update(
+                    document=document
+                )
+
+        return documents
+
+    def render(self, ids: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+        """
+        Serialize rule versions with every relation expanded, as rendered to JSON
+        :param ids: rule version ids, ids of deleted rule versions are skipped
+        :return: documents by rule version id
+        """
+        documents = {}
+
+        for chunk in self.chunks(sorted({int(id) for id in ids})):
+            rule_versions = list(RuleVersion.objects.filter(pk__in=chunk).select_related('user'))
+            loader = RelationLoader().load_rule_versions(rule_versions)
+
+            for rule_version in rule_versions:
+                # stored as rendered, so reads send the document as it is
+                documents[rule_version.id] = json.loads(
+                    json.dumps(
+                        RuleVersionSerializer(rule_version, loader).to_dict(), cls=JSONEncoder
+                    )
+                )
+
+        return documents
+
+    def rebuild(self, batch_size: int = CHUNK_SIZE) -> Iterator[List[int]]:
+        """
+        Build the document of every rule version again, one transaction per batch
+        :param batch_size: rule versions per batch
+        :return: ids of the rebuilt rule versions, per batch
+        """
+        last_id = 0
+        while True:
+            ids = list(
+                RuleVersion.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                return
+
+            with transaction.atomic():
+                self.refresh(ids)
+
+            last_id = ids[-1]
+            yield ids
+
+    @staticmethod
+    def chunks(ids: List[int]) -> Iterator[List[int]]:
+        """
+        Split ids in CHUNK_SIZE lists
+        :param ids: ids
+        :return: chunks
+        """
+        for start in range(0, len(ids), CHUNK_SIZE):
+            yield ids[start : start + CHUNK_SIZE]
+
+
+def _expire_for(event: invalidation.Changed, rule_version_ids) -> None:
+    service = RuleVersionDocumentService()
+
+    # a change of any row of the table
+    if event.ids is None:
+        service.expire(RuleVersion.objects.values_list('pk', flat=True))
+        return
+
+    # one lookup per event, bulk writes publish all their rows at once
+    service.expire(rule_version_ids(sorted(event.ids)))
+
+
+def _expire_for_users(event: invalidation.Changed) -> None:
+    # author names of the rule versions, their notes and node notes
+    _expire_for(
+        event,
+        lambda ids: RuleVersion.objects.filter(user_id__in=ids)
+        .values_list('pk', flat=True)
+        .union(
+            RuleVersionNote.objects.filter(user_id__in=ids).values_list('rule_version_id'),
+            RuleVersionNodeNote.objects.filter(user_id__in=ids).values_list('rule_version_id'),
+        ),
+    )
+
+
+def _expire_for_vins(event: invalidation.Changed) -> None:
+    # enabled vins with their test results, vin_tests events hold vin ids too
+    _expire_for(
+        event,
+        lambda ids: RuleVersionHasVin.objects.filter(vins_id__in=ids).values_list(
+            'rule_version_id', flat=True
+        ),
+    )
+
+
+def _tests_rule_version_ids(ids):
+    # tests of the rule versions, and test names in the results of their vins
+    return (
+        RuleVersionsHasTests.objects.filter(tests_id__in=ids)
+        .values_list('rule_versions_id', flat=True)
+        .union(
+            RuleVersionHasVin.objects.filter(
+                vins_id__in=VinTests.objects.filter(tests_id__in=ids).values('vin_id')
+            ).values_list('rule_version_id')
+        )
+    )
+
+
+def _expire_for_tests(event: invalidation.Changed) -> None:
+    _expire_for(event, _tests_rule_version_ids)
+
+
+def _expire_for_test_categories(event: invalidation.Changed) -> None:
+    _expire_for(
+        event,
+        lambda ids: _tests_rule_version_ids(
+            Test.objects.filter(test_category_id__in=ids).values('pk')
+        ),
+    )
+
+
+def _expire_for_deleted_test(sender, instance, **kwargs) -> None:
+    # before the delete cascades to the rows naming the test
+    RuleVersionDocumentService().expire(_tests_rule_version_ids([instance.pk]))
+
+
+invalidation.subscribe(User._meta.db_table, _expire_for_users, in_transaction=True)
+invalidation.subscribe(Vin._meta.db_table, _expire_for_vins, in_transaction=True)
+invalidation.subscribe(VinTests._meta.db_table, _expire_for_vins, in_transaction=True)
+invalidation.subscribe(Test._meta.db_table, _expire_for_tests, in_transaction=True)
+invalidation.subscribe(
+    TestCategory._meta.db_table, _expire_for_test_categories, in_transaction=True
+)
+pre_delete.connect(_expire_for_deleted_test, sender=Test, dispatch_uid='rule_version_documents')
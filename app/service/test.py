@@ -1,6 +1,7 @@
 from typing import Dict, Optional, Union
 
 from django.db import IntegrityError
+from django.db.models.query import QuerySet
 from django.http.request import QueryDict
 from rest_framework import status
 
@@ -11,11 +12,14 @@ from app.serializers.query import QuerySerializer
 from app.serializers.test import TestSerializer
 from app.service.test_category import TestCategoryService
 from app.utils import helper
+from app.utils.catalogue import get_catalogue
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
 
 
 class TestService:
     """
     get_tests(): get total tests
+    get_specific_tests(): get tests by category, from the catalogue
     """
 
     def get_tests(self, test_category=None):
@@ -42,21 +46,19 @@ class TestService:
         :param query query
         :return:
         """
-        results = {}
+        catalogue = get_catalogue()
         category_name = query.get('name')
 
         if category_name is None:
-            test_categories = TestCategoryService().get_test_categories()
-
-            for test_category in list(test_categories):
-                results[test_category.name] = self.get_tests(test_category)
-
-            return results
+            return {
+                name: catalogue.test_dicts(category_id)
+                for category_id, name in catalogue.categories.items()
+            }
         else:
-            test_category = TestCategoryService().get_test_categories(category_name)
+            category_id = catalogue.find_category(category_name)
 
-            if test_category is not None and len(test_category) > 0:
-                return self.get_tests(test_category[0])
+            if category_id is not None:
+                return catalogue.test_dicts(category_id)
             else:
                 raise HttpException(
                     status.HTTP_404_NOT_FOUND,
@@ -121,15 +123,33 @@ class TestService:
                 'name with ' + name + ' already exists',
             )
 
-    def get_tests_total(self, test_name: Optional[str] = None) -> int:
+    def filter_tests(
+        self, test_name: Optional[str] = None, test_category_name: Optional[str] = None
+    ) -> QuerySet:
+        """
+        Filter tests by name and category name
+        :param test_name: test name filter
+        :param test_category_name: test category name filter
+        :return: tests
+        """
+        tests = Test.objects.select_related('test_category')
+
+        if test_name:
+            tests = tests.filter(name__icontains=test_name)
+
+        if test_category_name:
+            tests = tests.filter(test_category__name__contains=test_category_name)
+
+        return tests
+
+    def get_tests_total(
+        self, test_name: Optional[str] = None, test_category_name: Optional[str] = None
+    ) -> int:
         """
         Get tests total count
         :return: count
         """
-        if test_name:
-            return Test.objects.filter(name__icontains=test_name).count()
-        else:
-            return Test.objects.count()
+        return cached_count(self.filter_tests(test_name, test_category_name))
 
     def search_tests(self, query: QueryDict) -> Dict[str, Dict[str, int]]:
         """
@@ -140,8 +160,6 @@ class TestService:
         # get queries
         query = QuerySerializer(query)
 
-        limit = query.get('limit', 10000000000, 'int')
-        offset = query.get('offset', 0, 'int')
         sort_by = query.get('sortBy', 'id')
         sort_order = query.get('sortOrder', 'asc')
         test_category_name = query.get('category')
@@ -151,33 +169,17 @@ class TestService:
         helper.check_choices('sortBy', sort_by, ['id', 'name', 'test_category_id'])
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
 
-        # set desc sort by
-        if sort_order == 'desc':
-            sort_by = '-' + sort_by
+        # id breaks ties of non unique sort keys
+        sort_fields = [sort_by] if sort_by == 'id' else [sort_by, 'id']
+        paginator = KeysetPaginator(query, sort_keys(sort_fields, sort_order))
 
-        # get tests
-        if test_name is not None and len(test_name):
-            tests = Test.objects.filter(name__icontains=test_name).order_by(sort_by)[
-                offset * limit : offset * limit + limit
-            ]
-        else:
-            # get test categories
-            tests = Test.objects.order_by(sort_by)[offset * limit : offset * limit + limit]
+        # get tests, the category filter is applied in the query so pages stay full
+        tests = paginator.paginate(self.filter_tests(test_name, test_category_name))
+        results = [TestSerializer(t).to_dict() for t in tests]
 
         # get total
-        total = self.get_tests_total(test_name)
+        total = (
+            self.get_tests_total(test_name, test_category_name) if paginator.with_total else None
+        )
 
-        results = []
-        for t in tests:
-            if (
-                test_category_name is not None
-                and len(test_category_name)
-                and test_category_name not in t.test_category.name
-            ):
-                total = total - 1
-                continue
-
-            d = TestSerializer(t).to_dict()
-            results.append(d)
-
-        return PagingSerializer(offset, limit, total, results).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, results).to_dict()
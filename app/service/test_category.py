@@ -1,5 +1,6 @@
 from typing import Dict, Optional, Union
 
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.http.request import QueryDict
 from rest_framework import status
@@ -10,6 +11,7 @@ from app.serializers.paging import PagingSerializer
 from app.serializers.query import QuerySerializer
 from app.serializers.test_category import TestCategorySerializer
 from app.utils import helper
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
 
 
 class TestCategoryService:
@@ -89,9 +91,9 @@ class TestCategoryService:
         :return: count
         """
         if test_category_name:
-            return TestCategory.objects.filter(name__icontains=test_category_name).count()
+            return cached_count(TestCategory.objects.filter(name__icontains=test_category_name))
         else:
-            return TestCategory.objects.count()
+            return cached_count(TestCategory.objects.all())
 
     def search_test_categories(
         self, query: QueryDict, with_tests: bool = False
@@ -105,45 +107,35 @@ class TestCategoryService:
         # get queries
         query = QuerySerializer(query)
 
-        limit = query.get('limit', 10000000000, 'int')
-        offset = query.get('offset', 0, 'int')
         sort_order = query.get('sortOrder', 'asc')
         filter_name = query.get('name')
 
         # check sort by value
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
 
-        # set desc sort by
-        sort_by = 'name'
-        if sort_order == 'desc':
-            sort_by = '-' + sort_by
+        sort_by = sort_keys(['name', 'id'], sort_order)
+        paginator = KeysetPaginator(query, sort_by)
 
         # get test categories
         if filter_name is not None and len(filter_name):
-            cats = TestCategory.objects.filter(name__icontains=filter_name).order_by(sort_by)
+            cats = TestCategory.objects.filter(name__icontains=filter_name)
         else:
-            cats = TestCategory.objects.order_by(sort_by)
+            cats = TestCategory.objects.all()
 
         tests = []
         if with_tests:
-            tests_by_categories = set(
-                Test.objects.filter(test_category_id__in=[c.id for c in cats])
-            )
-
-            tests_by_name = set()
+            # pages run over the tests of matching categories and the tests matching by name
+            condition = Q(test_category__in=cats)
             if filter_name is not None and len(filter_name):
-                tests_by_name = set(Test.objects.filter(name__icontains=filter_name))
-
-            tests = sorted(
-                list(tests_by_categories | tests_by_name),
-                key=lambda x: x.name,
-                reverse=(sort_order == 'desc'),
-            )
+                condition |= Q(name__icontains=filter_name)
 
-            total = len(tests)
-            tests = tests[offset * limit : offset * limit + limit]
+            matching_tests = Test.objects.filter(condition).select_related('test_category')
+            tests = paginator.paginate(matching_tests)
+            total = paginator.total(matching_tests)
+            cats = list(cats.order_by(*sort_by))
         else:
-            total = len(cats)
+            total = self.get_tests_category_total(filter_name) if paginator.with_total else None
+            cats = paginator.paginate(cats)
 
         category_ids = []
         results = []
@@ -163,4 +155,4 @@ class TestCategoryService:
                 results.append(d)
                 category_ids.append(t.test_category.id)
 
-        return PagingSerializer(offset, limit, total, results).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, results).to_dict()
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+from typing import Any, Dict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from app.exceptions.http import HttpException
+from app.models import Upload
+from app.utils import helper
+
+BLOCK_SIZE = 1 << 20
+
+
+class UploadService:
+    """
+    chunked upload service
+
+    A client declares the size and SHA-256 of a file, then sends it in chunks, each
+    appended on disk at the current offset. After a dropped connection the client
+    reads the offset back and resumes from there. The checksum is verified once the
+    last byte arrives, and a complete upload is handed over to an import job.
+
+    create_upload(): start an upload
+    get_upload(): get an upload of the user
+    append_chunk(): append a chunk at the offset of the upload
+    get_complete_upload(): get a verified upload of the user
+    delete_upload(): abort an upload and remove its file
+    purge_expired(): remove uploads idle for longer than settings.UPLOAD_TTL
+    """
+
+    def create_upload(self, user_dict: Dict[str, Any], data: Dict[str, Any]) -> Upload:
+        """
+        Start an upload
+        :param user_dict: user dictionary
+        :param data: `name`, `size` in bytes and `sha256` hex digest of the whole file
+        :return: upload
+        """
+        name, size, sha256 = data.get('name'), data.get('size'), data.get('sha256')
+
+        helper.check_string('name', name)
+        if not name:
+            raise HttpException(400, 'name must not be empty')
+        helper.check_int('size', size)
+        if not 0 < int(size) <= settings.UPLOAD_MAX_SIZE:
+            raise HttpException(400, 'size must be between 1 and %d' % settings.UPLOAD_MAX_SIZE)
+        helper.check_string('sha256', sha256)
+        if not re.fullmatch('[0-9a-fA-F]{64}', sha256):
+            raise HttpException(400, 'sha256 must be a hex SHA-256 digest')
+
+        self.purge_expired()
+
+        id = uuid.uuid4()
+        path = os.path.join(settings.JOB_FILES_DIR, 'upload-%s%s' % (id, os.path.splitext(name)[1]))
+        os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+        open(path, 'wb').close()
+
+        return Upload.objects.create(
+            id=id,
+            user_id=user_dict.get('id'),
+            name=os.path.basename(name),
+            size=int(size),
+            sha256=sha256.lower(),
+            path=path,
+        )
+
+    def get_upload(self, id: str, user_dict: Dict[str, Any]) -> Upload:
+        """
+        Get an upload of the user
+        :param id: upload id
+        :param user_dict: user dictionary
+        :return: upload
+        """
+        try:
+            upload = Upload.objects.get(pk=uuid.UUID(str(id)))
+        except (ValueError, Upload.DoesNotExist):
+            raise HttpException(404, 'Upload not found')
+
+        if upload.user_id != user_dict.get('id') and user_dict.get('role') != 'admin':
+            raise HttpException(403, "Only upload's owner or admin can access an upload")
+
+        return upload
+
+    def append_chunk(self, upload: Upload, offset: int, stream) -> Upload:
+        """
+        Append a chunk, read from the request stream in bounded blocks. The upload row
+        stays locked while the chunk is written, so a concurrent chunk at the same offset
+        waits and is then refused instead of overwriting the file.
+        :param upload: upload
+        :param offset: offset of the chunk, must be the offset of the upload
+        :param stream: request stream
+        :return: upload
+        """
+        with transaction.atomic():
+            try:
+                upload = Upload.objects.select_for_update().get(pk=upload.pk)
+            except Upload.DoesNotExist:
+                raise HttpException(404, 'Upload not found')
+            if upload.is_complete:
+                raise HttpException(409, 'Upload already complete')
+            if offset != upload.offset:
+                raise HttpException(409, 'Chunk offset must be {}'.format(upload.offset))
+
+            end = offset
+            with open(upload.path, 'r+b') as file:
+                file.seek(offset)
+                for block in iter(lambda: stream.read(BLOCK_SIZE), b''):
+                    end += len(block)
+                    if end > upload.size:
+                        file.truncate(offset)
+                        raise HttpException(400, 'Chunk exceeds the upload size')
+                    file.write(block)
+                file.truncate(end)
+
+            upload.offset = end
+            verified = True
+            if upload.offset == upload.size:
+                verified = self.verify(upload)
+            upload.save(update_fields=['offset', 'is_complete', 'date_updated'])
+
+        if not verified:
+            raise HttpException(400, 'Checksum mismatch, the upload restarts from offset 0')
+
+        return upload
+
+    def verify(self, upload: Upload) -> bool:
+        """
+        Verify the checksum of a fully received upload; on mismatch the file is emptied
+        and the upload restarts from offset 0. The caller saves the upload.
+        :param upload: upload
+        :return: True if the checksum matches
+        """
+        digest = hashlib.sha256()
+        with open(upload.path, 'rb') as file:
+            for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                digest.update(block)
+
+        if digest.hexdigest() != upload.sha256:
+            open(upload.path, 'wb').close()
+            upload.offset = 0
+            return False
+
+        upload.is_complete = True
+        return True
+
+    def get_complete_upload(self, id: str, user_dict: Dict[str, Any]) -> Upload:
+        """
+        Get a verified upload of the user
+        :param id: upload id
+        :param user_dict: user dictionary
+        :return: upload
+        """
+        upload = self.get_upload(id, user_dict)
+        if not upload.is_complete:
+            raise HttpException(409, 'Upload not complete, offset {}'.format(upload.offset))
+
+        return upload
+
+    def delete_upload(self, upload: Upload) -> None:
+        """
+        Abort an upload and remove its file
+        :param upload: upload
+        :return: void
+        """
+        upload.delete()
+        try:
+            os.remove(upload.path)
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self) -> None:
+        """
+        Remove uploads without a chunk for settings.UPLOAD_TTL seconds
+        :return: void
+        """
+        expired = Upload.objects.filter(
+            date_updated__lt=timezone.now() - timedelta(seconds=settings.UPLOAD_TTL)
+        )
+        for upload in expired:
+            self.delete_upload(upload)
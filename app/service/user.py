@@ -1,5 +1,9 @@
-from typing import Any, Dict, List, Optional, Union
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django.http.request import QueryDict
 
@@ -8,7 +12,27 @@ from app.models import User
 from app.serializers.paging import PagingSerializer
 from app.serializers.query import QuerySerializer
 from app.serializers.user import UserSerializer
-from app.utils import helper
+from app.service.validate_token import validate_jwt
+from app.utils import helper, invalidation
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
+from app.utils.queries import query_budget
+
+# cache keys of the user resolved from a token, of the versions of the entries of an email
+# and of all users, and of the email of a user id
+CURRENT_USER_KEY = 'current-user:%s'
+CURRENT_USER_VERSION_KEY = 'current-user-version:%s'
+CURRENT_USERS_VERSION_KEY = 'current-users-version'
+CURRENT_USER_EMAIL_KEY = 'current-user-email:%d'
+
+
+class CurrentUser(dict):
+    """
+    serialized current user, with the model instance in `user` for services to reuse
+    """
+
+    def __init__(self, user: User) -> None:
+        super().__init__(UserSerializer(user).to_dict())
+        self.user = user
 
 
 class UserService:
@@ -16,6 +40,9 @@ class UserService:
     user service
 
     get_user(): get user
+    get_current_user(): get the user of a bearer token, cached per token
+    get_current_user_model(): get the model of the current user
+    get_current_user_version(): get the version of the cached current user entries of an email
     get_user_by_email(): get user by email
     get_user_info_by_email(): get user by email
     check_user_exists(): get user exists boolean
@@ -38,6 +65,82 @@ class UserService:
         except User.DoesNotExist:
             raise HttpException(404, 'User not found')
 
+    def get_current_user(self, authorization: Optional[str]) -> CurrentUser:
+        """
+        Get the user of a bearer token, created on first sign in. The user is cached per
+        token for settings.CURRENT_USER_TTL seconds, at most until the token expires, and
+        dropped early by changes of the user, in every process (see drop_current_users).
+        :param authorization: Authorization header
+        :return: current user
+        """
+        if authorization is None:
+            raise HttpException(401, 'Token is missing')
+
+        token = authorization.replace('Bearer ', '')
+        key = CURRENT_USER_KEY % hashlib.sha256(token.encode()).hexdigest()
+
+        # decode token
+        try:
+            claims = validate_jwt(token)
+        except Exception:
+            raise HttpException(401, 'Invalid user token')
+
+        # check user exists
+        if not claims:
+            raise HttpException(404, "User doesn't exist")
+
+        # changes of users made by other processes
+        invalidation.sync()
+
+        # read before the user, so a change committed meanwhile outdates the new entry
+        email = claims.get('unique_name')
+        version = self.get_current_user_version(email)
+
+        cached = cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        try:
+            user = User.objects.get(email=claims.get('unique_name'))
+        except User.DoesNotExist:
+            claims['role'] = 'admin'
+            self.create_new_user_from_azure_token(claims)
+            user = User.objects.get(email=claims.get('unique_name'))
+
+        current_user = CurrentUser(user)
+        timeout = settings.CURRENT_USER_TTL
+        if claims.get('exp'):
+            timeout = min(timeout, max(int(claims['exp'] - time.time()), 1))
+
+        cache.set(CURRENT_USER_EMAIL_KEY % user.id, user.email, None)
+        cache.set(key, (version, current_user), timeout)
+
+        return current_user
+
+    def get_current_user_model(self, user_dict: Dict[str, Any]) -> User:
+        """
+        Get the model of the current user, resolved with the token when available
+        :param user_dict: current user
+        :return: user
+        """
+        user = getattr(user_dict, 'user', None)
+        if user is not None:
+            return user
+
+        return self.get_user(user_dict.get('id'))
+
+    def get_current_user_version(self, email: Optional[str]) -> Tuple[int, int]:
+        """
+        Get the version of the cached current user entries of an email, created when
+        missing so an entry is never stamped with a missing version
+        :param email: email of the token
+        :return: versions of the entries of all users and of the email
+        """
+        return (
+            cache.get_or_set(CURRENT_USERS_VERSION_KEY, time.time_ns, None),
+            cache.get_or_set(current_user_version_key(email), time.time_ns, None),
+        )
+
     def get_user_by_email(self, email: str) -> User:
         """
         Get user
@@ -140,19 +243,17 @@ class UserService:
         return UserSerializer(created_user).to_dict()
 
     def get_user_list(
-        self, offset: int, limit: int, sort_by: str
+        self, paginator: KeysetPaginator
     ) -> List[Dict[str, Optional[Union[str, int]]]]:
         """
         Get user list by options
-        :param offset: offset
-        :param limit: limit
-        :param sort_by: sort by
+        :param paginator: keyset paginator
         :return: user list
         """
         results = []
-        users = User.objects.order_by(sort_by)[offset : offset + limit]
+        users = paginator.paginate(User.objects.all())
 
-        for user in list(users):
+        for user in users:
             results.append(UserSerializer(user).to_dict())
 
         return results
@@ -162,8 +263,9 @@ class UserService:
         Get user total count
         :return: count
         """
-        return User.objects.count()
+        return cached_count(User.objects.all())
 
+    @query_budget(2)
     def search_user(self, query: QueryDict) -> Dict[str, Any]:
         """
         search user
@@ -173,8 +275,6 @@ class UserService:
         # get queries
         query = QuerySerializer(query)
 
-        limit = query.get('limit', 10000000000, 'int')
-        offset = query.get('offset', 0, 'int')
         sort_by = query.get('sortBy', 'name')
         sort_order = query.get('sortOrder', 'asc')
 
@@ -182,14 +282,49 @@ class UserService:
         helper.check_choices('sortBy', sort_by, ['name', 'email', 'role'])
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
 
-        # set desc sort by
-        if sort_order == 'desc':
-            sort_by = '-' + sort_by
+        # id breaks ties of non unique sort keys
+        paginator = KeysetPaginator(query, sort_keys([sort_by, 'id'], sort_order))
 
         # get users
-        users = self.get_user_list(offset, limit, sort_by)
+        users = self.get_user_list(paginator)
 
         # get total
-        total = self.get_user_total()
+        total = self.get_user_total() if paginator.with_total else None
+
+        return PagingSerializer.from_paginator(paginator, total, users).to_dict()
+
+
+def drop_current_users(event: invalidation.Changed) -> None:
+    """
+    Drop the cached current user entries of changed users, of all users for a change made
+    by another process
+    :param event: change of users
+    :return: void
+    """
+    if event.ids is None:
+        cache.set(CURRENT_USERS_VERSION_KEY, time.time_ns(), None)
+        return
+
+    # emails cached with the entries, and the current ones of the users not deleted
+    keys = {CURRENT_USER_EMAIL_KEY % id: id for id in event.ids}
+    cached = cache.get_many(list(keys))
+    found = dict(User.objects.filter(pk__in=event.ids).values_list('pk', 'email'))
+
+    # a deleted user of an unknown email may be cached under any email
+    if set(event.ids).difference(found, (keys[key] for key in cached)):
+        cache.set(CURRENT_USERS_VERSION_KEY, time.time_ns(), None)
+
+    emails = set(cached.values()).union(found.values())
+    cache.set_many({current_user_version_key(email): time.time_ns() for email in emails}, None)
+
+
+def current_user_version_key(email: Optional[str]) -> str:
+    """
+    Get the cache key of the version of the current user entries of an email
+    :param email: email
+    :return: cache key
+    """
+    return CURRENT_USER_VERSION_KEY % hashlib.sha256((email or '').lower().encode()).hexdigest()
+
 
-        return PagingSerializer(offset, limit, total, users).to_dict()
+invalidation.subscribe(User._meta.db_table, drop_current_users)
@@ -1,13 +1,17 @@
 import base64
+import hashlib
 import json
-from typing import Dict
+import logging
+import threading
+import time
+from typing import Any, Dict
 
 import jwt
 import requests
 from django.conf import settings
 
 from app.service.jwksutils import \
-    rsa_pem_from_jwk  # <-- this module contains the piece of code described previously
+    rsa_public_key_from_jwk  # <-- this module contains the piece of code described previously
 
 # https://robertoprevato.github.io/Validating-JWT-Bearer-tokens-from-Azure-AD-in-Python/
 
@@ -16,6 +20,17 @@ jwks = {}
 valid_audiences = []  # id of the application prepared previously
 issuer = 'https://sts.windows.net/9885457a-2026-4e2c-a47e-32ff52ea0b8d/'
 
+# Per process caches: public keys by kid, loaded from the JWKS, and verified claims by
+# SHA-256 of the token until the token expires. An unknown kid refreshes the JWKS at most
+# once per JWKS_MISS_INTERVAL seconds, so forged kids cannot hammer the identity provider.
+JWKS_MISS_INTERVAL = 60
+
+well_known_url = None
+public_keys = {}
+jwks_loaded_at = None
+verified_claims = {}
+cache_lock = threading.Lock()
+
 
 class InvalidAuthorizationToken(Exception):
     def __init__(self, details: str) -> None:
@@ -32,6 +47,10 @@ def get_unverified_header(token: str) -> Dict[str, str]:
 
 def get_jwt_value(token, key):
     headers = get_unverified_header(token)  # jwt.get_unverified_header(token)
+    return get_header_value(headers, key)
+
+
+def get_header_value(headers: Dict[str, str], key: str) -> str:
     if not headers:
         raise InvalidAuthorizationToken('missing headers')
     try:
@@ -41,23 +60,11 @@ def get_jwt_value(token, key):
 
 
 def get_kid(token: str) -> str:
-    headers = get_unverified_header(token)  # jwt.get_unverified_header(token)
-    if not headers:
-        raise InvalidAuthorizationToken('missing headers')
-    try:
-        return headers['kid']
-    except KeyError:
-        raise InvalidAuthorizationToken('missing kid')
+    return get_jwt_value(token, 'kid')
 
 
 def get_alg(token: str) -> str:
-    headers = get_unverified_header(token)  # jwt.get_unverified_header(token)
-    if not headers:
-        raise InvalidAuthorizationToken('missing headers')
-    try:
-        return headers['alg']
-    except KeyError:
-        raise InvalidAuthorizationToken('missing alg')
+    return get_jwt_value(token, 'alg')
 
 
 def get_jwk(kid: str):
@@ -68,44 +75,139 @@ def get_jwk(kid: str):
 
 
 def get_public_key(token: str):
-    return rsa_pem_from_jwk(get_jwk(get_kid(token)))
+    return get_signing_key(get_kid(token))
+
+
+def get_signing_key(kid: str):
+    """
+    Get the loaded public key of a kid, refreshing the JWKS for an unknown kid
+    :param kid: key id
+    :return: public key
+    """
+    key = public_keys.get(kid)
+    if key is None:
+        load_jwks(force=True)
+        key = public_keys.get(kid)
+    if key is None:
+        raise InvalidAuthorizationToken('kid not recognized')
+
+    return key
 
 
 def validate_jwt(jwt_to_validate: str):
+    digest = hashlib.sha256(jwt_to_validate.encode()).digest()
+    cached = verified_claims.get(digest)
+    if cached is not None and cached[1] > time.time():
+        # callers add to the claims, the cached ones stay as verified
+        return dict(cached[0])
+
     init_azure_ad(settings.AZURE_TENANT_ID, settings.AZURE_CLIENT_ID)
-    alg = get_alg(jwt_to_validate)  # RS256
-    public_key = get_public_key(jwt_to_validate)
+
+    headers = get_unverified_header(jwt_to_validate)
+    alg = get_header_value(headers, 'alg')  # RS256
+    public_key = get_signing_key(get_header_value(headers, 'kid'))
 
     jwt_decoded = jwt.decode(
         jwt_to_validate,
         public_key,
-        verify=True,
         algorithms=[alg],
         audience=valid_audiences,
         issuer=issuer,
     )
 
+    if jwt_decoded.get('exp'):
+        cache_claims(digest, jwt_decoded)
+
     # do what you wish with decoded token:
     # if we get here, the JWT is validated
-    return jwt_decoded
+    return dict(jwt_decoded)
+
+
+def cache_claims(digest: bytes, claims: Dict[str, Any]) -> None:
+    """
+    Cache verified claims until the token expires, at most settings.JWT_CACHE_SIZE
+    tokens, the oldest evicted first
+    :param digest: SHA-256 of the token
+    :param claims: verified claims
+    :return: void
+    """
+    with cache_lock:
+        verified_claims[digest] = (claims, claims['exp'])
+
+        while len(verified_claims) > settings.JWT_CACHE_SIZE:
+            del verified_claims[next(iter(verified_claims))]
+
+
+def load_jwks(force: bool = False) -> None:
+    """
+    Load the public keys from settings.JWKS_FILE or the well known configuration, when
+    not loaded yet, older than settings.JWKS_TTL seconds or forced. A failed refresh
+    keeps the keys already loaded.
+    :param force: refresh for an unknown kid, at most once per JWKS_MISS_INTERVAL seconds
+    :return: void
+    """
+    global jwks_loaded_at, public_keys
+
+    loaded_at = jwks_loaded_at
+    max_age = JWKS_MISS_INTERVAL if force else settings.JWKS_TTL
+    if loaded_at is not None and time.monotonic() - loaded_at < max_age:
+        return
+
+    with cache_lock:
+        # another thread refreshed the keys meanwhile
+        if jwks_loaded_at != loaded_at:
+            return
+
+        try:
+            data = fetch_jwks()
+        except Exception:
+            if not public_keys:
+                raise
+            logging.exception('JWKS refresh failed, keeping the loaded keys')
+            jwks_loaded_at = time.monotonic() - settings.JWKS_TTL + JWKS_MISS_INTERVAL
+            return
+
+        public_keys = {
+            jwk['kid']: rsa_public_key_from_jwk(jwk)
+            for jwk in data.get('keys', [])
+            if jwk.get('kty') == 'RSA' and 'kid' in jwk
+        }
+        jwks.clear()
+        jwks.update(data)
+        jwks_loaded_at = time.monotonic()
+
+
+def fetch_jwks() -> Dict[str, Any]:
+    """
+    Read the JWKS from settings.JWKS_FILE, for offline tests, or fetch it through the
+    well known configuration
+    :return: JWKS
+    """
+    if settings.JWKS_FILE:
+        with open(settings.JWKS_FILE) as handle:
+            return json.load(handle)
+
+    # get the well known info & get the public keys
+    resp = requests.get(url=well_known_url, timeout=10)
+    resp.raise_for_status()
+    # get the discovery keys
+    resp = requests.get(url=resp.json()['jwks_uri'], timeout=10)
+    resp.raise_for_status()
+
+    return resp.json()
 
 
 def init_well_known_config(urlWellKnown: str) -> None:
-    if not jwks.get('keys'):
-        # get the well known info & get the public keys
-        resp = requests.get(url=urlWellKnown)
-        well_known_openid_config_data = resp.json()
-        jwks_uri = well_known_openid_config_data['jwks_uri']
-        # get the discovery keys
-        resp = requests.get(url=jwks_uri)
-        jwks.update(resp.json())
+    global well_known_url
+    well_known_url = urlWellKnown
+    load_jwks()
 
 
 def init_azure_ad(tenantId: str, clientId: str) -> None:
     global issuer
-    global valid_audiences
     issuer = 'https://sts.windows.net/' + tenantId + '/'
-    valid_audiences.append(clientId)
+    if clientId not in valid_audiences:
+        valid_audiences.append(clientId)
     init_well_known_config(
         'https://login.microsoftonline.com/' + tenantId + '/v2.0/.well-known/openid-configuration'
     )
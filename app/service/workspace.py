@@ -1,18 +1,30 @@
-from typing import Any, Dict, List, Optional, Union
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Union
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django.http.request import QueryDict
 
 from app.exceptions.http import HttpException
 from app.models import (Workspace, WorkspacesMember, WorkspacesProject,
                         WorkspacesRule)
+from app.serializers.loader import RelationLoader
 from app.serializers.paging import PagingSerializer
 from app.serializers.query import QuerySerializer
+from app.serializers.selection import Selection
 from app.serializers.workspace import WorkspaceSerializer
+from app.service.bulk_delete import BulkDeleteService
 from app.service.project import ProjectService
 from app.service.rule import RuleService
 from app.service.user import UserService
-from app.utils import helper
+from app.utils import helper, invalidation
+from app.utils.pagination import KeysetPaginator, cached_count, sort_keys
+from app.utils.queries import query_budget
+
+# cache keys of the workspace ids a user can access, per version of the memberships
+WORKSPACE_ACCESS_KEY = 'workspace-access:%d:%d'
+WORKSPACE_ACCESS_VERSION_KEY = 'workspace-access-version'
 
 
 class WorkspaceService:
@@ -22,6 +34,8 @@ class WorkspaceService:
     get_workspace(): get single workspace
     delete_workspace(): delete single workspace
     get_workspace_list(): get workspace list
+    get_user_workspaces(): get workspaces of a member
+    get_accessible_workspace_ids(): get the workspace ids of a member, cached
     get_workspace_total(): get workspace total count
     search_workspaces(): search workspace list with pagination
     create_new_workspace(): create new workspace
@@ -52,70 +66,83 @@ class WorkspaceService:
         Delete workspace
         :param id: workspace id
         :param user_dict: user dictionary
-        :return: void
+        :return: deleted row count per table
         """
         # get workspace
         workspace = self.get_workspace(id)
 
         # check owner or super user
-        if user_dict.get('id') != workspace.user.id and user_dict.get('role') != 'admin':
+        if user_dict.get('id') != workspace.user_id and user_dict.get('role') != 'admin':
             raise HttpException(403, 'Only Admin user or owner can delete workspace')
 
-        # get associates
-        workspace_rules = WorkspacesRule.objects.filter(workspace=workspace)
-        workspace_members = WorkspacesMember.objects.filter(workspace=workspace)
-        workspace_projects = WorkspacesProject.objects.filter(workspace=workspace)
-
-        # delete
-        with transaction.atomic():
-            workspace_projects.delete()
-            workspace_members.delete()
-            workspace_rules.delete()
-            workspace.delete()
+        # delete with associates
+        return BulkDeleteService().delete_workspaces([workspace.id])
 
     def get_workspace_list(
-        self, offset: int, limit: int, order: str, user_id: int
+        self, paginator: KeysetPaginator, user_id: int, selection: Optional[Selection] = None
     ) -> List[Dict[str, Union[int, List[int], str]]]:
         """
         Get workspace list with current user
-        :param offset: offset
-        :param limit: limit
-        :param order: order direction
+        :param paginator: keyset paginator
         :param user_id: current user id
+        :param selection: fields to return, None for every field
         :return: workspace list
         """
-        sort_by = 'name' if order == 'asc' else '-name'
-
         # get user
         user = UserService().get_user(user_id)
 
-        # get members
-        workspace_members = WorkspacesMember.objects.filter(user=user)
+        # filter workspaces
+        workspaces = paginator.paginate(self.get_user_workspaces(user.id))
+        loader = RelationLoader().load_workspace_ids(workspaces)
 
-        # get workspace ids
-        workspace_ids = []
+        return [
+            WorkspaceSerializer(workspace, loader, selection).to_dict() for workspace in workspaces
+        ]
 
-        for workspace_member in workspace_members:
-            workspace_ids.append(workspace_member.workspace.id)
+    def get_user_workspaces(self, user_id: int):
+        """
+        Get workspaces the user is a member of
+        :param user_id: user id
+        :return: workspace queryset
+        """
+        workspace_ids = WorkspacesMember.objects.filter(user_id=user_id).values('workspace_id')
 
-        # filter workspaces
-        results = []
-        workspaces = Workspace.objects.filter(id__in=workspace_ids).order_by(sort_by)[
-            offset : offset + limit
-        ]
+        return Workspace.objects.filter(id__in=workspace_ids)
 
-        for workspace in list(workspaces):
-            results.append(WorkspaceSerializer(workspace).to_dict())
+    def get_accessible_workspace_ids(self, user_id: int) -> FrozenSet[int]:
+        """
+        Get the ids of the workspaces the user is a member of, in one query on the member
+        index, cached for settings.WORKSPACE_ACCESS_TTL seconds. Every membership change
+        drops the cached ids of all users, in every process (see drop_workspace_access).
+        :param user_id: user id
+        :return: workspace ids
+        """
+        # membership changes made by other processes
+        invalidation.sync()
+
+        version = cache.get_or_set(WORKSPACE_ACCESS_VERSION_KEY, time.time_ns, None)
+        key = WORKSPACE_ACCESS_KEY % (int(user_id), version)
 
-        return results
+        workspace_ids = cache.get(key)
+        if workspace_ids is None:
+            workspace_ids = frozenset(
+                WorkspacesMember.objects.filter(user_id=user_id).values_list(
+                    'workspace_id', flat=True
+                )
+            )
+            cache.set(key, workspace_ids, settings.WORKSPACE_ACCESS_TTL)
 
-    def get_workspace_total(self) -> int:
+        return workspace_ids
+
+    def get_workspace_total(self, user_id: int) -> int:
         """
-        Get workspace total count
+        Get total count of the workspaces of the user
+        :param user_id: user id
         :return: total count
         """
-        return Workspace.objects.count()
+        return cached_count(self.get_user_workspaces(user_id))
 
+    @query_budget(6)
     def search_workspaces(
         self, user_dict: Dict[str, Optional[Union[str, int]]], query: QueryDict
     ) -> Dict[str, Union[Dict[str, int], List[Dict[str, Union[int, List[int], str]]]]]:
@@ -128,18 +155,18 @@ class WorkspaceService:
         # get query
         query = QuerySerializer(query)
 
-        offset = query.get('offset', 0, 'int')
-        limit = query.get('limit', 10000000000, 'int')
         sort_order = query.get('sortOrder', 'asc')
+        selection = Selection.from_query(query.query)
 
         # check sort order
         helper.check_choices('sortOrder', sort_order, ['asc', 'desc'])
+        paginator = KeysetPaginator(query, sort_keys(['name', 'id'], sort_order))
 
         # get workspace list
-        workspaces = self.get_workspace_list(offset, limit, sort_order, user_dict.get('id'))
-        total = self.get_workspace_total()
+        workspaces = self.get_workspace_list(paginator, user_dict.get('id'), selection)
+        total = self.get_workspace_total(user_dict.get('id')) if paginator.with_total else None
 
-        return PagingSerializer(offset, limit, total, workspaces).to_dict()
+        return PagingSerializer.from_paginator(paginator, total, workspaces).to_dict()
 
     def create_new_workspace(
         self, user_dict: Dict[str, Optional[Union[str, int]]], data: Dict[str, str]
@@ -152,7 +179,7 @@ class WorkspaceService:
         """
         # get body data
         name = data.get('name')
-        user = UserService().get_user(user_dict.get('id'))
+        user = UserService().get_current_user_model(user_dict)
 
         # check name validation
         if name is None or name == '':
@@ -191,7 +218,7 @@ class WorkspaceService:
         name = data.get('name')
 
         # check owner
-        if workspace.user.id != user_dict.get('id'):
+        if workspace.user_id != user_dict.get('id'):
             raise HttpException(403, 'Only owner can be allowed')
 
         # check name
@@ -318,15 +345,15 @@ class WorkspaceService:
 
                 # add members
                 for workspace_member in list(workspace_members):
-                    self.add_members(copied_workspace.id, workspace_member.user.id)
+                    self.add_members(copied_workspace.id, workspace_member.user_id)
 
                 # add rules
                 for workspace_rule in list(workspace_rules):
-                    self.add_rules(copied_workspace.id, workspace_rule.rule.id)
+                    self.add_rules(copied_workspace.id, workspace_rule.rule_id)
 
                 # add projects
                 for workspace_project in list(workspace_projects):
-                    self.add_projects(copied_workspace.id, workspace_project.project.id)
+                    self.add_projects(copied_workspace.id, workspace_project.project_id)
         except IntegrityError:
             raise HttpException(409, 'Workspace already exists')
 
@@ -339,18 +366,13 @@ class WorkspaceService:
         :param user_id: user id
         :return: void
         """
-        is_member = False
-
-        workspace = self.get_workspace(workspace_id)
-        workspace_members = WorkspacesMember.objects.filter(workspace=workspace)
+        if int(workspace_id) in self.get_accessible_workspace_ids(user_id):
+            return
 
-        for workspace_member in list(workspace_members):
-            if user_id == workspace_member.user.id:
-                is_member = True
-                break
+        if not Workspace.objects.filter(id=workspace_id).exists():
+            raise HttpException(404, 'Workspace not found')
 
-        if not is_member:
-            raise HttpException(403, 'Only workspace member can be allowed')
+        raise HttpException(403, 'Only workspace member can be allowed')
 
     def add_members(self, workspace_id: int, user_id: int) -> None:
         """
@@ -393,3 +415,15 @@ class WorkspaceService:
 
         # get or create rule
         WorkspacesRule.objects.get_or_create(workspace=workspace, rule=rule)
+
+
+def drop_workspace_access(event: invalidation.Changed) -> None:
+    """
+    Drop the cached workspace ids of all users after a membership change
+    :param event: change of workspace members
+    :return: void
+    """
+    cache.set(WORKSPACE_ACCESS_VERSION_KEY, time.time_ns(), None)
+
+
+invalidation.subscribe(WorkspacesMember._meta.db_table, drop_workspace_access)
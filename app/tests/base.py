@@ -0,0 +1,143 @@
+from typing import List
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import Client, TestCase, TransactionTestCase
+
+from app.models import (Project, ProjectsHasVin, Rule, RuleVersion,
+                        RuleVersionHasVin, RuleVersionNode, RuleVersionNote,
+                        RuleVersionsHasTests, Test, TestCategory, User, Vin,
+                        VinTests, Workspace, WorkspacesMember, WorkspacesRule)
+from app.utils import catalogue, invalidation
+
+
+class ApiTestMixin:
+    """
+    API test helpers, requests are signed in as `self.user` and run with empty caches
+
+    create_fixtures(): create the user, a test category and its tests
+    clear_caches(): drop every cache, as a fresh process
+    create_rules(): create rules with versions
+    create_rule_version(): create a rule version with nodes, notes, vins and tests
+    create_projects(): create projects with vins and test results
+    create_workspace(): create a workspace of the user
+    """
+
+    @classmethod
+    def create_fixtures(cls) -> None:
+        cls.user = User.objects.create(name='admin', email='admin@example.com', role='admin')
+        cls.category = TestCategory.objects.create(name='Brakes')
+        cls.tests = [
+            Test.objects.create(name='BRAKE TEST %d' % i, test_category=cls.category)
+            for i in range(3)
+        ]
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        patcher = mock.patch(
+            'app.service.user.validate_jwt',
+            lambda token: {'unique_name': self.user.email, 'name': self.user.name},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = Client(HTTP_AUTHORIZATION='Bearer token')
+        self.clear_caches()
+
+    def clear_caches(self) -> None:
+        caches['default'].clear()
+        caches['responses'].clear()
+        catalogue.drop_catalogue()
+        # table versions restart from 0 when the database is flushed between tests
+        invalidation._versions.clear()
+        invalidation.sync(force=True)
+
+    def create_rules(self, count: int, workspace: Workspace = None, vins: int = 2) -> Rule:
+        """
+        Create rules, each with two versions
+        :param count: rule count
+        :param workspace: workspace to add the rules to
+        :param vins: enabled vins per version
+        :return: last rule
+        """
+        project = self.create_projects(1, vins)
+        enabled = [row.vin for row in ProjectsHasVin.objects.filter(project=project)]
+
+        for _ in range(count):
+            rule = Rule.objects.create(name='rule %d' % Rule.objects.count())
+            if workspace is not None:
+                WorkspacesRule.objects.create(workspace=workspace, rule=rule)
+
+            for number in ('v1.0', 'v1.1'):
+                self.create_rule_version(rule, number, enabled)
+
+        return rule
+
+    def create_rule_version(self, rule: Rule, number: str, vins: List[Vin]) -> RuleVersion:
+        """
+        Create a rule version with a node, a note, a test and enabled vins
+        :param rule: rule
+        :param number: version number
+        :param vins: enabled vins
+        :return: rule version
+        """
+        rule_version = RuleVersion.objects.create(
+            rule=rule, version_number=number, user=self.user, state='Draft', text='x'
+        )
+        RuleVersionNode.objects.create(rule_version=rule_version, node_id=1, rule_text='x')
+        RuleVersionNote.objects.create(rule_version=rule_version, user=self.user, notes='n')
+        RuleVersionsHasTests.objects.create(rule_versions=rule_version, tests=self.tests[0])
+        for vin in vins:
+            RuleVersionHasVin.objects.create(rule_version=rule_version, vins=vin)
+
+        return rule_version
+
+    def create_projects(self, count: int, vins: int = 2) -> Project:
+        """
+        Create projects with vins, each with a result of every test
+        :param count: project count
+        :param vins: vins per project
+        :return: last project
+        """
+        for _ in range(count):
+            project = Project.objects.create(name='project %d' % Project.objects.count())
+            for j in range(vins):
+                vin = Vin.objects.create(name='%s vin %d' % (project.name, j))
+                ProjectsHasVin.objects.create(project=project, vin=vin)
+                for test in self.tests:
+                    VinTests.objects.create(project=project, vin=vin, tests=test, value='1')
+
+        return project
+
+    def create_workspace(self, name: str) -> Workspace:
+        """
+        Create a workspace of the user
+        :param name: workspace name
+        :return: workspace
+        """
+        workspace = Workspace.objects.create(name=name, user=self.user)
+        WorkspacesMember.objects.create(workspace=workspace, user=self.user)
+
+        return workspace
+
+
+class ApiTestCase(ApiTestMixin, TestCase):
+    """
+    API test case run in a transaction rolled back after each test. Bus events are sent
+    on commit, so they are not sent at all.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.create_fixtures()
+
+
+class ApiTransactionTestCase(ApiTestMixin, TransactionTestCase):
+    """
+    API test case whose writes commit, for bus events and other threads
+    """
+
+    def setUp(self) -> None:
+        self.create_fixtures()
+        super().setUp()
@@ -0,0 +1,32 @@
+from app.models import AsyncTask
+from app.service.async_task import TaskProgress
+from app.tests.base import ApiTestCase
+
+
+class TaskProgressTest(ApiTestCase):
+    """
+    progress is written once enough rows were processed, whatever the update count
+    """
+
+    def test_row_throttle(self) -> None:
+        task = AsyncTask.objects.create(user=self.user)
+        progress = TaskProgress(task, interval=3600, rows=5000)
+
+        for percent in (10, 20):
+            with self.assertNumQueries(0):
+                self.assertTrue(progress.update(percent, 2000))
+
+        with self.assertNumQueries(1):
+            self.assertTrue(progress.update(30, 2000))
+
+        task.refresh_from_db()
+        self.assertEqual(task.progress, 30)
+
+    def test_cancelled(self) -> None:
+        task = AsyncTask.objects.create(user=self.user)
+        progress = TaskProgress(task, interval=3600, rows=5000)
+        AsyncTask.objects.filter(pk=task.pk).update(is_running=False)
+
+        self.assertFalse(progress.update(50, 5000))
+        self.assertFalse(progress.update(60, 1))
+        self.assertFalse(task.is_running)
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from app.models import User
+from app.service.user import UserService
+from app.tests.base import ApiTransactionTestCase
+
+
+class CurrentUserTest(ApiTransactionTestCase):
+    """
+    the cached user of a token follows the changes of the user
+    """
+
+    def demote(self) -> None:
+        user = User.objects.filter(pk=self.user.pk).first()
+        user.role = 'user'
+        user.save()
+
+    def test_change_after_caching(self) -> None:
+        service = UserService()
+        self.assertEqual(service.get_current_user('Bearer token')['role'], 'admin')
+
+        self.demote()
+
+        self.assertEqual(service.get_current_user('Bearer token')['role'], 'user')
+
+    def test_change_while_loading(self) -> None:
+        service = UserService()
+        load = User.objects.get
+
+        # the change commits after the user is read, before it is cached
+        def load_then_demote(*args, **kwargs):
+            user = load(*args, **kwargs)
+            self.demote()
+            return user
+
+        with mock.patch.object(User.objects, 'get', load_then_demote):
+            self.assertEqual(service.get_current_user('Bearer token')['role'], 'admin')
+
+        self.assertEqual(service.get_current_user('Bearer token')['role'], 'user')
+
+    def test_delete_after_caching(self) -> None:
+        service = UserService()
+        service.get_current_user('Bearer token')
+
+        User.objects.get(pk=self.user.pk).delete()
+
+        # the next sign in creates the user again
+        self.assertNotEqual(service.get_current_user('Bearer token')['id'], self.user.pk)
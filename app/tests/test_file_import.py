@@ -0,0 +1,188 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+from typing import List
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+
+from app.models import AsyncTask, ImportLock, VinTests
+from app.service.file_import import FileImportService
+from app.service.job_queue import JobQueueService
+from app.tests.base import ApiTransactionTestCase
+
+
+@override_settings(JOB_MAX_ATTEMPTS=1, TASK_PROGRESS_INTERVAL=0)
+class ProjectImportTest(ApiTransactionTestCase):
+    """
+    project imports, posted as .csv files and run by a job worker in the test thread
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_dir)
+        settings_override = override_settings(JOB_FILES_DIR=files_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def to_csv(self, header: List[str], rows: List[List[str]]) -> bytes:
+        file = io.StringIO()
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+        return file.getvalue().encode()
+
+    def post_import(self, data: bytes):
+        return self.client.post(
+            '/api/v1/import/project', {'file': SimpleUploadedFile('projects.csv', data)}
+        )
+
+    def run_jobs(self) -> List[AsyncTask]:
+        tasks = JobQueueService.claim('test', limit=10)
+        for task in tasks:
+            JobQueueService.run(task.pk, 'test')
+            task.refresh_from_db()
+
+        return tasks
+
+    def test_reimport_updates_vin_tests(self) -> None:
+        header = [
+            'Project',
+            'VIN',
+            'SubVin',
+            'BRAKE TEST 0',
+            'BRAKE TEST 1',
+            'BRAKE TEST 0*qualifier',
+        ]
+        first = [['P1', 'V1', '', '1', '2', 'Q'], ['', 'V2', '', '3', '4', '']]
+        second = [['P1', 'V1', '', '5', '2', ''], ['', 'V2', '', '3', '6', 'R']]
+
+        for rows in (first, second, second):
+            self.assertEqual(self.post_import(self.to_csv(header, rows)).status_code, 202)
+            [task] = self.run_jobs()
+            self.assertEqual(task.progress, 100, task.result)
+
+        values = VinTests.objects.filter(project__name='P1').values_list(
+            'vin__name', 'tests__name', 'value', 'qualifier'
+        )
+        self.assertCountEqual(
+            values,
+            [
+                ('V1', 'BRAKE TEST 0', '5', None),
+                ('V1', 'BRAKE TEST 1', '2', None),
+                ('V2', 'BRAKE TEST 0', '3', 'R'),
+                ('V2', 'BRAKE TEST 1', '6', None),
+            ],
+        )
+
+    def test_trailing_empty_header_columns(self) -> None:
+        header = ['Project', 'VIN', 'SubVin', 'BRAKE TEST 0', '', ' ']
+        data = self.to_csv(header, [['P1', 'V1', '', '1.5', 'note', '']])
+
+        response = self.post_import(data)
+
+        self.assertEqual(response.status_code, 202, response.content)
+        [task] = self.run_jobs()
+        self.assertFalse(task.is_running)
+        self.assertEqual(task.progress, 100, task.result)
+        self.assertEqual(VinTests.objects.get(project__name='P1').value, '1.5')
+
+    def test_empty_header_column(self) -> None:
+        header = ['Project', 'VIN', 'SubVin', ' ', 'BRAKE TEST 0']
+        data = self.to_csv(header, [['P1', 'V1', '', '', '1.5']])
+
+        response = self.post_import(data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('column D', response.json()['message'])
+        self.assertFalse(AsyncTask.objects.exists())
+
+    def fail_third_write(self, written: List[str]):
+        """
+        Make the write of the third chunk fail once
+        :param written: first vin of each chunk written, appended to
+        :return: patch of the project rows writer
+        """
+        write = FileImportService._FileImportService__write_project_rows
+        failures = ['disk full']
+
+        def write_or_fail(service, project_id, rows, *args):
+            written.append(rows[0][2][1])
+            if len(written) == 3 and failures:
+                raise RuntimeError(failures.pop())
+            return write(service, project_id, rows, *args)
+
+        return mock.patch.object(
+            FileImportService, '_FileImportService__write_project_rows', write_or_fail
+        )
+
+    def fifty_rows(self) -> bytes:
+        header = ['Project', 'VIN', 'SubVin', 'BRAKE TEST 0']
+        rows = [['P1' if i == 0 else '', 'V%02d' % i, '', str(i)] for i in range(50)]
+
+        return self.to_csv(header, rows)
+
+    def assert_fifty_rows(self) -> None:
+        self.assertEqual(
+            sorted(VinTests.objects.values_list('vin__name', 'value')),
+            [('V%02d' % i, str(i)) for i in range(50)],
+        )
+
+    @override_settings(IMPORT_CHUNK_SIZE=10)
+    def test_resume_from_checkpoint(self) -> None:
+        written = []
+
+        with self.fail_third_write(written):
+            self.assertEqual(self.post_import(self.fifty_rows()).status_code, 202)
+            with self.assertLogs(level='ERROR'):
+                [failed] = self.run_jobs()
+
+            self.assertEqual((failed.is_running, failed.result), (False, 'disk full'))
+            self.assertEqual(failed.checkpoint['row'], 20)
+            self.assertEqual(VinTests.objects.count(), 20)
+
+            written.clear()
+            self.assertEqual(self.post_import(self.fifty_rows()).status_code, 202)
+            [resumed] = self.run_jobs()
+
+        # the chunks before the checkpoint are skipped, the failed one is written again
+        self.assertEqual(written, ['V20', 'V30', 'V40'])
+        self.assertEqual((resumed.is_running, resumed.progress), (False, 100))
+        self.assert_fifty_rows()
+        failed.refresh_from_db()
+        self.assertIsNone(failed.checkpoint)
+
+    @override_settings(IMPORT_CHUNK_SIZE=10, JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=30)
+    def test_retry_after_failed_write(self) -> None:
+        written = []
+
+        with self.fail_third_write(written):
+            self.assertEqual(self.post_import(self.fifty_rows()).status_code, 202)
+            with self.assertLogs(level='ERROR'):
+                [task] = self.run_jobs()
+
+            # queued again with its checkpoint, file and project locks
+            self.assertTrue(task.is_running)
+            self.assertIsNotNone(task.run_after)
+            self.assertEqual(task.checkpoint['row'], 20)
+            self.assertTrue(os.path.exists(task.payload['path']))
+            self.assertEqual(ImportLock.objects.get().task_id, task.pk)
+            self.assertEqual(self.run_jobs(), [])
+
+            written.clear()
+            AsyncTask.objects.filter(pk=task.pk).update(run_after=timezone.now())
+            [retried] = self.run_jobs()
+
+        self.assertEqual(retried.pk, task.pk)
+        self.assertEqual(written, ['V20', 'V30', 'V40'])
+        self.assertEqual((retried.is_running, retried.progress, retried.attempts), (False, 100, 2))
+        self.assert_fifty_rows()
+        self.assertFalse(os.path.exists(task.payload['path']))
+        self.assertFalse(ImportLock.objects.exists())
@@ -0,0 +1,128 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from app.models import AsyncTask
+from app.service.job_queue import JOB_HANDLERS, JobQueueService
+from app.tests.base import ApiTransactionTestCase
+
+# attempts seen by the test job handlers
+attempts = []
+
+
+def succeed(task: AsyncTask) -> None:
+    attempts.append(task.pk)
+
+
+def fail(task: AsyncTask) -> None:
+    attempts.append(task.pk)
+    raise RuntimeError('disk full')
+
+
+@override_settings(JOB_LEASE=60, JOB_RETRY_DELAY=30)
+class JobQueueTest(ApiTransactionTestCase):
+    """
+    jobs are leased to one worker at a time, claimed again once their lease expired and
+    retried with a delay until their last attempt
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        attempts.clear()
+        handlers = mock.patch.dict(
+            JOB_HANDLERS,
+            {'succeed': __name__ + '.succeed', 'fail': __name__ + '.fail'},
+        )
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def enqueue(self, kind: str, max_attempts: int = 3, files=()) -> AsyncTask:
+        return JobQueueService.enqueue(
+            kind, {'id': self.user.id}, dict(files=list(files)), max_attempts
+        )
+
+    def expire_lease(self, task: AsyncTask) -> None:
+        AsyncTask.objects.filter(pk=task.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claim_once(self) -> None:
+        task = self.enqueue('succeed')
+
+        self.assertEqual([claimed.pk for claimed in JobQueueService.claim('a')], [task.pk])
+        self.assertEqual(JobQueueService.claim('b'), [])
+
+        task.refresh_from_db()
+        self.assertEqual((task.locked_by, task.attempts), ('a', 1))
+        self.assertTrue(JobQueueService.heartbeat(task.pk, 'a'))
+        self.assertFalse(JobQueueService.heartbeat(task.pk, 'b'))
+
+    def test_claim_after_lease_expiry(self) -> None:
+        task = self.enqueue('succeed')
+        JobQueueService.claim('a')
+        self.expire_lease(task)
+
+        self.assertEqual([claimed.pk for claimed in JobQueueService.claim('b')], [task.pk])
+
+        task.refresh_from_db()
+        self.assertEqual((task.locked_by, task.attempts), ('b', 2))
+        self.assertFalse(JobQueueService.heartbeat(task.pk, 'a'))
+
+        JobQueueService.run(task.pk, 'b')
+
+        task.refresh_from_db()
+        self.assertEqual((task.is_running, task.progress), (False, 100))
+
+    def test_abandon_after_last_lease(self) -> None:
+        task = self.enqueue('succeed', max_attempts=1)
+        JobQueueService.claim('a')
+        self.expire_lease(task)
+
+        self.assertEqual(JobQueueService.claim('b'), [])
+
+        task.refresh_from_db()
+        self.assertFalse(task.is_running)
+        self.assertIn('abandoned', task.result)
+        self.assertEqual(attempts, [])
+
+    def test_retry_with_delay(self) -> None:
+        task = self.enqueue('fail', max_attempts=2)
+        JobQueueService.claim('a')
+        before = timezone.now()
+
+        with self.assertLogs(level='ERROR'):
+            JobQueueService.run(task.pk, 'a')
+
+        task.refresh_from_db()
+        self.assertTrue(task.is_running)
+        self.assertIsNone(task.locked_until)
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=30))
+        self.assertEqual(JobQueueService.claim('a'), [])
+
+        AsyncTask.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        with mock.patch.dict(JOB_HANDLERS, {'fail': __name__ + '.succeed'}):
+            [claimed] = JobQueueService.claim('b')
+            JobQueueService.run(claimed.pk, 'b')
+
+        task.refresh_from_db()
+        self.assertEqual((task.is_running, task.progress, task.attempts), (False, 100, 2))
+        self.assertEqual(attempts, [task.pk, task.pk])
+
+    def test_fail_after_last_attempt(self) -> None:
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        task = self.enqueue('fail', max_attempts=1, files=[path])
+
+        [claimed] = JobQueueService.claim('a')
+        with self.assertLogs(level='ERROR'):
+            JobQueueService.run(claimed.pk, 'a')
+
+        task.refresh_from_db()
+        self.assertEqual((task.is_running, task.result), (False, 'disk full'))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(JobQueueService.claim('a'), [])
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+from typing import List, Tuple
+from unittest import mock
+
+from app.exceptions.http import HttpException
+from app.models import RuleVersionDocument, Test, TestCategory
+from app.service.file_import import FileImportService
+from app.service.rule_version_document import RuleVersionDocumentService
+from app.tests.base import ApiTestCase
+
+
+class MappingsImportTest(ApiTestCase):
+    """
+    mappings are imported in a fixed number of queries, whatever their row count
+    """
+
+    def import_mappings(self, rows: List[Tuple[str, str]]) -> List[Test]:
+        """
+        Import a Mappings sheet, read by a stub of xlrd
+        :param rows: (category, test) rows below the header
+        :return: tests of the rows
+        """
+        columns = [['Category'] + [row[0] for row in rows], ['Test'] + [row[1] for row in rows]]
+        sheet = SimpleNamespace(
+            ncols=2, col=lambda index: [SimpleNamespace(value=value) for value in columns[index]]
+        )
+        book = SimpleNamespace(sheet_by_name=lambda name: sheet)
+
+        with mock.patch('app.service.file_import.xlrd.open_workbook', return_value=book):
+            return FileImportService().import_mappings(SimpleNamespace(read=bytes), {})
+
+    def rows(self, count: int) -> List[Tuple[str, str]]:
+        return [
+            ('MAP %d' % (i // 500) if i % 500 == 0 else '', 'MAP TEST %d' % i) for i in range(count)
+        ]
+
+    def test_query_count(self) -> None:
+        # savepoint, read, insert and read again of categories and of tests, a rule version
+        # document lookup for each, release
+        with self.assertNumQueries(10):
+            tests = self.import_mappings(self.rows(3000))
+
+        self.assertEqual(len(tests), 3000)
+        self.assertEqual(Test.objects.filter(name__startswith='MAP TEST').count(), 3000)
+        self.assertEqual(tests[1499].test_category.name, 'MAP 2')
+
+        # a re-import with new rows, the test of an existing name keeps its category
+        rows = self.rows(30) + [('MAP NEW', 'MAP TEST NEW'), ('', 'MAP TEST 0')]
+        with self.assertNumQueries(10):
+            tests = self.import_mappings(rows)
+
+        self.assertEqual(tests[-2].test_category.name, 'MAP NEW')
+        self.assertEqual(tests[-1].test_category.name, 'MAP 0')
+        self.assertTrue(TestCategory.objects.filter(name='MAP NEW').exists())
+
+    def test_unchanged_reimport(self) -> None:
+        rule_version = self.create_rules(1).ruleversion_set.first()
+        RuleVersionDocumentService().refresh([rule_version.pk])
+        rows = [('Brakes', test.name) for test in self.tests] + [('MAP', 'MAP TEST')]
+        self.import_mappings(rows)
+
+        # savepoint, read of categories and of tests, release: nothing is published
+        with self.assertNumQueries(4):
+            tests = self.import_mappings(rows)
+
+        self.assertEqual([test.pk for test in tests[:-1]], [test.pk for test in self.tests])
+        document = RuleVersionDocument.objects.get(pk=rule_version.pk)
+        self.assertIsNotNone(document.document)
+
+    def test_missing_category(self) -> None:
+        with self.assertRaises(HttpException) as context:
+            self.import_mappings([('', 'MAP TEST')])
+
+        self.assertEqual(context.exception.code, 400)
+        self.assertFalse(Test.objects.filter(name='MAP TEST').exists())
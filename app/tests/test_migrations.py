@@ -0,0 +1,69 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Migration test case: the schema is migrated back to `migrate_from` before the test,
+    and forward to the latest migration after it
+
+    migrate(): migrate to a migration and get its historical models
+    """
+
+    migrate_from = None
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.addCleanup(self.migrate, None)
+        self.apps = self.migrate(self.migrate_from)
+
+    def migrate(self, name):
+        """
+        Migrate the app to a migration
+        :param name: migration name, None for the latest
+        :return: app registry of the models at that migration
+        """
+        executor = MigrationExecutor(connection)
+        if name is None:
+            targets = executor.loader.graph.leaf_nodes('app')
+        else:
+            targets = [('app', name)]
+        executor.migrate(targets)
+        executor.loader.build_graph()
+
+        return executor.loader.project_state(targets).apps
+
+
+class VinTestsUniqueMigrationTest(MigrationTestCase):
+    """
+    0016 merges the VinTests re-imports added before the (project, vin, tests) key
+    """
+
+    migrate_from = '0015_asynctask'
+
+    def test_merge_duplicates(self) -> None:
+        models = {
+            name: self.apps.get_model('app', name)
+            for name in ('Project', 'Vin', 'TestCategory', 'Test', 'VinTests')
+        }
+        project = models['Project'].objects.create(name='P1')
+        vin = models['Vin'].objects.create(name='V1')
+        category = models['TestCategory'].objects.create(name='Brakes')
+        brake, other = [
+            models['Test'].objects.create(name=name, test_category=category)
+            for name in ('BRAKE', 'OTHER')
+        ]
+        for value, qualifier in (('1', 'Q'), ('2', None), ('3', None)):
+            models['VinTests'].objects.create(
+                project=project, vin=vin, tests=brake, value=value, qualifier=qualifier
+            )
+        models['VinTests'].objects.create(project=project, vin=vin, tests=other, value='4')
+
+        VinTests = self.migrate('0016_vintests_unique').get_model('app', 'VinTests')
+
+        self.assertCountEqual(
+            VinTests.objects.values_list('tests__name', 'value', 'qualifier'),
+            [('BRAKE', '3', 'Q'), ('OTHER', '4', None)],
+        )
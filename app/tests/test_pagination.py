@@ -0,0 +1,33 @@
+from app.models import Project, Rule
+from app.service.bulk_delete import BulkDeleteService
+from app.tests.base import ApiTransactionTestCase
+
+
+class PagingTotalTest(ApiTransactionTestCase):
+    """
+    cached paging totals follow the writes of the counted tables
+    """
+
+    def total(self, url: str) -> int:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return response.json()['paginationInfo']['totalCount']
+
+    def test_total_after_create(self) -> None:
+        self.create_projects(2)
+        self.assertEqual(self.total('/api/v1/projects'), 2)
+
+        Project.objects.create(name='created')
+
+        self.assertEqual(self.total('/api/v1/projects'), 3)
+        self.assertEqual(self.total('/api/v1/projects?name=created'), 1)
+
+    def test_total_after_delete(self) -> None:
+        rule = self.create_rules(3)
+        self.assertEqual(self.total('/api/v1/rules'), 3)
+
+        BulkDeleteService().delete_rules([rule.id])
+
+        self.assertEqual(self.total('/api/v1/rules'), 2)
+        self.assertFalse(Rule.objects.filter(pk=rule.id).exists())
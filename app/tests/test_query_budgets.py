@@ -0,0 +1,99 @@
+from django.test import override_settings
+
+from app.models import User, Vin
+from app.serializers.loader import CHUNK_SIZE, RelationLoader
+from app.tests.base import ApiTestCase
+from app.utils.queries import assert_max_queries
+
+
+@override_settings(QUERY_BUDGETS=True, CACHE_SYNC_INTERVAL=3600)
+class ListQueryBudgetTest(ApiTestCase):
+    """
+    list endpoints run a fixed number of queries, whatever the page holds
+    """
+
+    def assert_queries(self, url: str, limit: int, grow) -> None:
+        """
+        Request a list on cold caches under its budget, then again with more rows
+        :param url: list url
+        :param limit: pinned query count of the request
+        :param grow: callable adding rows to the list
+        """
+        with assert_max_queries(limit, url) as small:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        grow()
+        self.clear_caches()
+
+        with assert_max_queries(limit, url) as large:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(large), len(small))
+
+    def test_rules(self) -> None:
+        self.create_rules(2)
+        self.assert_queries('/api/v1/rules', 3, lambda: self.create_rules(8))
+
+    def test_rules_expanded(self) -> None:
+        self.create_rules(2)
+        self.assert_queries(
+            '/api/v1/rules?expand=ruleVersions.tests', 6, lambda: self.create_rules(8, vins=4)
+        )
+
+    def test_rule_versions(self) -> None:
+        rule = self.create_rules(1)
+        vins = list(Vin.objects.all())
+
+        self.assert_queries(
+            '/api/v1/rules/%d/rule-versions' % rule.id,
+            13,
+            lambda: [self.create_rule_version(rule, 'v2.%d' % i, vins) for i in range(5)],
+        )
+
+    def test_projects(self) -> None:
+        self.create_projects(2)
+        self.assert_queries('/api/v1/projects', 3, lambda: self.create_projects(8))
+
+    def test_projects_expanded(self) -> None:
+        self.create_projects(2)
+        self.assert_queries(
+            '/api/v1/projects?expand=vins.testResults', 5, lambda: self.create_projects(8, vins=4)
+        )
+
+    def test_workspaces(self) -> None:
+        self.create_rules(1, self.create_workspace('first'))
+        self.assert_queries(
+            '/api/v1/workspaces',
+            7,
+            lambda: [self.create_rules(2, self.create_workspace('w%d' % i)) for i in range(5)],
+        )
+
+    def test_users(self) -> None:
+        self.assert_queries(
+            '/api/v1/users',
+            3,
+            lambda: User.objects.bulk_create(
+                User(name='user %d' % i, email='user%d@example.com' % i, role='standard')
+                for i in range(10)
+            ),
+        )
+
+
+class RelationLoaderTest(ApiTestCase):
+    """
+    relation loader
+    """
+
+    def test_vin_tests_in_chunks(self) -> None:
+        self.create_projects(1, vins=CHUNK_SIZE + 1)
+        vin_ids = list(Vin.objects.values_list('pk', flat=True))
+
+        with assert_max_queries(2) as queries:
+            loader = RelationLoader().load_vin_tests(vin_ids)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(set(loader.vin_tests_by_vin), set(vin_ids))
+        test_ids = [test.id for test in self.tests]
+        for vin_tests in loader.vin_tests_by_vin.values():
+            self.assertEqual([vin_test.tests_id for vin_test in vin_tests], test_ids)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from app.models import Upload
+from app.service.upload import UploadService
+from app.tests.base import ApiTestCase
+
+
+class UploadTest(ApiTestCase):
+    """
+    chunked uploads keep their file consistent and expire after their last chunk
+    """
+
+    data = b'0123456789' * 100
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files_dir)
+        settings_override = override_settings(JOB_FILES_DIR=files_dir, UPLOAD_TTL=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_upload(self) -> str:
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        response = self.client.post(
+            '/api/v1/uploads',
+            {'name': 'p.csv', 'size': len(self.data), 'sha256': sha256},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+        return response.json()['id']
+
+    def put_chunk(self, id: str, offset: int, chunk: bytes):
+        return self.client.put(
+            '/api/v1/uploads/%s?offset=%d' % (id, offset),
+            chunk,
+            content_type='application/octet-stream',
+        )
+
+    def test_chunk_at_taken_offset(self) -> None:
+        id = self.create_upload()
+        self.assertEqual(self.put_chunk(id, 0, self.data[:400]).status_code, 200)
+
+        response = self.put_chunk(id, 0, b'x' * 400)
+
+        self.assertEqual(response.status_code, 409)
+        upload = Upload.objects.get(pk=id)
+        self.assertEqual(upload.offset, 400)
+        with open(upload.path, 'rb') as file:
+            self.assertEqual(file.read(), self.data[:400])
+
+        response = self.put_chunk(id, 400, self.data[400:])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['isComplete'])
+
+    def test_purge_after_last_chunk(self) -> None:
+        id = self.create_upload()
+        expired = timezone.now() - timedelta(seconds=7200)
+        Upload.objects.filter(pk=id).update(date_created=expired, date_updated=expired)
+
+        self.assertEqual(self.put_chunk(id, 0, self.data[:400]).status_code, 200)
+        UploadService().purge_expired()
+
+        upload = Upload.objects.get(pk=id)
+        self.assertTrue(os.path.exists(upload.path))
+
+        Upload.objects.filter(pk=id).update(date_updated=expired)
+        UploadService().purge_expired()
+
+        self.assertFalse(Upload.objects.filter(pk=id).exists())
+        self.assertFalse(os.path.exists(upload.path))
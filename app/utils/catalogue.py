@@ -0,0 +1,184 @@
+"""
+In-process cache of the test catalogue: test categories, tests and the parser mappings
+built from them.
+
+The catalogue is read with one query into an immutable snapshot shared by services,
+serializers and parsers. Changes of tests or test categories, in this process or another
+one, drop the snapshot through the invalidation bus (see app.utils.invalidation) and
+it is read again on its next use.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models import TestCategory
+from app.utils import invalidation
+
+# parser mappings kept per snapshot, one per distinct test set
+MAPPINGS_CACHE_SIZE = 256
+
+_catalogue = None
+_lock = threading.Lock()
+
+
+class Catalogue:
+    """
+    test catalogue snapshot, not to be modified
+
+    categories: category id -> name
+    category_ids: category name -> id
+    tests: test id -> (name, category id)
+    test_ids: test name -> id
+    tests_by_category: category id -> test ids
+
+    category_name(): get the name of a category
+    find_category(): get the first category whose name contains a text
+    test_dicts(): get the tests of a category as serialized tests
+    mappings(): get the parser mappings of a test set
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, str, Optional[int], Optional[str]]]) -> None:
+        """
+        Build the snapshot
+        :param rows: (category id, category name, test id, test name) ordered by ids, test
+            fields None for a category without tests
+        """
+        self.categories: Dict[int, str] = {}
+        self.category_ids: Dict[str, int] = {}
+        self.tests: Dict[int, Tuple[str, int]] = {}
+        self.test_ids: Dict[str, int] = {}
+        self.tests_by_category: Dict[int, List[int]] = {}
+        self.__mappings = OrderedDict()
+        self.__mappings_lock = threading.Lock()
+
+        for category_id, category_name, test_id, test_name in rows:
+            if category_id not in self.categories:
+                self.categories[category_id] = category_name
+                self.category_ids[category_name] = category_id
+                self.tests_by_category[category_id] = []
+
+            if test_id is not None:
+                self.tests[test_id] = (test_name, category_id)
+                self.test_ids[test_name] = test_id
+                self.tests_by_category[category_id].append(test_id)
+
+    def category_name(self, category_id: int) -> Optional[str]:
+        """
+        Get the name of a category
+        :param category_id: category id
+        :return: name, None when not in the snapshot
+        """
+        return self.categories.get(category_id)
+
+    def find_category(self, text: str) -> Optional[int]:
+        """
+        Get the first category, by id, whose name contains a text ignoring case
+        :param text: text
+        :return: category id or None
+        """
+        text = text.lower()
+        for category_id, name in self.categories.items():
+            if text in name.lower():
+                return category_id
+
+        return None
+
+    def test_dicts(self, category_id: int) -> List[Dict[str, Any]]:
+        """
+        Get the tests of a category as TestSerializer dictionaries
+        :param category_id: category id
+        :return: test list
+        """
+        category_name = self.categories[category_id]
+
+        return [
+            {
+                'id': test_id,
+                'name': self.tests[test_id][0],
+                'testCategoryId': category_id,
+                'testCategoryName': category_name,
+            }
+            for test_id in self.tests_by_category[category_id]
+        ]
+
+    def mappings(self, tests: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Get the parser mappings (ams) of a test set: test names by category name, built
+        once per distinct set. A test without `testCategoryName` takes its category
+        from the catalogue. The mappings are shared, callers must not modify them.
+        :param tests: objects with fields name and testCategoryName
+        :return: ams
+        """
+        pairs = []
+        for test in tests:
+            category = test.get('testCategoryName')
+            if category is None:
+                test_id = self.test_ids.get(test['name'])
+                if test_id is None:
+                    raise KeyError('testCategoryName')
+                category = self.categories[self.tests[test_id][1]]
+            pairs.append((category, test['name']))
+
+        key = tuple(pairs)
+        with self.__mappings_lock:
+            ams = self.__mappings.get(key)
+            if ams is not None:
+                self.__mappings.move_to_end(key)
+                return ams
+
+        ams = {}
+        for category, name in pairs:
+            ams.setdefault(category, []).append(name)
+
+        with self.__mappings_lock:
+            self.__mappings[key] = ams
+            while len(self.__mappings) > MAPPINGS_CACHE_SIZE:
+                self.__mappings.popitem(last=False)
+
+        return ams
+
+
+def load_catalogue() -> Catalogue:
+    """
+    Read the catalogue with one query
+    :return: catalogue
+    """
+    rows = TestCategory.objects.values_list('id', 'name', 'test__id', 'test__name').order_by(
+        'id', 'test__id'
+    )
+
+    return Catalogue(rows)
+
+
+def get_catalogue() -> Catalogue:
+    """
+    Get the catalogue of this process, read again after a change
+    :return: catalogue
+    """
+    global _catalogue
+
+    invalidation.sync()
+
+    catalogue = _catalogue
+    if catalogue is None:
+        with _lock:
+            catalogue = _catalogue
+            if catalogue is None:
+                catalogue = _catalogue = load_catalogue()
+
+    return catalogue
+
+
+def drop_catalogue(event: Optional[invalidation.Changed] = None) -> None:
+    """
+    Drop the catalogue of this process, read again on its next use
+    :param event: change of tests or test categories
+    :return: void
+    """
+    global _catalogue
+
+    with _lock:
+        _catalogue = None
+
+
+invalidation.subscribe('test*', drop_catalogue)
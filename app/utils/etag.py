@@ -0,0 +1,180 @@
+"""
+ETags of rules, rule versions, projects and workspaces, for conditional GETs.
+
+A resource ETag is built from the stamp of the resource and the versions of the shared
+tables its payload also reads. The stamp is a row of `resource_versions`, bumped when
+the invalidation bus sends a change of the rows the stamp follows (see
+app.utils.invalidation). Checking a resource ETag costs one primary key lookup. A
+collection ETag is built from the versions of every table the list reads, and costs no
+query.
+
+Both also cover the user and the query string, so expansions and pages get their own
+ETags.
+"""
+import functools
+import hashlib
+from typing import Any, Dict, Iterable, Type
+
+from django.db import models
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework.request import Request
+
+from app.models import Project, ResourceVersion, Rule, RuleVersion, Workspace
+from app.utils import invalidation
+
+# stamped model -> tables whose event ids are ids of the model
+STAMPS = {
+    Rule: ('rules',),
+    RuleVersion: ('rule_version*',),
+    Project: ('projects', 'projects_has_vins'),
+    Workspace: ('workspace*',),
+}
+
+# stamped model -> tables its payload reads beyond the rows followed by its stamp
+SHARED_TABLES = {
+    Rule: ('vins', 'vin_tests', 'test*', 'users'),
+    RuleVersion: ('vins', 'vin_tests', 'test*', 'users'),
+    Project: ('vins', 'vin_tests', 'test*'),
+    Workspace: ('*',),
+}
+
+# stamped model -> tables read by a list of the model
+COLLECTION_TABLES = {
+    Rule: ('rule*', 'vins', 'vin_tests', 'test*', 'users'),
+    RuleVersion: ('rule_version*', 'vins', 'vin_tests', 'test*', 'users'),
+    Project: ('project*', 'vins', 'vin_tests', 'test*'),
+    Workspace: ('*',),
+}
+
+# keep every IN (...) list below the SQLite host parameter limit
+CHUNK_SIZE = 500
+
+
+def resource_etag(
+    request: Request, model: Type[models.Model], id: Any, user_dict: Dict[str, Any]
+) -> str:
+    """
+    Get the ETag of a resource, with one lookup of its stamp
+    :param request: request
+    :param model: stamped model
+    :param id: resource id
+    :param user_dict: current user
+    :return: ETag
+    """
+    invalidation.sync()
+
+    version = (
+        ResourceVersion.objects.filter(name=stamp_name(model, id))
+        .values_list('version', flat=True)
+        .first()
+    )
+
+    return make_etag(
+        request,
+        user_dict,
+        stamp_name(model, id),
+        version or 0,
+        invalidation.get_versions(SHARED_TABLES[model]),
+    )
+
+
+def collection_etag(
+    request: Request, model: Type[models.Model], user_dict: Dict[str, Any], scope: Any = None
+) -> str:
+    """
+    Get the ETag of a list, without query
+    :param request: request
+    :param model: stamped model
+    :param user_dict: current user
+    :param scope: id of the parent of the list, if any
+    :return: ETag
+    """
+    invalidation.sync()
+
+    return make_etag(
+        request,
+        user_dict,
+        model._meta.db_table,
+        scope,
+        invalidation.get_versions(COLLECTION_TABLES[model]),
+    )
+
+
+def make_etag(request: Request, user_dict: Dict[str, Any], *parts: Any) -> str:
+    """
+    Hash the parts of an ETag with the user and the query string
+    :param request: request
+    :param user_dict: current user
+    :param parts: resource key and versions
+    :return: weak ETag
+    """
+    query = sorted(request.query_params.lists())
+    key = repr((user_dict.get('id'), user_dict.get('role'), query) + parts)
+
+    return 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check If-None-Match holds the ETag, by weak comparison
+    :param request: request
+    :param etag: current ETag
+    :return: boolean
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+
+    # `*` is not matched: telling whether the resource exists takes more than its stamp
+    return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in parse_etags(header)}
+
+
+def stamp_name(model: Type[models.Model], id: Any) -> str:
+    """
+    Get the name of the stamp of a resource
+    :param model: stamped model
+    :param id: resource id
+    :return: name
+    """
+    return '%s:%d' % (model._meta.db_table, int(id))
+
+
+def bump_stamps(model: Type[models.Model], ids: Iterable[int]) -> None:
+    """
+    Bump the stamps of resources, created at version 1 when missing
+    :param model: stamped model
+    :param ids: resource ids
+    :return: void
+    """
+    names = sorted({stamp_name(model, id) for id in ids})
+
+    for start in range(0, len(names), CHUNK_SIZE):
+        chunk = names[start : start + CHUNK_SIZE]
+        updated = ResourceVersion.objects.filter(name__in=chunk).update(
+            version=F('version') + 1
+        )
+        if updated < len(chunk):
+            ResourceVersion.objects.bulk_create(
+                (ResourceVersion(name=name, version=1) for name in chunk), ignore_conflicts=True
+            )
+
+
+def _stamp(model: Type[models.Model], event: invalidation.Changed) -> None:
+    # whole table changes come from processes that bumped the stamps themselves
+    if event.ids:
+        bump_stamps(model, event.ids)
+
+
+def _stamp_rules(event: invalidation.Changed) -> None:
+    # rule payloads nest their versions
+    if event.ids:
+        bump_stamps(
+            Rule, RuleVersion.objects.filter(pk__in=event.ids).values_list('rule_id', flat=True)
+        )
+
+
+for _model, _patterns in STAMPS.items():
+    for _pattern in _patterns:
+        invalidation.subscribe(_pattern, functools.partial(_stamp, _model))
+invalidation.subscribe('rule_version*', _stamp_rules)
@@ -0,0 +1,250 @@
+"""
+Cache invalidation bus.
+
+Writes publish `Changed` events on the table they changed, and caches subscribe to them
+with table name patterns. Single row saves and deletes of the WATCHED models are
+published by model signals. Bulk writes (bulk_create, queryset update and delete) send
+no signals, so their callers publish explicitly.
+
+Events of a transaction are sent once it commits, merged per table. Each changed table
+bumps its row in `cache_versions`, and every process reads these versions at most once
+per settings.CACHE_SYNC_INTERVAL seconds. A table changed by another process is sent
+as an event for any row of the table.
+
+Subscribers that must change the database with the write subscribe `in_transaction`: they
+are called by publish() itself, in the writing transaction, and their errors fail the
+write. They get no events of other processes, whose writes called them already.
+
+Queryset deletes of rules, rule versions with their nodes, notes and vins, and of vin
+tests stay fast deletes because no delete signal is connected for them, their callers
+publish explicitly too.
+"""
+import fnmatch
+import logging
+import threading
+import time
+from typing import (Callable, Dict, FrozenSet, Iterable, List, NamedTuple,
+                    Optional, Sequence, Tuple, Type)
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from app.models import (CacheVersion, Project, ProjectsHasVin, Rule,
+                        RuleVersion, RuleVersionHasVin, RuleVersionNode,
+                        RuleVersionNodeNote, RuleVersionNote,
+                        RuleVersionsHasTests, Test, TestCategory, User, Vin,
+                        VinTests, Workspace, WorkspacesMember, WorkspacesProject,
+                        WorkspacesRule)
+
+# model -> field identifying the changed rows in events, and whether deletes are signalled
+WATCHED = {
+    Rule: ('id', False),
+    RuleVersion: ('id', False),
+    RuleVersionNode: ('rule_version_id', False),
+    RuleVersionNote: ('rule_version_id', False),
+    RuleVersionNodeNote: ('rule_version_id', False),
+    RuleVersionHasVin: ('rule_version_id', False),
+    RuleVersionsHasTests: ('rule_versions_id', True),
+    Project: ('id', True),
+    ProjectsHasVin: ('project_id', False),
+    Vin: ('id', False),
+    VinTests: ('vin_id', False),
+    Test: ('id', True),
+    TestCategory: ('id', True),
+    Workspace: ('id', True),
+    WorkspacesMember: ('workspace_id', True),
+    WorkspacesProject: ('workspace_id', True),
+    WorkspacesRule: ('workspace_id', True),
+    User: ('id', True),
+}
+
+
+class Changed(NamedTuple):
+    """
+    rows of a table changed
+
+    topic: table name
+    ids: ids of the changed rows (see WATCHED), None for any row
+    """
+
+    topic: str
+    ids: Optional[FrozenSet[int]]
+
+
+_subscribers: List[tuple] = []
+_transaction_subscribers: List[tuple] = []
+_versions: Dict[str, int] = {}
+_synced_at = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def subscribe(
+    pattern: str, callback: Callable[[Changed], None], in_transaction: bool = False
+) -> None:
+    """
+    Call back on the events of the tables matching a pattern
+    :param pattern: fnmatch pattern of table names, e.g. 'test*'
+    :param callback: called with each event, in the process that receives it
+    :param in_transaction: call back on each publish, in the writing transaction, instead
+        of once it commits
+    :return: void
+    """
+    with _lock:
+        if in_transaction:
+            _transaction_subscribers.append((pattern, callback))
+        else:
+            _subscribers.append((pattern, callback))
+
+
+def publish(model: Type[models.Model], ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Publish a change of a table, sent when the current transaction commits or at once
+    outside of a transaction
+    :param model: changed model
+    :param ids: ids of the changed rows, in the terms of WATCHED, None for any row
+    :return: void
+    """
+    topic = model._meta.db_table
+    if ids is not None:
+        ids = frozenset(ids)
+
+    with _lock:
+        subscribers = list(_transaction_subscribers)
+
+    # errors propagate, so the write fails with them
+    for pattern, callback in subscribers:
+        if fnmatch.fnmatchcase(topic, pattern):
+            callback(Changed(topic, ids))
+
+    connection = transaction.get_connection()
+
+    # events left by a rolled back transaction are dropped with it
+    if not _flush_registered(connection):
+        _local.pending = {}
+
+    pending = _local.pending
+    if ids is None or (topic in pending and pending[topic] is None):
+        pending[topic] = None
+    else:
+        pending[topic] = pending.get(topic, frozenset()) | ids
+
+    if connection.in_atomic_block:
+        if not _flush_registered(connection):
+            transaction.on_commit(_flush)
+    else:
+        _flush()
+
+
+def sync(force: bool = False) -> None:
+    """
+    Read the table versions, at most once per settings.CACHE_SYNC_INTERVAL seconds, and
+    send an event for every table changed by another process
+    :param force: read the versions now
+    :return: void
+    """
+    global _synced_at
+
+    now = time.monotonic()
+    if not force and _synced_at is not None and now - _synced_at < settings.CACHE_SYNC_INTERVAL:
+        return
+    _synced_at = now
+
+    versions = dict(CacheVersion.objects.values_list('name', 'version'))
+    with _lock:
+        changed = [topic for topic, version in versions.items() if _versions.get(topic) != version]
+        _versions.update(versions)
+
+    _dispatch(Changed(topic, None) for topic in changed)
+
+
+def get_versions(patterns: Sequence[str]) -> List[Tuple[str, int]]:
+    """
+    Get the versions this process has seen of the tables matching patterns
+    :param patterns: fnmatch patterns of table names
+    :return: sorted (table name, version) list
+    """
+    with _lock:
+        return sorted(
+            (topic, version)
+            for topic, version in _versions.items()
+            if any(fnmatch.fnmatchcase(topic, pattern) for pattern in patterns)
+        )
+
+
+def connect() -> None:
+    """
+    Publish the saves and deletes of the WATCHED models
+    :return: void
+    """
+    for model, (_, deletes) in WATCHED.items():
+        post_save.connect(_on_change, sender=model, dispatch_uid='invalidation')
+        if deletes:
+            post_delete.connect(_on_change, sender=model, dispatch_uid='invalidation')
+
+
+def _on_change(sender, instance, **kwargs) -> None:
+    publish(sender, [getattr(instance, WATCHED[sender][0])])
+
+
+def _flush_registered(connection) -> bool:
+    return any(hook[1] is _flush for hook in connection.run_on_commit)
+
+
+def _flush() -> None:
+    """
+    Bump the versions of the pending tables and send their events
+    :return: void
+    """
+    pending = getattr(_local, 'pending', None) or {}
+    _local.pending = {}
+
+    if pending:
+        try:
+            _bump(sorted(pending))
+        except Exception:
+            logging.exception('Cache version bump failed for %s', sorted(pending))
+
+        _dispatch(Changed(topic, ids) for topic, ids in pending.items())
+
+
+def _bump(topics: List[str]) -> None:
+    """
+    Increment the versions of tables, and keep them as seen when no other process
+    changed the tables meanwhile
+    :param topics: table names
+    :return: void
+    """
+    for topic in topics:
+        if not CacheVersion.objects.filter(name=topic).update(version=F('version') + 1):
+            try:
+                with transaction.atomic():
+                    CacheVersion.objects.create(name=topic, version=1)
+            except IntegrityError:
+                CacheVersion.objects.filter(name=topic).update(version=F('version') + 1)
+
+    versions = CacheVersion.objects.filter(name__in=topics).values_list('name', 'version')
+    with _lock:
+        for topic, version in versions:
+            if _versions.get(topic, 0) == version - 1:
+                _versions[topic] = version
+
+
+def _dispatch(events: Iterable[Changed]) -> None:
+    """
+    Send events to the matching subscribers
+    :param events: events
+    :return: void
+    """
+    with _lock:
+        subscribers = list(_subscribers)
+
+    for event in events:
+        for pattern, callback in subscribers:
+            if fnmatch.fnmatchcase(event.topic, pattern):
+                try:
+                    callback(event)
+                except Exception:
+                    logging.exception('Cache invalidation of %s failed', event.topic)
@@ -0,0 +1,30 @@
+"""
+Entry points of job worker processes. The pool spawns fresh interpreters, which
+import this module before Django is set up, so app modules are imported lazily.
+"""
+import django
+
+
+def init_process():
+    """
+    Set up Django in a spawned worker process
+    :return: void
+    """
+    django.setup()
+
+
+def run_job(task_id, worker):
+    """
+    Run one claimed job in a worker process
+    :param task_id: task id
+    :param worker: worker id
+    :return: void
+    """
+    from django.db import connection
+
+    from app.service.job_queue import JobQueueService
+
+    try:
+        JobQueueService.run(task_id, worker)
+    finally:
+        connection.close()
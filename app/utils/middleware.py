@@ -0,0 +1,27 @@
+from app.exceptions.http import HttpException
+from app.service.user import UserService
+
+
+class CurrentUserMiddleware:
+    """
+    Resolve the user of the bearer token once per request, in `request.current_user`.
+    Errors are kept in `request.current_user_error` and raised by the views that need a
+    user (see app.controllers.base.BaseAPI.check_user_token), so public endpoints still
+    work with a bad token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.current_user = None
+        request.current_user_error = None
+
+        authorization = request.headers.get('Authorization')
+        if authorization is not None:
+            try:
+                request.current_user = UserService().get_current_user(authorization)
+            except HttpException as e:
+                request.current_user_error = e
+
+        return self.get_response(request)
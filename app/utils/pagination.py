@@ -0,0 +1,198 @@
+import base64
+import binascii
+import hashlib
+import json
+from typing import Any, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Model, Q, QuerySet
+
+from app.exceptions.http import HttpException
+from app.serializers.query import QuerySerializer
+from app.utils import invalidation
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def sort_keys(fields: Sequence[str], order: str) -> List[str]:
+    """
+    Keyset ordering of the given fields in one direction
+
+    :param fields: sort fields, ending with a unique key
+    :param order: asc or desc
+    :return: order_by fields
+    """
+    return [field if order == 'asc' else '-' + field for field in fields]
+
+
+def cached_count(queryset: QuerySet) -> int:
+    """
+    Count a filtered queryset, cached for settings.PAGING_TOTAL_TTL seconds.
+    The cache key is the SQL of the query with the versions of the tables it reads, so
+    every filter gets its own entry and a change of these tables, published on the
+    invalidation bus (see app.utils.invalidation), moves the count to a new entry.
+
+    :param queryset: filtered queryset
+    :return: count
+    """
+    sql = str(queryset.order_by().query)
+    quote_name = connections[queryset.db].ops.quote_name
+    tables = [
+        model._meta.db_table
+        for model in invalidation.WATCHED
+        if quote_name(model._meta.db_table) in sql
+    ]
+
+    invalidation.sync()
+    key = 'paging-total:' + hashlib.md5(
+        repr((sql, invalidation.get_versions(tables))).encode()
+    ).hexdigest()
+
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, getattr(settings, 'PAGING_TOTAL_TTL', 30))
+
+    return total
+
+
+class KeysetPaginator:
+    """
+    keyset (cursor) paginator
+
+    Pages are fetched with a WHERE on the sort keys of the last row seen instead of
+    OFFSET, so every page costs the same as the first one. The ordering must end
+    with a unique key (the primary key) to be total.
+
+    Query parameters:
+    `limit`: page size, default DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE
+    `cursor`: opaque `nextCursor` / `prevCursor` of a previous page
+    `offset`: legacy offset paging, used only when no cursor is given
+    `withTotal`: `false` skips the total count
+
+    paginate(): fetch one page of a queryset
+    total(): get the total count of a queryset
+    """
+
+    def __init__(self, query: QuerySerializer, ordering: Sequence[str]) -> None:
+        self.ordering = tuple(ordering)
+        self.limit = min(query.get('limit', DEFAULT_PAGE_SIZE, 'int'), MAX_PAGE_SIZE)
+        self.with_total = query.get('withTotal', 'true') != 'false'
+        self.next_cursor = None
+        self.prev_cursor = None
+
+        if self.limit < 1:
+            raise HttpException(400, 'limit must be a positive integer')
+
+        cursor = query.get('cursor')
+        if cursor:
+            self.offset = None
+            self.values, self.backward = self.decode(cursor)
+        else:
+            self.offset = query.get('offset', 0, 'int')
+            self.values, self.backward = None, False
+
+            if self.offset < 0:
+                raise HttpException(400, 'offset must be a positive integer')
+
+    def paginate(self, queryset: QuerySet) -> List[Model]:
+        """
+        Fetch the page and set next / prev cursors, one query
+        :param queryset: filtered queryset
+        :return: objects of the page
+        """
+        if self.values is None:
+            # first page, or legacy offset page
+            start = self.offset
+            objects = list(queryset.order_by(*self.ordering)[start : start + self.limit + 1])
+            has_more = len(objects) > self.limit
+            objects = objects[: self.limit]
+            has_previous = start > 0
+        elif not self.backward:
+            objects = list(
+                queryset.filter(self.seek(self.values, False)).order_by(*self.ordering)[
+                    : self.limit + 1
+                ]
+            )
+            has_more = len(objects) > self.limit
+            objects = objects[: self.limit]
+            has_previous = True
+        else:
+            reverse = [f[1:] if f.startswith('-') else '-' + f for f in self.ordering]
+            objects = list(
+                queryset.filter(self.seek(self.values, True)).order_by(*reverse)[: self.limit + 1]
+            )
+            has_previous = len(objects) > self.limit
+            objects = objects[: self.limit][::-1]
+            has_more = True
+
+        if objects and has_more:
+            self.next_cursor = self.encode(objects[-1], False)
+        if objects and has_previous:
+            self.prev_cursor = self.encode(objects[0], True)
+
+        return objects
+
+    def seek(self, values: List[Any], backward: bool) -> Q:
+        """
+        Build the condition selecting rows after (or before) the given sort key values
+        :param values: sort key values of the boundary row
+        :param backward: select the rows before the boundary
+        :return: condition
+        """
+        condition = Q()
+        equal = {}
+
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != backward else 'gt'
+            condition |= Q(**equal, **{name + '__' + lookup: value})
+            equal[name] = value
+
+        return condition
+
+    def encode(self, obj: Model, backward: bool) -> str:
+        """
+        Encode the sort key values of an object into an opaque cursor
+        :param obj: boundary object
+        :param backward: cursor of the previous page
+        :return: cursor
+        """
+        payload = {
+            'o': self.ordering,
+            'v': [getattr(obj, field.lstrip('-')) for field in self.ordering],
+            'b': backward,
+        }
+        data = json.dumps(payload, separators=(',', ':')).encode()
+
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode(self, cursor: str):
+        """
+        Decode a cursor made by encode() for the same ordering
+        :param cursor: cursor
+        :return: (sort key values, backward)
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(data)
+            values, backward = payload['v'], payload['b']
+            valid = tuple(payload['o']) == self.ordering and len(values) == len(self.ordering)
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            valid = False
+
+        if not valid:
+            raise HttpException(400, 'Invalid cursor')
+
+        return values, bool(backward)
+
+    def total(self, queryset: QuerySet) -> Optional[int]:
+        """
+        Get the cached total count unless withTotal=false
+        :param queryset: filtered queryset
+        :return: count or None
+        """
+        return cached_count(queryset) if self.with_total else None
@@ -0,0 +1,80 @@
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+from django.conf import settings
+from django.db import connection
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a block runs more queries than it is allowed to
+    """
+
+    def __init__(self, label: str, limit: int, queries: list) -> None:
+        statements = '\n'.join(query['sql'] for query in queries)
+        super().__init__(
+            '%s ran %d queries, expected at most %d:\n%s'
+            % (label, len(queries), limit, statements)
+        )
+        self.count = len(queries)
+
+
+class QueryRecorder:
+    """
+    execute wrapper recording the statements run on a connection, without the debug
+    cursor of django.test
+
+    captured_queries: recorded statements, as {'sql': ...}
+    """
+
+    def __init__(self) -> None:
+        self.captured_queries: List[Dict[str, Any]] = []
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: Dict):
+        self.captured_queries.append({'sql': sql})
+        return execute(sql, params, many, context)
+
+    def __len__(self) -> int:
+        return len(self.captured_queries)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = 'block') -> Iterator[QueryRecorder]:
+    """
+    Assert the wrapped block runs at most `limit` queries
+
+    :param limit: allowed query count
+    :param label: name used in the error message
+    :return: recorder of the queries of the block
+    """
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        yield recorder
+
+    if len(recorder) > limit:
+        raise QueryBudgetExceeded(label, limit, recorder.captured_queries)
+
+
+def query_budget(limit: int) -> Callable:
+    """
+    Pin the query count of a service method to a constant.
+    Only enforced when settings.QUERY_BUDGETS is on, so production pays nothing.
+
+    :param limit: allowed query count, independent of the page size
+    :return: decorator
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not getattr(settings, 'QUERY_BUDGETS', False):
+                return func(*args, **kwargs)
+
+            with assert_max_queries(limit, func.__qualname__):
+                return func(*args, **kwargs)
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
@@ -0,0 +1,141 @@
+"""
+Response cache of heavy read views, per user.
+
+`cached_response` keeps the 200 responses of a BaseAPI GET in the `responses` cache
+(see settings.CACHES) for settings.RESPONSE_CACHE_TTL seconds. The key covers the user,
+the path, the query string and the versions of the tables the view reads, so a change
+of these tables, published on the invalidation bus (see app.utils.invalidation), moves
+the view to new keys at once and the old entries expire unused.
+
+Hits and misses are counted per view in the same cache, shared by the processes using
+a shared backend, and read by get_stats().
+"""
+import functools
+import hashlib
+from typing import Any, Callable, Dict, List, Sequence
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from app.exceptions.http import HttpException
+from app.utils import invalidation
+from app.utils.etag import etag_matches
+
+OUTCOMES = ('hits', 'misses')
+
+# names of the cached views, for get_stats()
+_views: List[str] = []
+
+
+def cached_response(tables: Sequence[str]) -> Callable:
+    """
+    Cache the 200 responses of a BaseAPI GET method per user, path and query
+
+    :param tables: fnmatch patterns of the tables the view reads
+    :return: decorator
+    """
+
+    def decorator(get: Callable) -> Callable:
+        name = get.__qualname__
+        _views.append(name)
+
+        @functools.wraps(get)
+        def wrapper(self, request: Request, *args, **kwargs) -> Response:
+            try:
+                current_user = self.check_user_token(request)
+            except HttpException:
+                # the view answers the error
+                return get(self, request, *args, **kwargs)
+
+            cache = caches['responses']
+            key = response_key(name, request, current_user, tables)
+
+            cached = cache.get(key)
+            if cached is not None:
+                count(name, 'hits')
+                data, etag = cached
+                if etag and etag_matches(request, etag):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+                headers = {'ETag': etag} if etag else None
+                return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+            count(name, 'misses')
+            response = get(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(
+                    key, (response.data, response.get('ETag')), settings.RESPONSE_CACHE_TTL
+                )
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def response_key(
+    name: str, request: Request, user_dict: Dict[str, Any], tables: Sequence[str]
+) -> str:
+    """
+    Get the cache key of a response, changed by any change of the tables
+    :param name: view name
+    :param request: request
+    :param user_dict: current user
+    :param tables: fnmatch patterns of the tables the view reads
+    :return: key
+    """
+    invalidation.sync()
+
+    parts = (
+        user_dict.get('id'),
+        user_dict.get('role'),
+        request.path,
+        sorted(request.query_params.lists()),
+        invalidation.get_versions(tables),
+    )
+
+    return 'response:%s:%s' % (name, hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def count(name: str, outcome: str) -> None:
+    """
+    Count a hit or a miss of a view
+    :param name: view name
+    :param outcome: 'hits' or 'misses'
+    :return: void
+    """
+    cache = caches['responses']
+    key = 'response-stats:%s:%s' % (name, outcome)
+
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted meanwhile
+            cache.add(key, 1, None)
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the hits, misses and hit ratio of every cached view
+    :return: stats by view name
+    """
+    counts = caches['responses'].get_many(
+        ['response-stats:%s:%s' % (name, outcome) for name in _views for outcome in OUTCOMES]
+    )
+
+    stats = {}
+    for name in _views:
+        hits = counts.get('response-stats:%s:hits' % name, 0)
+        misses = counts.get('response-stats:%s:misses' % name, 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hitRatio': hits / (hits + misses) if hits + misses else None,
+        }
+
+    return stats
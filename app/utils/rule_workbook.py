@@ -0,0 +1,66 @@
+"""
+Parsing of rule workbooks for the zip rule import, run in pool processes. Nothing
+here touches the database, so spawned processes need no Django setup.
+"""
+import io
+import os
+from typing import Any, Dict
+
+import openpyxl
+import xlrd
+
+from app.parser import parse_garage_language as parser
+from app.utils.spreadsheet import SpreadsheetReader
+
+# one lexer per process, reset by every input()
+_lexer = None
+
+
+def read_rule_text(name: str, content: bytes) -> str:
+    """
+    Read the rule text, the first column of the `Text` sheet, one line per row
+    :param name: file name
+    :param content: .xls or .xlsx file content
+    :return: rule text
+    """
+    file = io.BytesIO(content)
+    file.name = name
+
+    if SpreadsheetReader.detect(file) == 'xlsx':
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            cells = [row[0] for row in workbook['Text'].iter_rows(max_col=1, values_only=True)]
+        finally:
+            workbook.close()
+    else:
+        book = xlrd.open_workbook(file_contents=content)
+        cells = [cell.value for cell in book.sheet_by_name('Text').col(0)]
+
+    return '\n'.join('' if value is None else str(value) for value in cells)
+
+
+def read_rule_workbook(name: str, content: bytes) -> Dict[str, Any]:
+    """
+    Parse and validate one rule workbook of an archive
+    :param name: path of the file in the archive
+    :param content: file content
+    :return: dict with the file, rule name and nodes, or the file and its error
+    """
+    global _lexer
+    rule_name = os.path.splitext(os.path.basename(name))[0]
+
+    try:
+        if not rule_name or len(rule_name) > 128:
+            raise ValueError('Invalid rule name')
+
+        text = read_rule_text(name, content)
+        if not text.strip():
+            raise ValueError('Empty rule text')
+
+        if _lexer is None:
+            _lexer = parser.get_lexer()
+        nodes = parser.split_rule_nodes(text, _lexer)
+    except Exception as e:
+        return dict(file=name, error=str(e) or type(e).__name__)
+
+    return dict(file=name, name=rule_name, nodes=nodes)
@@ -0,0 +1,156 @@
+import codecs
+import csv
+import itertools
+import os
+from typing import Iterator, List, Optional
+
+import openpyxl
+import xlrd
+from openpyxl.utils import get_column_letter
+
+XLSX_MAGIC = b'PK\x03\x04'
+XLS_MAGIC = b'\xd0\xcf\x11\xe0'
+
+
+class SpreadsheetReader:
+    """
+    streaming reader of one sheet of an .xlsx, .csv or legacy .xls file
+
+    .xlsx is read with openpyxl in read-only mode and .csv with the csv module,
+    row by row, so memory does not grow with the file. xlrd, used for .xls only,
+    loads the whole sheet.
+
+    header: stripped header cells without the trailing empty ones, an empty one before is an error
+    total: data row count, from the sheet dimension for .xlsx, None when the file has none
+    rows(): iterate data rows as stripped strings, padded to the header width, from `start`
+    chunks(): iterate lists of at most `size` data rows, from `start`
+    close(): release the workbook
+    """
+
+    def __init__(self, file, sheet: Optional[str] = None) -> None:
+        """
+        Open the file and read the header row
+        :param file: uploaded file
+        :param sheet: sheet name, None for the first sheet
+        """
+        self.file = file
+        self.workbook = None
+        kind = self.detect(file)
+
+        if kind == 'xlsx':
+            self.workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+            worksheet = self.workbook[sheet] if sheet else self.workbook.worksheets[0]
+            self.total = max(worksheet.max_row - 1, 0) if worksheet.max_row else None
+            source = worksheet.iter_rows(values_only=True)
+        elif kind == 'xls':
+            book = xlrd.open_workbook(file_contents=file.read())
+            worksheet = book.sheet_by_name(sheet) if sheet else book.sheet_by_index(0)
+            self.total = max(worksheet.nrows - 1, 0)
+            source = ([cell.value for cell in worksheet.row(i)] for i in range(worksheet.nrows))
+        else:
+            self.total = self.count_lines(file) - 1
+            source = csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+
+        self.source = source
+        self.header = [self.to_string(value) for value in next(source, [])]
+
+        # trailing empty cells are formatted but unused columns, their values are dropped
+        while self.header and not self.header[-1]:
+            self.header.pop()
+
+        if not self.header:
+            raise ValueError('Missing header row')
+        for i, name in enumerate(self.header):
+            if not name:
+                raise ValueError('Empty header in column ' + get_column_letter(i + 1))
+
+    @staticmethod
+    def detect(file) -> str:
+        """
+        Detect the format from the file signature, falling back to the file name
+        :param file: uploaded file
+        :return: xlsx, xls or csv
+        """
+        magic = file.read(4)
+        file.seek(0)
+
+        if magic == XLSX_MAGIC:
+            return 'xlsx'
+        if magic == XLS_MAGIC:
+            return 'xls'
+
+        extension = os.path.splitext(getattr(file, 'name', '') or '')[1].lower()
+        if extension in ('.xlsx', '.xls'):
+            raise ValueError('Unreadable ' + extension + ' file')
+
+        return 'csv'
+
+    @staticmethod
+    def count_lines(file) -> int:
+        """
+        Count lines in bounded reads, then rewind
+        :param file: binary file
+        :return: line count
+        """
+        count = 0
+        last = b'\n'
+
+        for block in iter(lambda: file.read(1 << 20), b''):
+            count += block.count(b'\n')
+            last = block[-1:]
+
+        file.seek(0)
+
+        return count + (last != b'\n')
+
+    @staticmethod
+    def to_string(value) -> str:
+        """
+        Convert a cell to a stripped string
+        :param value: cell value
+        :return: string
+        """
+        return '' if value is None else str(value).strip()
+
+    def rows(self, start: int = 0) -> Iterator[List[str]]:
+        """
+        Iterate data rows
+        :param start: index of the first data row, the rows before it are skipped unparsed
+        :return: rows of stripped strings, padded to the header width
+        """
+        width = len(self.header)
+
+        for values in itertools.islice(self.source, start, None):
+            row = [self.to_string(value) for value in values[:width]]
+
+            if len(row) < width:
+                row.extend([''] * (width - len(row)))
+
+            yield row
+
+    def chunks(self, size: int, start: int = 0) -> Iterator[List[List[str]]]:
+        """
+        Iterate data rows in bounded chunks
+        :param size: maximum rows per chunk
+        :param start: index of the first data row
+        :return: lists of rows
+        """
+        chunk = []
+
+        for row in self.rows(start):
+            chunk.append(row)
+
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def close(self) -> None:
+        """
+        Release the workbook
+        :return: void
+        """
+        if self.workbook is not None:
+            self.workbook.close()
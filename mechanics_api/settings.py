@@ -35,6 +35,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'app.utils.middleware.CurrentUserMiddleware',
 ]
 
 # Allow Cross Origin Access for local Angular App
@@ -84,10 +85,91 @@ DATABASES = {
     }
 }
 
+# Implicit primary keys stay 32 bit integers like the ones the migrations created
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+# Fail list endpoints that exceed their pinned query count (see app.utils.queries)
+QUERY_BUDGETS = os.environ.get('QUERY_BUDGETS', 'False') == 'True'
+
+# Seconds a paging total count is cached for, changes of the tables it counts drop it at once
+# in this process and within CACHE_SYNC_INTERVAL seconds in the others (see app.utils.pagination)
+PAGING_TOTAL_TTL = int(os.environ.get('PAGING_TOTAL_TTL', 30))
+
+# Async task progress is written at most every N seconds or N rows (see app.service.async_task)
+TASK_PROGRESS_INTERVAL = float(os.environ.get('TASK_PROGRESS_INTERVAL', 1.0))
+TASK_PROGRESS_ROWS = int(os.environ.get('TASK_PROGRESS_ROWS', 5000))
+
+# Clients waiting for async task changes are woken after a poll of at most every N seconds,
+# one query per process (see app.service.async_task.TaskNotifier)
+TASK_WATCH_INTERVAL = float(os.environ.get('TASK_WATCH_INTERVAL', 1.0))
+
+# Rows read and written per transaction by the project import (see app.service.file_import)
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 2000))
+
+# Rows of an import are written in parallel per project (see app.service.file_import)
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 4))
+
+# Background jobs run by `manage.py run_jobs` (see app.service.job_queue). JOB_FILES_DIR
+# must be shared by the API and the workers. JOB_LEASE and JOB_RETRY_DELAY are in seconds.
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', os.path.join(BASE_DIR, 'jobs'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_LEASE = int(os.environ.get('JOB_LEASE', 60))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+
+# Chunked uploads are stored in JOB_FILES_DIR, at most UPLOAD_MAX_SIZE bytes, and removed
+# UPLOAD_TTL seconds after their last chunk unless imported (see app.service.upload)
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 1 << 30))
+UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', 24 * 3600))
+
+# Zip rule imports parse workbooks on RULE_IMPORT_PROCESSES processes (0 parses in the job)
+# and write RULE_IMPORT_BATCH rules per transaction (see app.service.file_import)
+RULE_IMPORT_PROCESSES = int(os.environ.get('RULE_IMPORT_PROCESSES', 4))
+RULE_IMPORT_BATCH = int(os.environ.get('RULE_IMPORT_BATCH', 50))
+
 # Azure
 AZURE_CLIENT_ID = os.environ.get('AZURE_CLIENT_ID', '')
 AZURE_TENANT_ID = os.environ.get('AZURE_TENANT_ID', '')
 
+# Verified tokens are cached per process until they expire, at most JWT_CACHE_SIZE of them.
+# The signing keys are fetched again after JWKS_TTL seconds or for an unknown kid, from
+# JWKS_FILE instead of the tenant when it is set (see app.service.validate_token)
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10000))
+JWKS_TTL = int(os.environ.get('JWKS_TTL', 24 * 3600))
+JWKS_FILE = os.environ.get('JWKS_FILE', '')
+
+# Seconds the user of a token is cached for. Changes of the user drop it at once in the
+# process that made them, and within CACHE_SYNC_INTERVAL seconds in the other ones
+# (see app.service.user.UserService.get_current_user)
+CURRENT_USER_TTL = int(os.environ.get('CURRENT_USER_TTL', 30))
+
+# Seconds the workspace ids a user can access are cached for. Membership changes drop them at
+# once in the process that made them, and within CACHE_SYNC_INTERVAL seconds in the other
+# ones (see app.service.workspace.WorkspaceService.get_accessible_workspace_ids)
+WORKSPACE_ACCESS_TTL = int(os.environ.get('WORKSPACE_ACCESS_TTL', 30))
+
+# Seconds between two reads of the table versions bumped by other processes, the longest
+# their writes stay unseen by the caches of this one (see app.utils.invalidation)
+CACHE_SYNC_INTERVAL = float(os.environ.get('CACHE_SYNC_INTERVAL', 1))
+
+# Responses of heavy read views are cached per user for RESPONSE_CACHE_TTL seconds, and
+# dropped at once by changes of the tables they read (see app.utils.response_cache). Set
+# RESPONSE_CACHE_LOCATION to a directory to share them between processes.
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_LOCATION = os.environ.get('RESPONSE_CACHE_LOCATION', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'
+        if RESPONSE_CACHE_LOCATION
+        else 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': RESPONSE_CACHE_LOCATION or 'responses',
+    },
+}
+
 # SMTP
 EMAIL_HOST = os.environ.get('SMTP_HOST')
 EMAIL_PORT = os.environ.get('SMTP_PORT', 25)
@@ -3,12 +3,15 @@ Api URL Configuration
 """
 from django.urls import path
 
-from app.controllers.async_task import (
-    AsyncTaskCancelAPI, AsyncTaskDetailAPI, AsyncTaskListAPI)
+from app.controllers.async_task import (AsyncTaskCancelAPI,
+                                        AsyncTaskDetailAPI,
+                                        AsyncTaskEventsAPI, AsyncTaskListAPI)
 from app.controllers.file_import import FileImportApi
 from app.controllers.invitation import InvitationAPI
 from app.controllers.node_function import NodeFunctionAPI
-from app.controllers.project import ProjectDetailAPI, ProjectListAPI
+from app.controllers.project import (ProjectDetailAPI, ProjectListAPI,
+                                     ProjectMatrixAPI)
+from app.controllers.response_cache import ResponseCacheStatsAPI
 from app.controllers.rule import RuleCopyAPI, RuleDetailAPI, RuleListAPI
 from app.controllers.rule_function import RuleFunctionAPI
 from app.controllers.rule_version import (RuleVersionDetailAPI,
@@ -22,6 +25,7 @@ from app.controllers.test import TestAPI, TestListAPI
 from app.controllers.test_category import (TestCategoryAPI,
                                            TestCategoryListAPI,
                                            TestCategoryWithTestListAPI)
+from app.controllers.upload import UploadDetailAPI, UploadListAPI
 from app.controllers.user import UserDetailAPI, UserListAPI, UserRoleAPI
 from app.controllers.workspace import (WorkspaceCopyAPI, WorkspaceDetailAPI,
                                        WorkspaceListAPI)
@@ -48,10 +52,13 @@ urlpatterns = [
     path('api/v1/rule-versions/<id>/tests/<test_id>', RuleVersionTestsAPI.as_view()),
     path('api/v1/projects', ProjectListAPI.as_view()),
     path('api/v1/projects/<id>', ProjectDetailAPI.as_view()),
+    path('api/v1/projects/<id>/matrix', ProjectMatrixAPI.as_view()),
     path('api/v1/rules/functions/<function>', RuleFunctionAPI.as_view()),
     path('api/v1/rules/node-functions/<function>', NodeFunctionAPI.as_view()),
     path('api/v1/invitations', InvitationAPI.as_view()),
     path('api/v1/import/<filename>', FileImportApi.as_view()),
+    path('api/v1/uploads', UploadListAPI.as_view()),
+    path('api/v1/uploads/<id>', UploadDetailAPI.as_view(), name='retrieve-upload'),
     path(
         'api/v1/async-tasks/running',
         AsyncTaskListAPI.as_view(),
@@ -63,10 +70,12 @@ urlpatterns = [
         name='retrieve-async-task',
     ),
     path('api/v1/async-tasks/<id>/cancel', AsyncTaskCancelAPI.as_view()),
+    path('api/v1/async-tasks/<id>/events', AsyncTaskEventsAPI.as_view()),
     path('api/v1/mappings', TestCategoryWithTestListAPI.as_view()),
     path('api/v1/mappings/test-categories', TestCategoryListAPI.as_view()),
     path('api/v1/mappings/test-categories/<id>', TestCategoryAPI.as_view()),
     path('api/v1/mappings/tests', TestListAPI.as_view()),
     path('api/v1/mappings/tests/<id>', TestAPI.as_view()),
+    path('api/v1/response-cache/stats', ResponseCacheStatsAPI.as_view()),
 ]
 